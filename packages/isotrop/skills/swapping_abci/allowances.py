@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""This module contains the allowance cache of SwappingAbciApp."""
+
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+MAX_UINT256 = 2**256 - 1
+
+AllowanceKey = Tuple[str, str, str]
+
+
+def allowance_key(token: str, owner: str, spender: str) -> AllowanceKey:
+    """Return the lower-cased (token, owner, spender) key of an allowance."""
+    return token.lower(), owner.lower(), spender.lower()
+
+
+class AllowanceCache:
+    """
+    Cached ERC20 allowances, keyed by (token, owner, spender).
+
+    Allowances changed by a submitted transaction are only assumed, since its settlement is not
+    observed here; they stay unconfirmed until they are read again.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the cache."""
+        self._allowances: Dict[AllowanceKey, int] = {}
+        self._unconfirmed: Set[AllowanceKey] = set()
+
+    def get(self, token: str, owner: str, spender: str) -> Optional[int]:
+        """Return the cached allowance, if any."""
+        return self._allowances.get(allowance_key(token, owner, spender))
+
+    def stale_tokens(
+        self, tokens: Iterable[str], owner: str, spender: str
+    ) -> List[str]:
+        """Return the tokens whose allowance is unknown or unconfirmed."""
+        return [
+            token
+            for token in tokens
+            if allowance_key(token, owner, spender) not in self._allowances
+            or allowance_key(token, owner, spender) in self._unconfirmed
+        ]
+
+    def update(self, owner: str, spender: str, allowances: Dict[str, int]) -> None:
+        """Store the allowances read from the chain."""
+        for token, allowance in allowances.items():
+            key = allowance_key(token, owner, spender)
+            self._allowances[key] = allowance
+            self._unconfirmed.discard(key)
+
+    def approve(self, token: str, owner: str, spender: str, amount: int) -> None:
+        """Assume a submitted approval."""
+        key = allowance_key(token, owner, spender)
+        self._allowances[key] = amount
+        self._unconfirmed.add(key)
+
+    def spend(self, token: str, owner: str, spender: str, amount: int) -> None:
+        """Assume a submitted `transferFrom`; an infinite allowance is never decreased."""
+        key = allowance_key(token, owner, spender)
+        allowance = self._allowances.get(key)
+        if allowance is None or allowance == MAX_UINT256:
+            return
+        self._allowances[key] = max(allowance - amount, 0)
+        self._unconfirmed.add(key)
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""This module contains the cyclic arbitrage detector of SwappingAbciApp."""
+
+import math
+from dataclasses import dataclass
+from typing import Collection, Dict, List, Optional, Set, Tuple
+
+from packages.isotrop.skills.swapping_abci.quoting import (
+    PairKey,
+    ReserveTable,
+    pair_key,
+)
+from packages.isotrop.skills.swapping_abci.sizing import (
+    FEE_FACTOR,
+    get_optimal_cycle_input,
+    get_virtual_reserves,
+)
+
+
+DEFAULT_MAX_CYCLE_LENGTH = 4
+
+
+@dataclass(frozen=True)
+class Opportunity:
+    """A profitable cycle, with its optimal input and the exact amounts of the swaps."""
+
+    path: Tuple[str, ...]
+    amounts: Tuple[int, ...]
+
+    @property
+    def amount_in(self) -> int:
+        """Return the optimal input amount."""
+        return self.amounts[0]
+
+    @property
+    def profit(self) -> int:
+        """Return the profit, in the first token of the path."""
+        return self.amounts[-1] - self.amounts[0]
+
+    @property
+    def pairs(self) -> Set[PairKey]:
+        """Return the pairs the cycle trades through."""
+        return {pair_key(a, b) for a, b in zip(self.path, self.path[1:])}
+
+
+def evaluate_cycle(
+    reserves: ReserveTable, path: Tuple[str, ...]
+) -> Optional[Opportunity]:
+    """Size a cycle in closed form and return it if its exact integer profit is positive."""
+    virtual = get_virtual_reserves(reserves, path)
+    if virtual is None:
+        return None
+    amount_in = get_optimal_cycle_input(*virtual)
+    if amount_in <= 0:
+        return None
+    amounts = reserves.get_amounts_out(amount_in, path)
+    if amounts is None or amounts[-1] <= amount_in:
+        return None
+    return Opportunity(path, tuple(amounts))
+
+
+def rotate_cycle(path: Tuple[str, ...], token: str) -> Optional[Tuple[str, ...]]:
+    """Return the cycle starting and ending at `token`, or None if it does not go through it."""
+    nodes = [t.lower() for t in path[:-1]]
+    if token.lower() not in nodes:
+        return None
+    start = nodes.index(token.lower())
+    rotated = nodes[start:] + nodes[:start]
+    return tuple(rotated + [rotated[0]])
+
+
+class ArbitrageDetector:
+    """
+    Find the profitable cycles of the pool graph with a negative-log-price cycle search.
+
+    Each swap is an edge weighted by -log(fee * marginal price), so a cycle can only be profitable if
+    its weights sum to a negative value. Every such cycle of at most `max_cycle_length` swaps is a
+    candidate, sized in closed form and kept if its exact profit is positive, so the opportunities
+    only depend on the reserves: agents holding the same reserves find the same cycles, whatever
+    they found before.
+
+    The search is incremental: only the pools whose reserves changed since the previous call are
+    re-examined. The known cycles through them are dropped and the cycles through them are searched
+    again, starting from their tokens; a cycle through unchanged pools keeps its weight and its size.
+    """
+
+    def __init__(self, max_cycle_length: int = DEFAULT_MAX_CYCLE_LENGTH) -> None:
+        """Initialize the detector."""
+        self.max_cycle_length = max_cycle_length
+        self._last_reserves: Dict[PairKey, Tuple[int, int]] = {}
+        self._opportunities: Dict[Tuple[str, ...], Opportunity] = {}
+
+    @property
+    def opportunities(self) -> List[Opportunity]:
+        """Return the known opportunities, the most profitable first."""
+        return sorted(self._opportunities.values(), key=lambda o: (-o.profit, o.path))
+
+    def update(
+        self, reserves: ReserveTable, tokens: Optional[Collection[str]] = None
+    ) -> List[Opportunity]:
+        """
+        Re-examine the pools whose reserves changed and return the ranked opportunities.
+
+        :param reserves: the cached reserves.
+        :param tokens: if given, only the pools between these tokens are considered.
+        :return: the opportunities, the most profitable first.
+        """
+        allowed = {token.lower() for token in tokens} if tokens is not None else None
+        current: Dict[PairKey, Tuple[int, int]] = {}
+        for key in reserves:
+            if allowed is not None and (key[0] not in allowed or key[1] not in allowed):
+                continue
+            pool = reserves.get_reserves(*key)
+            if pool is not None and pool[0] > 0 and pool[1] > 0:
+                current[key] = pool
+        changed = {
+            key
+            for key in current.keys() | self._last_reserves.keys()
+            if current.get(key) != self._last_reserves.get(key)
+        }
+        self._last_reserves = current
+        if not changed:
+            return self.opportunities
+
+        self._opportunities = {
+            cycle: opportunity
+            for cycle, opportunity in self._opportunities.items()
+            if not opportunity.pairs & changed
+        }
+        for cycle in self._find_negative_cycles(current, changed):
+            opportunity = evaluate_cycle(reserves, cycle)
+            if opportunity is not None:
+                self._opportunities[cycle] = opportunity
+
+        return self.opportunities
+
+    def _find_negative_cycles(
+        self, pools: Dict[PairKey, Tuple[int, int]], changed: Set[PairKey]
+    ) -> List[Tuple[str, ...]]:
+        """Return the cycles through the changed pools whose -log(marginal price) weights sum below zero."""
+        edges: Dict[str, List[Tuple[str, float]]] = {}
+        for (token0, token1), (reserve0, reserve1) in pools.items():
+            edges.setdefault(token0, []).append(
+                (token1, -math.log(FEE_FACTOR * reserve1 / reserve0))
+            )
+            edges.setdefault(token1, []).append(
+                (token0, -math.log(FEE_FACTOR * reserve0 / reserve1))
+            )
+        for neighbours in edges.values():
+            neighbours.sort()
+
+        cycles: Set[Tuple[str, ...]] = set()
+        for token0, token1 in sorted(changed & pools.keys()):
+            for start, first in ((token0, token1), (token1, token0)):
+                weight = next(w for token, w in edges[start] if token == first)
+                self._walk_back(edges, [start, first], weight, cycles)
+        return sorted(cycles)
+
+    def _walk_back(
+        self,
+        edges: Dict[str, List[Tuple[str, float]]],
+        path: List[str],
+        weight: float,
+        cycles: Set[Tuple[str, ...]],
+    ) -> None:
+        """Extend `path` depth-first and collect, in canonical order, the negative cycles back to its start."""
+        for neighbour, edge_weight in edges.get(path[-1], []):
+            if neighbour == path[0]:
+                if len(path) > 2 and weight + edge_weight < 0:
+                    cycles.add(canonical_cycle(path))
+                continue
+            if neighbour in path or len(path) >= self.max_cycle_length:
+                continue
+            path.append(neighbour)
+            self._walk_back(edges, path, weight + edge_weight, cycles)
+            path.pop()
+
+
+def canonical_cycle(tokens: List[str]) -> Tuple[str, ...]:
+    """Return the closed cycle through `tokens` in swap order, starting from its smallest token."""
+    start = tokens.index(min(tokens))
+    rotated = tokens[start:] + tokens[:start]
+    return tuple(rotated + [rotated[0]])
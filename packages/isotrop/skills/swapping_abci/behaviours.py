@@ -19,51 +19,104 @@
 
 """This package contains round behaviours of SwappingAbciApp."""
 
-import json
-import time
+import os
 import random
+import time
 from abc import ABC
-from typing import Any, Dict, Generator, List, Optional, Set, Type, cast
-from packages.valory.protocols.ledger_api.message import LedgerApiMessage
-
-from packages.valory.contracts.erc20.contract import ERC20
-from packages.valory.contracts.gnosis_safe.contract import (
-    GnosisSafeContract,
-    SafeOperation,
-)
-from packages.valory.contracts.uniswapv2pair.contract import UniswapV2Pair
-from packages.valory.contracts.uniswapv2router02.contract import UniswapV2Router02
-from packages.valory.protocols.contract_api import ContractApiMessage
-from packages.valory.skills.abstract_round_abci.base import AbstractRound
-from packages.valory.skills.abstract_round_abci.behaviours import (
-    AbstractRoundBehaviour,
-    BaseBehaviour,
+from functools import partial
+from typing import (
+    Any,
+    Dict,
+    Generator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Type,
+    cast,
 )
 
 from hexbytes import HexBytes
 
-from packages.valory.contracts.multisend.contract import (
-    MultiSendContract,
-    MultiSendOperation,
+from packages.isotrop.skills.swapping_abci.allowances import MAX_UINT256
+from packages.isotrop.skills.swapping_abci.arbitrage import (
+    ArbitrageDetector,
+    evaluate_cycle,
+    rotate_cycle,
 )
+from packages.isotrop.skills.swapping_abci.indexer import ReserveIndexer
+from packages.isotrop.skills.swapping_abci.ladder import build_quote_ladder, size_ladder
 from packages.isotrop.skills.swapping_abci.models import Params, SharedState
+from packages.isotrop.skills.swapping_abci.multisend import encode_multisend
 from packages.isotrop.skills.swapping_abci.payloads import (
     APICheckPayload,
+    BlockPinningPayload,
     DecisionMakingPayload,
-    TxPreparationPayload,
-    StrategyType,
     StrategyEvaluationPayload,
+    StrategyType,
+    TxPreparationPayload,
+)
+from packages.isotrop.skills.swapping_abci.quoting import (
+    ReserveTable,
+    check_swap_invariant,
+    pair_key,
 )
+from packages.isotrop.skills.swapping_abci.registry import PairRegistry
 from packages.isotrop.skills.swapping_abci.rounds import (
     APICheckRound,
+    BlockPinningRound,
     DecisionMakingRound,
     Event,
+    StrategyEvaluationRound,
     SwappingAbciApp,
     SynchronizedData,
     TxPreparationRound,
-    StrategyEvaluationRound,
+    get_quoted_amounts,
 )
-from packages.valory.skills.transaction_settlement_abci.payload_tools import hash_payload_to_hex
+from packages.isotrop.skills.swapping_abci.routing import find_best_route
+from packages.isotrop.skills.swapping_abci.safe import get_safe_tx_hash
+from packages.isotrop.skills.swapping_abci.sizing import size_trade
+from packages.isotrop.skills.swapping_abci.strategy import Strategy, get_strategy_digest
+from packages.valory.connections.ledger.connection import (
+    PUBLIC_ID as LEDGER_CONNECTION_PUBLIC_ID,
+)
+from packages.valory.contracts.erc20.contract import (
+    ERC20,
+    NATIVE_TOKEN_ADDRESS,
+    encode_approve,
+    encode_deposit,
+    encode_transfer,
+)
+from packages.valory.contracts.gnosis_safe.contract import (
+    GnosisSafeContract,
+    SafeOperation,
+)
+from packages.valory.contracts.multisend.contract import MultiSendOperation
+from packages.valory.contracts.uniswapv2pair.contract import UniswapV2Pair, encode_swap
+from packages.valory.contracts.uniswapv2router02.contract import (
+    UniswapV2Router02,
+    encode_swap_exact_eth_for_tokens,
+    encode_swap_exact_tokens_for_eth,
+    encode_swap_exact_tokens_for_tokens,
+)
+from packages.valory.protocols.contract_api import ContractApiMessage
+from packages.valory.protocols.ledger_api.message import LedgerApiMessage
+from packages.valory.skills.abstract_round_abci.base import AbstractRound
+from packages.valory.skills.abstract_round_abci.behaviour_utils import TimeoutException
+from packages.valory.skills.abstract_round_abci.behaviours import (
+    AbstractRoundBehaviour,
+    BaseBehaviour,
+)
+from packages.valory.skills.abstract_round_abci.dialogues import (
+    ContractApiDialogue,
+    ContractApiDialogues,
+)
+from packages.valory.skills.transaction_settlement_abci.payload_tools import (
+    hash_payload_to_hex,
+)
+
 
 HTTP_OK = 200
 GNOSIS_CHAIN_ID = "gnosis"
@@ -71,8 +124,8 @@ TX_DATA = b"0x"
 SAFE_GAS = 0
 VALUE_KEY = "value"
 TO_ADDRESS_KEY = "to_address"
-debug_str = "*"*100
-tx_debug_str = "+"*50
+debug_str = "*" * 100
+tx_debug_str = "+" * 50
 token_config = {
     "usdc": {
         "decimals": 6
@@ -88,6 +141,11 @@ SAFE_TX_GAS_ENTER = 0
 SAFE_TX_GAS_EXIT = 0
 SAFE_TX_GAS_SWAP_BACK = 0
 WXDAI = "0xe91d153e0b41518a2ce8dd3d7944fa863463a97d"
+TOKEN_KEYS = ("token_a", "token_b", "token_c", "token_d", "token_e", "token_f")
+RESERVE_INDEXER_FILENAME = "reserve_indexer.json"
+MAX_REORG_RETRIES = 3
+LEDGER_API_ADDRESS = str(LEDGER_CONNECTION_PUBLIC_ID)
+
 
 class SwappingBaseBehaviour(BaseBehaviour, ABC):  # pylint: disable=too-many-ancestors
     """Base behaviour for the swapping_abci skill."""
@@ -107,101 +165,755 @@ class SwappingBaseBehaviour(BaseBehaviour, ABC):  # pylint: disable=too-many-anc
         """Return the state."""
         return cast(SharedState, self.context.state)
 
-    def get_balance(self, token: str):
-        """Get balance."""
-        # Use the contract API to interact with the ERC20 contract
-        response_msg = yield from self.get_contract_api_response(
-            performative=ContractApiMessage.Performative.GET_RAW_TRANSACTION,  # type: ignore
-            contract_address=token,
+    def get_contract_api_responses(
+        self,
+        requests: List[Dict[str, Any]],
+        min_responses: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> Generator[None, None, List[Optional[ContractApiMessage]]]:
+        """
+        Send several contract API requests at once and wait for their responses.
+
+        Each request takes the arguments of `get_contract_api_response`. Every dialogue gets its own
+        callback, so the responses are collected in any order while the behaviour waits. The requests
+        pinned to the block of the period are answered from the block cache when possible, and only the
+        others are sent.
+
+        :param requests: the requests to send.
+        :param min_responses: resume once this many responses are available, defaults to all of them.
+        :param timeout: the maximum time to wait for the responses.
+        :yield: None
+        :return: the responses in the order of the requests, None for the ones that did not arrive.
+        """
+        contract_api_dialogues = cast(ContractApiDialogues, self.context.contract_api_dialogues)
+        block_reads = self.local_state.block_reads
+        cached = [block_reads.get(request) for request in requests]
+        pending = [request for request, response in zip(requests, cached) if response is None]
+        responses: Dict[str, ContractApiMessage] = {}
+        nonces: List[str] = []
+        for request in pending:
+            request = dict(request)
+            message_kwargs: Dict[str, Any] = dict(
+                performative=request.pop("performative"),
+                counterparty=LEDGER_API_ADDRESS,
+                ledger_id=request.pop("ledger_id", None) or self.context.default_ledger_id,
+                contract_id=request.pop("contract_id"),
+                callable=request.pop("contract_callable"),
+            )
+            contract_address = request.pop("contract_address", None)
+            if contract_address is not None:
+                message_kwargs["contract_address"] = contract_address
+            message_kwargs["kwargs"] = ContractApiMessage.Kwargs(request)
+
+            message, dialogue = contract_api_dialogues.create(**message_kwargs)
+            dialogue = cast(ContractApiDialogue, dialogue)
+            dialogue.terms = self._get_default_terms()
+            nonce = self._get_request_nonce_from_dialogue(dialogue)
+            self.context.requests.request_id_to_callback[nonce] = partial(
+                self._collect_response, responses, nonce
+            )
+            self.context.outbox.put_message(message=message)
+            nonces.append(nonce)
+
+        expected = len(nonces)
+        if min_responses is not None:
+            expected = max(0, min(min_responses - (len(requests) - len(pending)), expected))
+        if expected:
+            try:
+                yield from self.wait_for_condition(lambda: len(responses) >= expected, timeout=timeout)
+            except TimeoutException:
+                self.context.logger.warning(
+                    f"Timed out waiting for {expected} contract API responses, got {len(responses)}."
+                )
+
+        fetched = iter(responses.get(nonce) for nonce in nonces)
+        results: List[Optional[ContractApiMessage]] = []
+        for request, response in zip(requests, cached):
+            if response is None:
+                response = next(fetched)
+                if response is not None and response.performative == ContractApiMessage.Performative.STATE:
+                    block_reads.put(request, response)
+            results.append(response)
+        return results
+
+    def read_contract_state(self, request: Dict[str, Any]) -> Generator[None, None, Optional[ContractApiMessage]]:
+        """Send a read-only contract API request, answered from the block cache when it is pinned."""
+        responses = yield from self.get_contract_api_responses([request])
+        return responses[0]
+
+    @property
+    def read_block(self) -> Optional[int]:
+        """Return the block the reads of the period are pinned to, as agreed on in BlockPinningRound."""
+        if not self.params.use_block_pinning:
+            return None
+        return self.synchronized_data.read_block
+
+    def _pin_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Pin a read-only request to the block of the period, unless it is already pinned."""
+        read_block = self.read_block
+        if read_block is not None and "block_identifier" not in request:
+            request["block_identifier"] = read_block
+        return request
+
+    @staticmethod
+    def _collect_response(
+        responses: Dict[str, ContractApiMessage], nonce: str, message: ContractApiMessage, _behaviour: Any
+    ) -> None:
+        """Store the response of a fanned-out request."""
+        responses[nonce] = message
+
+    def get_balances(
+        self, tokens: List[str], accounts: Optional[List[str]] = None
+    ) -> Generator[None, None, Dict[Tuple[str, str], int]]:
+        """
+        Get the balances of several tokens in a single multicall.
+
+        The native balance of each account is always included, keyed by `NATIVE_TOKEN_ADDRESS`.
+
+        :param tokens: the ERC20 tokens to read.
+        :param accounts: the accounts to read, defaults to the safe.
+        :yield: None
+        :return: the balances keyed by (token, account).
+        """
+        response_msg = yield from self.read_contract_state(self._balances_request(tokens, accounts))
+        return self._parse_balances(response_msg)
+
+    def _balances_request(self, tokens: List[str], accounts: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Return the contract API request of `get_balances`."""
+        request = dict(
+            performative=ContractApiMessage.Performative.GET_STATE,  # type: ignore
+            contract_address=self.params.multicall3_address,
             contract_id=str(ERC20.contract_id),
-            contract_callable="check_balance",
-            account=self.synchronized_data.safe_contract_address,
+            contract_callable="check_balances",
+            tokens=[*tokens, NATIVE_TOKEN_ADDRESS],
+            accounts=accounts or [self.synchronized_data.safe_contract_address],
             chain_id=GNOSIS_CHAIN_ID,
         )
+        return self._pin_request(request)
+
+    def _parse_balances(self, response_msg: Optional[ContractApiMessage]) -> Dict[Tuple[str, str], int]:
+        """Parse the response of `get_balances`."""
+        if response_msg is None or response_msg.performative != ContractApiMessage.Performative.STATE:
+            self.context.logger.error(f"Could not get the balances: {response_msg}")
+            return {}
 
-        if response_msg.performative != ContractApiMessage.Performative.RAW_TRANSACTION:
-            self.context.logger.error(f"Could not calculate the balance of the safe: {response_msg}")
-            return 0,0
+        balances = cast(Dict[str, Dict[str, int]], response_msg.state.body.get("balances", {}))
+        return {
+            (token, account): balance
+            for token, per_account in balances.items()
+            for account, balance in per_account.items()
+        }
+
+    @property
+    def configured_tokens(self) -> List[str]:
+        """Return the base token followed by every configured `token_*_address`."""
+        rebalancing = self.params.rebalancing_params
+        return [rebalancing["token_base_address"]] + [
+            rebalancing[f"{key}_address"] for key in TOKEN_KEYS
+        ]
+
+    @property
+    def pair_registry(self) -> PairRegistry:
+        """Return the registry of the pairs derived from the factory."""
+        if self.local_state.pair_registry is None:
+            self.local_state.pair_registry = PairRegistry(
+                self.params.uni_factory_address, self.params.pair_init_code_hash
+            )
+        return self.local_state.pair_registry
 
-        self.context.logger.info(f"Token Balance in account {response_msg}")
+    @property
+    def pool_addresses(self) -> List[str]:
+        """Return the configured pools, or the pairs of every combination of the configured tokens."""
+        if self.params.pool_addresses:
+            return self.params.pool_addresses
+        return [pair.address for pair in self.pair_registry.register(self.configured_tokens)]
+
+    @property
+    def is_keeper(self) -> bool:
+        """Return whether this agent is the keeper of the current round."""
+        return self.context.agent_address == self.synchronized_data.keeper
+
+    def get_strategy_vote(self, strategy: Strategy) -> Tuple[str, Optional[str]]:
+        """
+        Return the (strategy, digest) fields of a strategy payload.
+
+        With digest voting, every agent votes with the digest of the strategy it computed and only the
+        keeper also sends the strategy itself.
+        """
+        serialized = strategy.serialize()
+        if not self.params.use_digest_voting:
+            return serialized, None
+        return (serialized if self.is_keeper else ""), get_strategy_digest(serialized)
 
-        # Fetching token balance, token decimal is 8
-        token_balance = response_msg.raw_transaction.body.get("token", None)
-        wallet_balance = response_msg.raw_transaction.body.get("wallet", None)
+    @property
+    def arbitrage_detector(self) -> ArbitrageDetector:
+        """Return the cyclic arbitrage detector."""
+        if self.local_state.arbitrage_detector is None:
+            self.local_state.arbitrage_detector = ArbitrageDetector(self.params.max_cycle_length)
+        return self.local_state.arbitrage_detector
+
+    @property
+    def reserve_indexer(self) -> ReserveIndexer:
+        """Return the Sync-event reserve indexer, restoring its persisted state on first use."""
+        if self.local_state.reserve_indexer is None:
+            indexer = ReserveIndexer(
+                self.local_state.reserves,
+                os.path.join(self.context.data_dir, RESERVE_INDEXER_FILENAME),
+                self.params.sync_indexer_reorg_window,
+            )
+            if indexer.load():
+                self.context.logger.info(f"Reserve indexer resumed from block {indexer.cursor}")
+            self.local_state.reserve_indexer = indexer
+        return self.local_state.reserve_indexer
+
+    def update_reserves(self, pair_addresses: Optional[List[str]] = None) -> Generator[None, None, bool]:
+        """
+        Refresh the cached reserves of the given pairs.
+
+        With `use_sync_indexer`, only the `Sync` events since the last processed block are fetched;
+        otherwise, or when the indexer needs a new snapshot, all the reserves are read in one multicall.
+
+        :param pair_addresses: the pairs to refresh, defaults to the configured pools.
+        :yield: None
+        :return: whether the reserves were refreshed.
+        """
+        pair_addresses = pair_addresses or self.pool_addresses
+        if not self.params.use_sync_indexer:
+            pairs_state = yield from self.get_pairs_state(pair_addresses)
+            if pairs_state is None:
+                return False
+            self.local_state.reserves.update_from_state(pairs_state["pairs"], pairs_state["block_number"])
+            return True
+
+        indexer = self.reserve_indexer
+        read_block = self.read_block
+        for _ in range(MAX_REORG_RETRIES):
+            # reserves indexed past the block of the period are newer than it, so it is read again
+            is_ahead = read_block is not None and read_block < cast(int, indexer.cursor or 0)
+            if not indexer.covers(pair_addresses) or is_ahead:
+                pairs_state = yield from self.get_pairs_state(pair_addresses, with_block_hash=True)
+                if pairs_state is None or not pairs_state["pairs"]:
+                    return False
+                indexer.reset_from_state(
+                    pairs_state["pairs"], pairs_state["block_number"], pairs_state.get("block_hash")
+                )
+            if read_block is not None and read_block == indexer.cursor:
+                # the reserves are already indexed up to the block of the period
+                return True
+
+            response_msg = yield from self.get_contract_api_response(
+                performative=ContractApiMessage.Performative.GET_STATE,  # type: ignore
+                contract_address=indexer.pairs[0],
+                contract_id=str(UniswapV2Pair.contract_id),
+                contract_callable="get_sync_events",
+                pair_addresses=indexer.pairs,
+                from_block=cast(int, indexer.cursor) + 1,
+                to_block=read_block,
+                chunk_size=self.params.sync_indexer_chunk_size,
+                known_hashes=indexer.tracked_hashes(),
+                chain_id=GNOSIS_CHAIN_ID,
+            )
+            if response_msg.performative != ContractApiMessage.Performative.STATE:
+                self.context.logger.error(f"Could not get the Sync events: {response_msg}")
+                return False
+
+            body = response_msg.state.body
+            if indexer.apply(body["events"], body["to_block"], body["block_hashes"]):
+                self.context.logger.info(
+                    f"Applied {len(body['events'])} Sync events up to block {body['to_block']}"
+                )
+                return True
+            self.context.logger.warning(f"Reorg detected, reserves rolled back to block {indexer.cursor}")
+
+        return False
+
+    def get_pairs_state(
+        self, pair_addresses: List[str], with_block_hash: bool = False
+    ) -> Generator[None, None, Optional[dict]]:
+        """Read the state of the given pairs with a single multicall, and the hash of its block if asked."""
+        request = self._pairs_state_request(pair_addresses)
+        if with_block_hash:
+            request["with_block_hash"] = True
+        response_msg = yield from self.read_contract_state(request)
+        return self._parse_pairs_state(response_msg)
+
+    def _pairs_state_request(
+        self, pair_addresses: List[str], block_identifier: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Return the contract API request of `get_pairs_state`, at the block of the period unless one is given."""
+        request = dict(
+            performative=ContractApiMessage.Performative.GET_STATE,  # type: ignore
+            contract_address=self.params.multicall3_address,
+            contract_id=str(UniswapV2Pair.contract_id),
+            contract_callable="get_pairs_state",
+            pair_addresses=pair_addresses,
+            chain_id=GNOSIS_CHAIN_ID,
+        )
+        if block_identifier is not None:
+            request["block_identifier"] = block_identifier
+        return self._pin_request(request)
+
+    def _parse_pairs_state(self, response_msg: Optional[ContractApiMessage]) -> Optional[dict]:
+        """Parse the response of `get_pairs_state`."""
+        if response_msg is None or response_msg.performative != ContractApiMessage.Performative.STATE:
+            self.context.logger.error(f"Could not get the state of the pairs: {response_msg}")
+            return None
+
+        self.context.logger.info(f"Pairs state read at block {response_msg.state.body['block_number']}")
+        return response_msg.state.body
+
+    def update_reserves_and_balances(
+        self, tokens: List[str]
+    ) -> Generator[None, None, Dict[Tuple[str, str], int]]:
+        """
+        Refresh the cached reserves and read the balances of `tokens`.
+
+        Without the indexer, the reserve snapshot and the balances are read concurrently.
+
+        :param tokens: the ERC20 tokens to read.
+        :yield: None
+        :return: the balances keyed by (token, account).
+        """
+        if self.params.use_sync_indexer:
+            yield from self.update_reserves()
+            balances = yield from self.get_balances(tokens)
+            return balances
+
+        pairs_response, balances_response = yield from self.get_contract_api_responses(
+            [self._pairs_state_request(self.pool_addresses), self._balances_request(tokens)]
+        )
+        pairs_state = self._parse_pairs_state(pairs_response)
+        if pairs_state is not None:
+            self.local_state.reserves.update_from_state(pairs_state["pairs"], pairs_state["block_number"])
+        return self._parse_balances(balances_response)
 
+    def get_balance(self, token: str):
+        """Get the token and the native balance of the safe."""
+        balances = yield from self.get_balances([token])
+        return self._get_safe_balance(balances, token)
+
+    def _get_safe_balance(self, balances: Dict[Tuple[str, str], int], token: str) -> Tuple[int, int]:
+        """Return the token and the native balance of the safe from the read balances."""
+        safe = self.synchronized_data.safe_contract_address
+        token_balance = balances.get((token, safe), 0)
+        wallet_balance = balances.get((NATIVE_TOKEN_ADDRESS, safe), 0)
         self.context.logger.info(f"Token balance is {token_balance}")
         return token_balance, wallet_balance
 
-class StrategyEvaluationBehaviour(SwappingBaseBehaviour):  # pylint: disable=too-many-ancestors
-    """StrategyEvaluationBehaviour"""
+    def quote_strategy(self, strategy: dict) -> Generator[None, None, None]:
+        """Refresh the reserves, and the balance to swap back if any, then quote the strategy."""
+        is_swap_back = strategy["action"] == StrategyType.SWAP_BACK.value
+        balances = yield from self.update_reserves_and_balances(
+            [strategy["token_a"]["address"]] if is_swap_back else []
+        )
+        yield from self.get_eq_prices(strategy=strategy, balances=balances)
+
+    def get_decision_event(
+        self, amounts: Sequence[int], trades: Sequence[Mapping[str, Any]]
+    ) -> str:
+        """Return the event deciding on a quoted strategy: DONE when nothing was quoted to trade."""
+        if not amounts or not all(amounts):
+            self.context.logger.info("No swap of the strategy was quoted, there is nothing to do")
+            return Event.DONE.value
+        if len(trades) > 1:
+            return Event.MULTI_TRANSACT.value
+        return Event.TRANSACT.value
+
+    def get_eq_prices(
+        self, strategy: dict, balances: Optional[Dict[Tuple[str, str], int]] = None
+    ) -> Generator[None, None, Tuple[List[float], List[int]]]:
+        """
+        Quote the entry or the swap back of a strategy, and set its path and its minimum amount out.
+
+        A swap back without a token balance is not quoted, so that the period ends with nothing to do.
+
+        :param strategy: the strategy to quote, updated in place.
+        :param balances: the balances already read, keyed by (token, account).
+        :yield: None
+        :return: the prices and the amounts out of the quote, empty when nothing was quoted.
+        """
+        is_swap_back = strategy["action"] == StrategyType.SWAP_BACK.value
+        if is_swap_back:
+            token_a = strategy["token_a"]["address"]
+            if balances is None:
+                balances = yield from self.get_balances([token_a])
+            token_balance, wallet_balance = self._get_safe_balance(balances, token_a)
+            self.context.logger.info(f"token,wallet balance: {token_balance} {wallet_balance}")
+            if token_balance <= 0:
+                self.context.logger.info(f"No {strategy['token_a']['ticker']} to swap back")
+                return [], []
+            strategy["token_a"]["amount_received"] = token_balance
 
-    matching_round: Type[AbstractRound] = StrategyEvaluationRound
+        source_token = strategy["token_a"]["address"] if is_swap_back else strategy["token_base"]["address"]
+        destination_token = strategy["token_base"]["address"] if is_swap_back else strategy["token_a"]["address"]
+        amount_in = strategy["token_a"]["amount_received"] if is_swap_back else strategy["token_base"]["amount_in_max_a"]
+
+        if strategy.get("arbitrage"):
+            return self._requote_cycle(strategy, amount_in)
+        if not is_swap_back:
+            amount_in = self._size_entry(source_token, destination_token, amount_in)
+            strategy["token_base"]["amount_in_max_a"] = amount_in
+
+        price_results = yield from self._get_amounts_and_prices(source_token, destination_token, amount_in)
+        self.context.logger.info(f"get_prices results {price_results}    {debug_str}")
+        prices, amounts_out, path = price_results
+        if not amounts_out or not prices:
+            return prices, amounts_out
+
+        strategy["path"] = path
+        destination_token_amount = amounts_out[-1]
+        if is_swap_back:
+            strategy["token_base"]["amount_min_after_swap_back_a"] = destination_token_amount
+        else:
+            strategy["token_a"]["amount_after_swap"] = destination_token_amount
+        return prices, amounts_out
+
+    def _size_entry(self, source_token: str, destination_token: str, amount_in: int) -> int:
+        """Size an entry in closed form on the pools of its best route, bounded by `max_price_impact`."""
+        route = find_best_route(
+            self.local_state.reserves,
+            amount_in,
+            source_token,
+            destination_token,
+            self.params.max_route_hops,
+            self.configured_tokens,
+        )
+        if route is None:
+            return amount_in
+        size = size_trade(
+            self.local_state.reserves,
+            route.path,
+            self.params.max_price_impact,
+            self.params.rebalancing_params["default_max_allowance"],
+        )
+        if not size:
+            return amount_in
+        self.context.logger.info(f"Entry along {list(route.path)} sized at {size}")
+        return size
+
+    def _requote_cycle(self, strategy: dict, amount_in: int) -> Tuple[List[float], List[int]]:
+        """Re-quote the selected cycles on the refreshed reserves; the swaps revert rather than lose."""
+        for trade in strategy.get("trades", []):
+            amounts = self.local_state.reserves.get_amounts_out(trade["amount_in"], trade["path"])
+            if amounts is not None:
+                trade["amount_out_min"] = max(amounts[-1], trade["amount_in"] + 1)
+
+        amounts = self.local_state.reserves.get_amounts_out(amount_in, strategy["path"])
+        if amounts is None:
+            self.context.logger.warning(f"Pools of the cycle {strategy['path']} are not cached")
+            return [], []
+        if amounts[-1] <= amount_in:
+            self.context.logger.warning(f"Cycle {strategy['path']} is no longer profitable: {amounts}")
+        strategy["token_a"]["amount_after_swap"] = max(amounts[-1], amount_in + 1)
+        return [float(amounts[-1] / amount_in)], amounts
+
+    def _get_amounts_and_prices(self, source_token: str, destination_token: str, amount_in: int):
+        self.context.logger.info(f"get_amounts_and_prices    {debug_str}")
+        route = find_best_route(
+            self.local_state.reserves,
+            amount_in,
+            source_token,
+            destination_token,
+            self.params.max_route_hops,
+            self.configured_tokens,
+        )
+        if route is not None:
+            path, amounts = list(route.path), list(route.amounts)
+        else:
+            path = [source_token, destination_token]
+            self.context.logger.info(f"No cached route for {path}, quoting through the router")
+            amounts = yield from self._get_router_amounts_out(amount_in, path)
+
+        if not amounts:
+            return [], [], path
+
+        self.context.logger.info(f"amounts out data:    {amounts}")
+        for i, amount in enumerate(amounts):
+            if amount <= 0:
+                self.context.logger.error(
+                    f"{debug_str} found zero amount for token {i+1}: {amounts}"
+                )
+                return [], [], path
+
+        self.context.logger.info(f"{debug_str} Amounts out: {amounts}")
+        price1 = float(amounts[0] / amount_in)
+        price2 = float(amounts[-1] / amounts[0])
+        return [price1, price2], amounts, path
+
+    def _get_router_amounts_out(self, amount_in: int, path: List[str]) -> Generator[None, None, List[int]]:
+        """Get the amounts out from the router's getAmountsOut."""
+        response = yield from self.read_contract_state(self._amounts_out_request(amount_in, path))
+
+        if response is None or response.performative != ContractApiMessage.Performative.STATE:
+            self.context.logger.error(
+                f"{debug_str} Getting the swap price failed: {response}"
+            )
+            return []
+
+        amounts = response.state.body.get("amounts", None)
+        if not amounts:
+            self.context.logger.error(
+                f"{debug_str} Getting amounts out failed: {response}"
+            )
+            return []
+        return amounts
+
+    def _amounts_out_request(self, amount_in: int, path: List[str]) -> Dict[str, Any]:
+        """Return the contract API request of `_get_router_amounts_out`."""
+        request = dict(
+            performative=ContractApiMessage.Performative.GET_STATE,  # type: ignore
+            contract_id=str(UniswapV2Router02.contract_id),
+            contract_callable="get_amounts_out",
+            contract_address=self.params.uni_router_address,
+            amount_in=amount_in,
+            path=path,
+            chain_id=GNOSIS_CHAIN_ID
+        )
+        return self._pin_request(request)
+
+
+class BlockPinningBehaviour(SwappingBaseBehaviour):  # pylint: disable=too-many-ancestors
+    """BlockPinningBehaviour"""
+
+    matching_round: Type[AbstractRound] = BlockPinningRound
 
     def async_act(self) -> Generator:
         """Do the act, supporting asynchronous execution."""
-   
         with self.context.benchmark_tool.measure(self.behaviour_id).local():
-            sender = self.context.agent_address
-            # Get the previous strategy or use the dummy one
-            strategy: dict = {}
-            try:
-                currentPeriod = self.synchronized_data.period_count
-                if currentPeriod != 0 :
-                    previous_round = self.synchronized_data.period_count - 1
-                    previous_strategy_data = self.synchronized_data.db._data[previous_round]["most_voted_strategy"]
-                    if len(previous_strategy_data) > 0:
-                        strategy = json.loads(previous_strategy_data[0])
-                        self.context.logger.info(strategy)
-                else:
-                    strategy = json.loads(self.synchronized_data.most_voted_strategy)
-                self.context.logger.info("Strategy Data found in try")
-                if strategy["action"] == StrategyType.ENTER.value:
-                    strategy["action"] = StrategyType.SWAP_BACK.value
-
-                elif strategy["action"] == StrategyType.SWAP_BACK.value:
-                    strategy = self.get_strategy()
+            block = None
+            if self.params.use_block_pinning:
+                block = yield from self.propose_read_block()
+            payload = BlockPinningPayload(self.context.agent_address, block)
 
-            except ValueError:
-                strategy = self.get_strategy()
-                self.context.logger.info("Strategy Data found in catch block")
+        with self.context.benchmark_tool.measure(self.behaviour_id).consensus():
+            yield from self.send_a2a_transaction(payload)
+            yield from self.wait_until_round_end()
 
-            if strategy["action"] == StrategyType.WAIT.value:  # pragma: nocover
-                self.context.logger.info("Current strategy is still optimal. Waiting.")
+        self.set_done()
 
-            if strategy["action"] == StrategyType.ENTER.value:
-                tokens = ['token_a', 'token_b', 'token_c', 'token_d', 'token_e', 'token_f']
-                selected_token_key = random.choice(tokens)
-                self.context.state.selected_token_key = selected_token_key
-                # Dynamically set the ticker and address based on selected token
-                strategy['token_a']['ticker'] = self.params.rebalancing_params[f"{selected_token_key}_ticker"]
-                strategy['token_a']['address'] = self.params.rebalancing_params[f"{selected_token_key}_address"]
+    def propose_read_block(self) -> Generator[None, None, Optional[int]]:
+        """
+        Propose to pin the reads of the period to the latest block less `block_pin_confirmations`.
 
-                self.context.logger.info(
-                    f"Performing strategy update: moving into {strategy['token_base']['ticker']}-{strategy['token_a']['ticker']} (pool swapper v2)"
-                )
+        The confirmations leave the nodes of the other agents time to see the block.
 
-            if strategy["action"] == StrategyType.EXIT.value:
-                self.context.logger.info(
-                    "Performing strategy update: moving out of "
-                    + f"{strategy['token_base']['ticker']}-{strategy['token_a']['ticker']} (pool swapper v2)"
-                )
+        :yield: None
+        :return: the proposed block, or None if the latest block could not be read.
+        """
+        response = yield from self.get_ledger_api_response(
+            performative=LedgerApiMessage.Performative.GET_STATE,  # type: ignore
+            ledger_callable="get_block_number",
+            chain_id=GNOSIS_CHAIN_ID,
+        )
+        if response.performative != LedgerApiMessage.Performative.STATE:
+            self.context.logger.error(f"Could not get the latest block, proposing no block: {response}")
+            return None
 
-            if strategy["action"] == StrategyType.SWAP_BACK.value:
-                self.context.logger.info(
-                    f"Performing strategy update: swapping back {strategy['token_a']['ticker']}, {strategy['token_base']['ticker']}"
-                )
-            
+        latest = cast(int, response.state.body["get_block_number_result"])
+        block = max(latest - self.params.block_pin_confirmations, 0)
+        self.context.logger.info(f"Proposing to pin the reads of the period to block {block}")
+        return block
+
+
+class StrategyEvaluationBehaviour(SwappingBaseBehaviour):  # pylint: disable=too-many-ancestors
+    """StrategyEvaluationBehaviour"""
+
+    matching_round: Type[AbstractRound] = StrategyEvaluationRound
+
+    def async_act(self) -> Generator:
+        """Do the act, supporting asynchronous execution."""
+
+        with self.context.benchmark_tool.measure(self.behaviour_id).local():
+            sender = self.context.agent_address
+            # every agent evaluates the strategy at the pinned block and votes its own digest
+            strategy = yield from self.evaluate_strategy()
             payload = StrategyEvaluationPayload(
-                sender, json.dumps(strategy, sort_keys=True)
+                sender, *self.get_strategy_vote(Strategy.from_dict(strategy))
             )
-            
+
         with self.context.benchmark_tool.measure(self.behaviour_id).consensus():
             yield from self.send_a2a_transaction(payload)
             yield from self.wait_until_round_end()
 
         self.set_done()
 
-    
+    def evaluate_strategy(self) -> Generator[None, None, dict]:
+        """Carry the strategy of the previous period over, or pick a new one, and prepare it."""
+        # Get the previous strategy or use the dummy one
+        strategy: dict = {}
+        try:
+            # the strategy of the previous period is carried over as a cross-period key
+            previous_strategy = self.synchronized_data.strategy
+            if previous_strategy is None:
+                raise ValueError("No strategy was agreed on yet")
+            strategy = previous_strategy.to_dict()
+            self.context.logger.info(strategy)
+            # the decision of the fast path, the quotes and the read block only hold for their period
+            for key in ("event", "quote_block", "quote_pins", "read_block"):
+                strategy.pop(key, None)
+            self.context.logger.info("Strategy Data found in try")
+            if strategy["action"] == StrategyType.ENTER.value and strategy.get("arbitrage"):
+                # a cycle ends in the base token, there is nothing to swap back
+                strategy = self.get_strategy()
+
+            elif strategy["action"] == StrategyType.ENTER.value:
+                strategy["action"] = StrategyType.SWAP_BACK.value
+                # the entry route goes the other way, the swap back is routed again when quoted
+                strategy.pop("path", None)
+                strategy.pop("trades", None)
+
+            elif strategy["action"] == StrategyType.SWAP_BACK.value:
+                strategy = self.get_strategy()
+
+        except ValueError:
+            strategy = self.get_strategy()
+            self.context.logger.info("Strategy Data found in catch block")
+
+        read_block = self.read_block
+        if read_block is not None:
+            strategy["read_block"] = read_block
+
+        if strategy["action"] == StrategyType.WAIT.value:  # pragma: nocover
+            self.context.logger.info("Current strategy is still optimal. Waiting.")
+
+        if strategy["action"] == StrategyType.ENTER.value:
+            yield from self.select_entry(strategy)
+
+            self.context.logger.info(
+                f"Performing strategy update: moving into {strategy['token_base']['ticker']}-{strategy['token_a']['ticker']} (pool swapper v2)"
+            )
+
+        if strategy["action"] == StrategyType.EXIT.value:
+            self.context.logger.info(
+                "Performing strategy update: moving out of "
+                + f"{strategy['token_base']['ticker']}-{strategy['token_a']['ticker']} (pool swapper v2)"
+            )
+
+        if strategy["action"] == StrategyType.SWAP_BACK.value:
+            self.context.logger.info(
+                f"Performing strategy update: swapping back {strategy['token_a']['ticker']}, {strategy['token_base']['ticker']}"
+            )
+
+        if self.params.use_fast_path and strategy["action"] in (
+            StrategyType.ENTER.value,
+            StrategyType.SWAP_BACK.value,
+        ):
+            # quote and decide locally, so that agents only need to agree once
+            yield from self.quote_strategy(strategy)
+            strategy["event"] = self.get_decision_event(
+                get_quoted_amounts(Strategy.from_dict(strategy)), strategy.get("trades", [])
+            )
+            self.context.logger.info(f"Fast path decision: {strategy['event']}")
+
+        return strategy
+
+    def select_entry(self, strategy: dict) -> Generator[None, None, None]:
+        """
+        Select the token and the size to enter.
+
+        Every (token, size) candidate is quoted at once on a ladder of sizes up to `default_max_allowance`,
+        and the largest trade within `max_price_impact` is chosen. Falls back to a random token at the
+        default size when no pool reserves are available.
+
+        :param strategy: the strategy to update.
+        :yield: None
+        """
+        rebalancing = self.params.rebalancing_params
+        token_keys = list(TOKEN_KEYS)
+        addresses = [rebalancing[f"{key}_address"] for key in token_keys]
+
+        yield from self.update_reserves()
+        if self.select_arbitrage(strategy):
+            return
+
+        ladder = build_quote_ladder(
+            self.local_state.reserves,
+            strategy["token_base"]["address"],
+            addresses,
+            size_ladder(rebalancing["default_max_allowance"], self.params.quote_ladder_steps),
+        )
+        best = ladder.best(self.params.max_price_impact) if ladder is not None else None
+        if best is None:
+            selected_token_key = random.choice(token_keys)
+        else:
+            token, ladder_amount = best
+            selected_token_key = token_keys[addresses.index(token)]
+            # the ladder only ranks the candidates, the size itself is the exact impact bound
+            amount_in = size_trade(
+                self.local_state.reserves,
+                [strategy["token_base"]["address"], token],
+                self.params.max_price_impact,
+                rebalancing["default_max_allowance"],
+            ) or ladder_amount
+            strategy["token_base"]["amount_in_max_a"] = amount_in
+            strategy["token_a"]["amount_after_swap"] = ladder.exact_amount_out(token, amount_in)
+            self.context.logger.info(
+                f"Quote ladder picked {token} across {len(ladder.tokens)} tokens, sized at {amount_in}"
+            )
+
+        self.context.state.selected_token_key = selected_token_key
+        # Dynamically set the ticker and address based on selected token
+        strategy['token_a']['ticker'] = rebalancing[f"{selected_token_key}_ticker"]
+        strategy['token_a']['address'] = rebalancing[f"{selected_token_key}_address"]
+
+    def select_arbitrage(self, strategy: dict) -> bool:
+        """
+        Select the most profitable cycles through the base token, if any.
+
+        The detector only re-examines the pools whose reserves changed since the previous period. Up to
+        `max_trades_per_period` cycles that share no pool are selected, so that each one is quoted
+        independently of the others; each is capped at `default_max_allowance` and re-quoted exactly.
+        The first cycle is also described by the single-trade fields of the strategy.
+
+        :param strategy: the strategy to update.
+        :return: whether a cycle was selected.
+        """
+        rebalancing = self.params.rebalancing_params
+        base_token = strategy["token_base"]["address"]
+        opportunities = self.arbitrage_detector.update(self.local_state.reserves, self.configured_tokens)
+        trades: List[dict] = []
+        used_pairs: Set[Tuple[str, str]] = set()
+        for opportunity in opportunities:
+            if len(trades) >= self.params.max_trades_per_period:
+                break
+            cycle = rotate_cycle(opportunity.path, base_token)
+            if cycle is None or opportunity.pairs & used_pairs:
+                continue
+            opportunity = evaluate_cycle(self.local_state.reserves, cycle)
+            if opportunity is None:
+                continue
+            amounts = list(opportunity.amounts)
+            if opportunity.amount_in > rebalancing["default_max_allowance"]:
+                amounts = self.local_state.reserves.get_amounts_out(rebalancing["default_max_allowance"], cycle)  # type: ignore
+            if amounts[-1] - amounts[0] <= self.params.min_arbitrage_profit:
+                continue
+
+            self.context.logger.info(
+                f"Arbitrage cycle {list(cycle)} yields {amounts[-1] - amounts[0]} for {amounts[0]} "
+                f"({len(opportunities)} opportunities)"
+            )
+            used_pairs |= opportunity.pairs
+            trades.append(
+                {
+                    "path": [base_token, *cycle[1:-1], base_token],
+                    "amount_in": amounts[0],
+                    "amount_out_min": amounts[-1],
+                }
+            )
+
+        if not trades:
+            return False
+
+        strategy["arbitrage"] = True
+        strategy["path"] = trades[0]["path"]
+        strategy["token_base"]["amount_in_max_a"] = trades[0]["amount_in"]
+        strategy["token_a"]["ticker"] = strategy["token_base"]["ticker"]
+        strategy["token_a"]["address"] = base_token
+        strategy["token_a"]["amount_after_swap"] = trades[0]["amount_out_min"]
+        if len(trades) > 1:
+            strategy["trades"] = trades
+        return True
+
     def get_strategy(self) -> dict:
         """Get a dummy strategy."""
         last_timestamp = cast(
@@ -246,6 +958,7 @@ class StrategyEvaluationBehaviour(SwappingBaseBehaviour):  # pylint: disable=too
         }
         return strategy
 
+
 class APICheckBehaviour(SwappingBaseBehaviour):  # pylint: disable=too-many-ancestors
     """APICheckBehaviour"""
 
@@ -256,13 +969,20 @@ class APICheckBehaviour(SwappingBaseBehaviour):  # pylint: disable=too-many-ance
         with self.context.benchmark_tool.measure(self.behaviour_id).local():
             sender = self.context.agent_address
             self.context.logger.info(f"APICheckBehaviour.async_act    {debug_str}")
-            strategy = json.loads(self.synchronized_data.most_voted_strategy)
-            self.context.logger.info(f"APICheckBehaviour.strategy    {strategy}")
-            yield from self.get_eq_prices(strategy=strategy)
+            strategy = self.synchronized_data.strategy.to_dict()  # type: ignore
             self.context.logger.info(f"APICheckBehaviour.strategy    {strategy}")
-            payload = APICheckPayload(
-                sender, json.dumps(strategy, sort_keys=True)
-            )
+            if self.params.use_keeper_quotes and not self.is_keeper:
+                # the keeper quotes for every agent, and the quotes are spot-checked before deciding
+                self.context.logger.info(f"Deferring the quotes to the keeper {self.synchronized_data.keeper}")
+                payload = APICheckPayload(sender, "")
+            else:
+                yield from self.quote_strategy(strategy)
+                if self.params.use_keeper_quotes:
+                    self.pin_quotes(strategy)
+                self.context.logger.info(f"APICheckBehaviour.strategy    {strategy}")
+                payload = APICheckPayload(
+                    sender, *self.get_strategy_vote(Strategy.from_dict(strategy))
+                )
 
         with self.context.benchmark_tool.measure(self.behaviour_id).consensus():
             yield from self.send_a2a_transaction(payload)
@@ -270,74 +990,30 @@ class APICheckBehaviour(SwappingBaseBehaviour):  # pylint: disable=too-many-ance
 
         self.set_done()
 
-    def get_eq_prices(self, strategy: dict) -> Generator[None, None, tuple[list[float], list[int]]]:
-        is_swap_back = False
-        if strategy["action"] == StrategyType.SWAP_BACK.value:
-            is_swap_back = True
-            token_a = strategy["token_a"]["address"]
-            token_balance, wallet_balance = yield from self.get_balance(token=token_a)
-            self.context.logger.info(f"token_a amount_received: {token_balance}")
-            self.context.logger.info(f"wallet balance: {wallet_balance} ")
-            if token_balance > 0:
-                self.context.logger.info(f"token,wallet balance: {token_balance} {wallet_balance}")
-                strategy["token_a"]["amount_received"] = token_balance #strategy["token_a"]["amount_after_swap"]
-                x = strategy["token_a"]["amount_received"]
-            else:
-                is_swap_back = False
+    def pin_quotes(self, strategy: dict) -> None:
+        """Add the reserves the quotes were computed from, and their block, for the other agents to check."""
+        reserves = self.local_state.reserves
+        paths = [strategy["path"]] if strategy.get("path") else []
+        paths += [trade["path"] for trade in strategy.get("trades", [])]
+        pins: Dict[str, dict] = {}
+        for path in paths:
+            for token_in, token_out in zip(path, path[1:]):
+                pair_address = reserves.pair_address(token_in, token_out)
+                if pair_address is None:
+                    continue
+                token0, token1 = pair_key(token_in, token_out)
+                reserve0, reserve1 = reserves.get_reserves(token0, token1)  # type: ignore
+                pins[pair_address] = {
+                    "pair": pair_address,
+                    "token0": token0,
+                    "token1": token1,
+                    "reserve0": reserve0,
+                    "reserve1": reserve1,
+                }
+        if reserves.block_number is not None:
+            strategy["quote_block"] = reserves.block_number
+        strategy["quote_pins"] = [pins[pair_address] for pair_address in sorted(pins)]
 
-        source_token = strategy["token_a"]["address"] if is_swap_back else strategy["token_base"]["address"]
-        destination_token = strategy["token_base"]["address"] if is_swap_back else strategy["token_a"]["address"]
-        amount_in = strategy["token_a"]["amount_received"] if is_swap_back else self.params.rebalancing_params["default_max_allowance"]
-
-        price_results = yield from self._get_amounts_and_prices(source_token, destination_token, amount_in)
-        self.context.logger.info(f"get_prices results {price_results}    {debug_str}")
-        prices, amounts_out = price_results
-        if not amounts_out or not prices:
-            return prices, amounts_out
-        
-        source_token_amount, destination_token_amount = amounts_out
-        if is_swap_back:
-            strategy["token_base"]["amount_min_after_swap_back_a"] = destination_token_amount
-        else:
-            strategy["token_a"]["amount_after_swap"] = destination_token_amount
-
-    def _get_amounts_and_prices(self, source_token: str, destination_token: str, amount_in: int):
-        self.context.logger.info(f"get_amounts_and_prices    {debug_str}")
-        response = yield from self.get_contract_api_response(
-            performative=ContractApiMessage.Performative.GET_STATE,  # type: ignore
-            contract_id=str(UniswapV2Router02.contract_id),
-            contract_callable="get_amounts_out",
-            contract_address=self.params.uni_router_address,
-            amount_in=amount_in,
-            path=[source_token, destination_token],
-            chain_id=GNOSIS_CHAIN_ID
-        )
-        
-        if response.performative != ContractApiMessage.Performative.STATE:
-            self.context.logger.error(
-                f"{debug_str} Getting the swap price failed: {response}"
-            )
-            return [], []
-
-        amounts = response.state.body.get("amounts", None)
-        if not amounts:
-            self.context.logger.error(
-                f"{debug_str} Getting amounts out failed: {response}"
-            )
-            return [], []
-        
-        self.context.logger.info(f"amounts out data:    {amounts}")
-        for i, amount in enumerate(amounts):
-            if amount <= 0:
-                self.context.logger.error(
-                    f"{debug_str} found zero amount for token {i+1}: {response}"
-                )
-                return [], []
-
-        self.context.logger.info(f"{debug_str} Amounts out: {amounts}")
-        price1 = float(amounts[0] / amount_in)
-        price2 = float(amounts[1] / amounts[0])
-        return [price1, price2], amounts
 
 class DecisionMakingBehaviour(SwappingBaseBehaviour):  # pylint: disable=too-many-ancestors
     """DecisionMakingBehaviour"""
@@ -349,6 +1025,10 @@ class DecisionMakingBehaviour(SwappingBaseBehaviour):  # pylint: disable=too-man
         with self.context.benchmark_tool.measure(self.behaviour_id).local():
             sender = self.context.agent_address
             event = self.get_event()
+            if self.params.use_keeper_quotes and event != Event.DONE.value:
+                verified = yield from self.verify_quotes(cast(Strategy, self.synchronized_data.strategy))
+                if not verified:
+                    event = Event.ERROR.value
             payload = DecisionMakingPayload(sender=sender, event=event)
 
         with self.context.benchmark_tool.measure(self.behaviour_id).consensus():
@@ -358,25 +1038,68 @@ class DecisionMakingBehaviour(SwappingBaseBehaviour):  # pylint: disable=too-man
         self.set_done()
 
     def get_event(self) -> str:
-        """Get the next event based on the amounts data."""
+        """Get the next event: DONE when nothing was quoted to trade, otherwise the decision on the trades."""
         amounts = self.synchronized_data.amounts
-        event = Event.DONE.value
         self.context.logger.info(f"DecisionMakingBehaviour get_event  amounts={amounts}   {debug_str}")
+        strategy = cast(Strategy, self.synchronized_data.strategy)
+        event = self.get_decision_event(amounts, strategy.trades if strategy else [])
+        self.context.logger.info(f"Event is {event}")
+        return event
 
-        # Check for specific condition to transition to TRANSACT event
-        if len(amounts) == 4 and amounts[0] and amounts[-1] > amounts[0]:
-            initial_amount = amounts[0] * 1e-18
-            final_amount = amounts[0] * 1e-18
-            ratio = final_amount / initial_amount
-            self.context.logger.info(f"DecisionMakingBehaviour get_event  initial_amount={initial_amount}, final_amount={final_amount}, ratio={ratio}    {debug_str}")
+    def verify_quotes(self, strategy: Strategy) -> Generator[None, None, bool]:
+        """
+        Check the quotes of the keeper.
 
-            # If the ratio exceeds 1.05, trigger a TRANSACT event
-            if ratio > 1.05:
-                event = Event.TRANSACT.value
+        Every quoted minimum must be at least the output of its path on the pinned reserves, which is
+        checked locally, and one pin, picked per agent, is read on chain at the pinned block.
+
+        :param strategy: the agreed strategy.
+        :yield: None
+        :return: whether the quotes hold.
+        """
+        if not strategy.quote_pins:
+            self.context.logger.warning("The strategy has no pinned reserves to check the quotes against")
+            return False
+        pinned = ReserveTable()
+        for pin in strategy.quote_pins:
+            pinned.update(pin["pair"], pin["token0"], pin["token1"], pin["reserve0"], pin["reserve1"])
+        for path, amount_in, quoted in self._get_quoted_paths(strategy):
+            try:
+                amounts = pinned.get_amounts_out(amount_in, path)
+            except ValueError:
+                amounts = None
+            if amounts is None or quoted < amounts[-1]:
+                self.context.logger.warning(f"The quote {quoted} along {path} does not match the pinned reserves")
+                return False
+
+        pin = random.Random(f"{self.context.agent_address}{strategy.quote_block}").choice(strategy.quote_pins)
+        response = yield from self.read_contract_state(
+            self._pairs_state_request([pin["pair"]], strategy.quote_block)
+        )
+        pairs_state = self._parse_pairs_state(response)
+        state = pairs_state["pairs"].get(pin["pair"]) if pairs_state is not None else None
+        if state is None or pair_key(state["token0"], state["token1"]) != pair_key(pin["token0"], pin["token1"]):
+            self.context.logger.warning(f"Could not spot-check the pinned pair {pin['pair']}")
+            return False
+        if (state["reserve0"], state["reserve1"]) != (pin["reserve0"], pin["reserve1"]):
+            self.context.logger.warning(f"The pinned reserves of {pin['pair']} differ from the chain: {state}")
+            return False
+        self.context.logger.info(f"Spot-checked the pinned reserves of {pin['pair']}")
+        return True
+
+    def _get_quoted_paths(self, strategy: Strategy) -> List[Tuple[List[str], int, int]]:
+        """Return the (path, amount in, quoted minimum out) of every swap of the strategy."""
+        base, token_a = strategy.token_base["address"], strategy.token_a["address"]
+        if strategy.action == StrategyType.SWAP_BACK.value:
+            path = list(strategy.path or (token_a, base))
+            amount_in = strategy.token_a.get("amount_received", 0)
+            return [(path, amount_in, strategy.token_base["amount_min_after_swap_back_a"])]
+        path = list(strategy.path or (base, token_a))
+        quoted = [(path, strategy.token_base["amount_in_max_a"], strategy.token_a["amount_after_swap"])]
+        for trade in strategy.trades:
+            quoted.append((list(trade["path"]), trade["amount_in"], trade["amount_out_min"]))
+        return quoted
 
-        self.context.logger.info(f"Event is {event}")
-        event = Event.TRANSACT.value
-        return str(event)
 
 class TxPreparationBehaviour(SwappingBaseBehaviour):  # pylint: disable=too-many-ancestors
     """TxPreparationBehaviour"""
@@ -387,39 +1110,83 @@ class TxPreparationBehaviour(SwappingBaseBehaviour):  # pylint: disable=too-many
         """Do the act, supporting asynchronous execution."""
         with self.context.benchmark_tool.measure(self.behaviour_id).local():
             sender = self.context.agent_address
-            strategy = json.loads(self.synchronized_data.most_voted_strategy)
+            strategy = cast(Strategy, self.synchronized_data.strategy)
             self.context.logger.info(f"TxPreparationBehaviour.strategy: {strategy}")
-            
-            is_swap_back = strategy["action"] == StrategyType.SWAP_BACK.value
-            source_token = strategy["token_a"]["address"] if is_swap_back else strategy["token_base"]["address"]
-            dest_token = strategy["token_base"]["address"] if is_swap_back else strategy["token_a"]["address"]
-            amount_in = strategy["token_a"]["amount_received"] if is_swap_back else strategy["token_base"]["amount_in_max_a"]
-            amount_out_min = strategy["token_base"]["amount_min_after_swap_back_a"] if is_swap_back else strategy["token_a"]["amount_after_swap"]
+
+            is_swap_back = strategy.action == StrategyType.SWAP_BACK.value
+            source_token = strategy.token_a["address"] if is_swap_back else strategy.token_base["address"]
+            dest_token = strategy.token_base["address"] if is_swap_back else strategy.token_a["address"]
+            amount_in = strategy.token_a["amount_received"] if is_swap_back else strategy.token_base["amount_in_max_a"]
+            amount_out_min = strategy.token_base["amount_min_after_swap_back_a"] if is_swap_back else strategy.token_a["amount_after_swap"]
             self.context.logger.info(f"Transaction amount_in: {amount_in}, amount_out_min: {amount_out_min}")
-            
+
             transactions = []
 
-            base_token = strategy["token_base"]["address"]
-            token_balance, wallet_balance = yield from self.get_balance(base_token)
+            base_token = strategy.token_base["address"]
+            path = list(strategy.path or (source_token, dest_token))
+            trades = strategy.trades or [
+                {"path": path, "amount_in": amount_in, "amount_out_min": amount_out_min}
+            ]
+            direct_pairs = None
+            if self.params.use_direct_pair_swaps:
+                direct_pairs = sorted(
+                    {pair for trade in trades for pair in self._get_path_pairs(trade["path"]) or []}
+                )
+            token_balance, wallet_balance = yield from self._get_balance_and_nonce(base_token, direct_pairs)
             xDAI_balance = wallet_balance / 10**18  # Convert to xDAI
             self.context.logger.info(f"xDAI Balance: {xDAI_balance}")
 
-            if xDAI_balance >= self.params.min_xdai_val:
+            use_native = self.params.use_native_swaps
+            amount_to_convert = 0
+            if not use_native and xDAI_balance >= self.params.min_xdai_val:
                 amount_to_convert = wallet_balance * 0.80
                 self.context.logger.info(f"Amount to convert: {amount_to_convert}")
-                exchange_tx = yield from self._build_exchange_tx(amount_to_convert)
+                exchange_tx = self._build_exchange_tx(amount_to_convert)
                 transactions.append(exchange_tx)
 
-            approval_tx = yield from self._build_approval_tx(source_token, amount_in)
-            transactions.append(approval_tx)
-
-            swap_tx = yield from self._build_arbitrage_swap_tx_v1(source_token, dest_token, amount_in, amount_out_min)
-            transactions.append(swap_tx)
+            native_available = wallet_balance
+            token_available = token_balance + (int(amount_to_convert) if base_token.lower() == WXDAI.lower() else 0)
+            # the cycles of an arbitrage start and end in the base token
+            endpoints = (base_token, base_token) if strategy.arbitrage else (source_token, dest_token)
+            for trade in trades:
+                path, amount_in, amount_out_min = list(trade["path"]), trade["amount_in"], trade["amount_out_min"]
+                if (path[0].lower(), path[-1].lower()) != tuple(token.lower() for token in endpoints):
+                    self.context.logger.error(f"Skipping the trade along {path}, which does not go from {endpoints[0]} to {endpoints[1]}")
+                    continue
+                # the router wraps and unwraps xDAI itself, so no separate deposit is needed
+                native_in = (
+                    use_native
+                    and not is_swap_back
+                    and path[0].lower() == WXDAI
+                    and native_available > token_available
+                )
+                native_out = use_native and path[-1].lower() == WXDAI and path[0].lower() != WXDAI
+
+                if not is_swap_back:
+                    available = native_available if native_in else token_available
+                    if available <= 0:
+                        self.context.logger.warning(f"Skipping the trade along {path}: no balance left to fund it")
+                        continue
+                    if available < amount_in:
+                        # a smaller trade gets a better price, so the scaled minimum still holds
+                        amount_out_min = amount_out_min * available // amount_in
+                        amount_in = available
+                        self.context.logger.info(f"Trade capped to the available balance: {amount_in}")
+                    if native_in:
+                        native_available -= amount_in
+                    elif not strategy.arbitrage:
+                        # the swaps of the multisend run in order, and a cycle gives back at least its
+                        # input in the base token before the next one, so only the native input is used up
+                        token_available -= amount_in
+
+                transactions.extend(
+                    self._build_trade_txs(path, amount_in, amount_out_min, native_in, native_out)
+                )
 
             self.context.logger.info(f"Prepared {len(transactions)} transactions for Multisend: {tx_debug_str}")
 
-            multisend_data = yield from self._build_multisend_tx(transactions)
-            self.context.logger.info(f"Multisend data: {multisend_data} {tx_debug_str}")
+            multisend_data = self._build_multisend_tx(transactions)
+            self.context.logger.info(f"Multisend data: {multisend_data.hex()} {tx_debug_str}")
 
             safe_tx_hash = yield from self._get_safe_tx_hash(multisend_data)
             self.context.logger.info(f"Safe transaction hash: {safe_tx_hash} {tx_debug_str}")
@@ -429,7 +1196,7 @@ class TxPreparationBehaviour(SwappingBaseBehaviour):  # pylint: disable=too-many
                 ether_value=0,
                 safe_tx_gas=SAFE_GAS,
                 to_address=self.params.multisend_contract_address,
-                data=bytes.fromhex(multisend_data),
+                data=multisend_data,
                 operation=SafeOperation.DELEGATE_CALL.value,  # type: ignore
             )
 
@@ -444,116 +1211,253 @@ class TxPreparationBehaviour(SwappingBaseBehaviour):  # pylint: disable=too-many
 
         self.set_done()
 
-    def _build_exchange_tx(self, amount_to_convert: int) -> Generator[None, None, dict]:
-        """Exchange xDAI to wxDAI."""
-        response_msg = yield from self.get_contract_api_response(
-            performative=ContractApiMessage.Performative.GET_STATE,  # type: ignore
-            contract_address=WXDAI,
-            contract_id=str(ERC20.contract_id),
-            contract_callable="build_deposit_tx",
-        )
+    def _build_trade_txs(
+        self, path: List[str], amount_in: int, amount_out_min: int, native_in: bool, native_out: bool
+    ) -> List[dict]:
+        """Build the sub-transactions of one trade, through the pairs directly or through the router."""
+        if self.params.use_direct_pair_swaps and not native_in and not native_out:
+            direct_txs = self._build_direct_swap_txs(path, amount_in, amount_out_min)
+            if direct_txs is not None:
+                return direct_txs
+
+        transactions = []
+        source_token = path[0]
+        safe = self.synchronized_data.safe_contract_address
+        router = self.params.uni_router_address
+        if not native_in:
+            allowance = self.local_state.allowances.get(source_token, safe, router)
+            if allowance is None or allowance < amount_in:
+                transactions.append(self._build_approval_tx(source_token, MAX_UINT256))
+                self.local_state.allowances.approve(source_token, safe, router, MAX_UINT256)
+            else:
+                self.context.logger.info(f"Allowance of {source_token} is sufficient: {allowance}")
 
-        if response_msg.performative != ContractApiMessage.Performative.STATE:
-            self.context.logger.info(f"Could not build deposit tx: {response_msg}")
-            return False
+        transactions.append(
+            self._build_arbitrage_swap_tx_v1(
+                path, amount_in, amount_out_min, native_in=native_in, native_out=native_out
+            )
+        )
+        if not native_in:
+            self.local_state.allowances.spend(source_token, safe, router, amount_in)
+        return transactions
 
-        approval_data = response_msg.state.body.get("data")
-        if approval_data is None:
-            self.context.logger.info(f"Could not build deposit tx: {response_msg}")
-            return False
-        
+    def _build_exchange_tx(self, amount_to_convert: int) -> dict:
+        """Exchange xDAI to wxDAI."""
         return {
             "operation": MultiSendOperation.CALL,
             "to": WXDAI,
             "value": int(amount_to_convert),
-            "data": HexBytes(approval_data),
+            "data": HexBytes(encode_deposit()),
         }
 
-    def _build_approval_tx(self, token: str, amount: int) -> Generator[None, None, dict]:
+    def _build_approval_tx(self, token: str, amount: int) -> dict:
         """Build approval transaction for a given token."""
-        contract_api_msg = yield from self.get_contract_api_response(
-            performative=ContractApiMessage.Performative.GET_RAW_TRANSACTION,
-            contract_address=token,
-            contract_id=str(ERC20.contract_id),
-            contract_callable="build_approval_tx",
-            spender=self.params.uni_router_address,
-            amount=amount,
-            chain_id=GNOSIS_CHAIN_ID
-        )
-        approve_data = cast(bytes, contract_api_msg.raw_transaction.body["data"])
         return {
             "operation": MultiSendOperation.CALL,
             "to": token,
             "value": 0,
-            "data": HexBytes(approve_data.hex()),
+            "data": HexBytes(encode_approve(self.params.uni_router_address, amount)),
         }
 
-    def _build_arbitrage_swap_tx_v1(self, source_token, dest_token, amount_in, amount_out_min) -> Generator[None, None, dict]:
-        """Build a swap transaction for arbitrage."""
+    def _build_arbitrage_swap_tx_v1(
+        self, path, amount_in, amount_out_min, native_in: bool = False, native_out: bool = False
+    ) -> dict:
+        """Build a swap transaction for arbitrage, selling or buying native xDAI if requested."""
         deadline = int(time.time() + 60 * 2)  # 2 minutes
-        contract_api_msg = yield from self.get_contract_api_response(
-            performative=ContractApiMessage.Performative.GET_RAW_TRANSACTION,
-            contract_address=self.params.uni_router_address,
-            contract_id=str(UniswapV2Router02.contract_id),
-            contract_callable="build_swap_transaction",
-            amount_in=amount_in,
-            amount_out_min=amount_out_min,
-            path=[source_token, dest_token],
-            to=self.synchronized_data.safe_contract_address,
-            deadline=deadline,
-            chain_id=GNOSIS_CHAIN_ID
-        )
-        swap_data = cast(bytes, contract_api_msg.raw_transaction.body["data"])
-
+        to = self.synchronized_data.safe_contract_address
+        value = 0
+        if native_in:
+            swap_data = encode_swap_exact_eth_for_tokens(amount_out_min, path, to, deadline)
+            value = amount_in
+        elif native_out:
+            swap_data = encode_swap_exact_tokens_for_eth(amount_in, amount_out_min, path, to, deadline)
+        else:
+            swap_data = encode_swap_exact_tokens_for_tokens(amount_in, amount_out_min, path, to, deadline)
         return {
             "operation": MultiSendOperation.CALL,
             "to": self.params.uni_router_address,
-            "value": 0,
-            "data": HexBytes(swap_data.hex()),
+            "value": value,
+            "data": HexBytes(swap_data),
         }
 
-    def _build_multisend_tx(self, txs: List[dict]) -> Generator[None, None, str]:
-        """Build the multisend transaction."""
-        contract_api_msg = yield from self.get_contract_api_response(
-            performative=ContractApiMessage.Performative.GET_RAW_TRANSACTION,
-            contract_address=self.params.multisend_contract_address,
-            contract_id=str(MultiSendContract.contract_id),
-            contract_callable="get_tx_data",
-            multi_send_txs=txs,
-            chain_id=GNOSIS_CHAIN_ID
-        )
-        self.context.logger.info(f"Contract API message: {contract_api_msg}")
-        return cast(str, contract_api_msg.raw_transaction.body["data"])[2:]
+    def _get_path_pairs(self, path: List[str]) -> Optional[List[str]]:
+        """Return the cached pair addresses along `path`, or None if one of them is unknown."""
+        pairs = [self.local_state.reserves.pair_address(a, b) for a, b in zip(path, path[1:])]
+        if any(pair is None for pair in pairs):
+            return None
+        return cast(List[str], pairs)
+
+    def _build_direct_swap_txs(
+        self, path: List[str], amount_in: int, amount_out_min: int
+    ) -> Optional[List[dict]]:
+        """
+        Build a swap that bypasses the router: a transfer into the first pair, then one `swap` per hop.
+
+        The outputs are computed from the reserves read in this round and checked against the pair's
+        fee-adjusted K invariant, exactly as `UniswapV2Pair.swap` does; each hop sends its output to the
+        next pair. Fee-on-transfer tokens are not supported.
+
+        :param path: the swap path.
+        :param amount_in: the input amount.
+        :param amount_out_min: the minimum output amount.
+        :return: the sub-transactions, or None to fall back to the router.
+        """
+        reserves = self.local_state.reserves
+        pairs = self._get_path_pairs(path)
+        amounts = reserves.get_amounts_out(amount_in, path)
+        if pairs is None or amounts is None or amounts[-1] < amount_out_min:
+            self.context.logger.info(f"Direct swap along {path} unavailable, using the router")
+            return None
 
-    def _get_safe_tx_hash(self, data: str) -> Generator[None, None, Optional[str]]:
-        """Prepare and return the safe transaction hash."""
-        response = yield from self.get_contract_api_response(
+        txs = [
+            {
+                "operation": MultiSendOperation.CALL,
+                "to": path[0],
+                "value": 0,
+                "data": HexBytes(encode_transfer(pairs[0], amount_in)),
+            }
+        ]
+        for hop, (token_in, token_out) in enumerate(zip(path, path[1:])):
+            reserve_in, reserve_out = cast(Tuple[int, int], reserves.get_reserves(token_in, token_out))
+            if not check_swap_invariant(reserve_in, reserve_out, amounts[hop], amounts[hop + 1]):
+                self.context.logger.warning(f"Direct swap {token_in} -> {token_out} breaks K, using the router")
+                return None
+            zero_for_one = pair_key(token_in, token_out)[0] == token_in.lower()
+            amount0_out, amount1_out = (0, amounts[hop + 1]) if zero_for_one else (amounts[hop + 1], 0)
+            to = pairs[hop + 1] if hop + 1 < len(pairs) else self.synchronized_data.safe_contract_address
+            txs.append(
+                {
+                    "operation": MultiSendOperation.CALL,
+                    "to": pairs[hop],
+                    "value": 0,
+                    "data": HexBytes(encode_swap(amount0_out, amount1_out, to, b"")),
+                }
+            )
+        self.context.logger.info(f"Direct swap along {path}: {amounts}")
+        return txs
+
+    def _build_multisend_tx(self, txs: List[dict]) -> bytes:
+        """Build the multisend transaction data."""
+        return encode_multisend(txs)
+
+    def get_safe_nonce(self) -> Generator[None, None, Optional[int]]:
+        """Get the safe nonce, read once per period."""
+        cached = self.local_state.safe_nonce
+        if cached is not None and cached[0] == self.synchronized_data.period_count:
+            return cached[1]
+
+        response = yield from self.get_contract_api_response(**self._safe_nonce_request())
+        return self._parse_safe_nonce(response)
+
+    def _safe_nonce_request(self) -> Dict[str, Any]:
+        """Return the contract API request of `get_safe_nonce`."""
+        return dict(
             performative=ContractApiMessage.Performative.GET_STATE,  # type: ignore
             contract_address=self.synchronized_data.safe_contract_address,
             contract_id=str(GnosisSafeContract.contract_id),
-            contract_callable="get_raw_safe_transaction_hash",
+            contract_callable="get_safe_nonce",
+            chain_id=GNOSIS_CHAIN_ID
+        )
+
+    def _parse_safe_nonce(self, response: Optional[ContractApiMessage]) -> Optional[int]:
+        """Parse the response of `get_safe_nonce` and cache the nonce for the period."""
+        if response is None or response.performative != ContractApiMessage.Performative.STATE:
+            self.context.logger.error(f"Failed to get the safe nonce: {response}")
+            return None
+
+        nonce = cast(int, response.state.body["safe_nonce"])
+        self.local_state.safe_nonce = (self.synchronized_data.period_count, nonce)
+        return nonce
+
+    def _get_balance_and_nonce(
+        self, token: str, pair_addresses: Optional[List[str]] = None
+    ) -> Generator[None, None, Tuple[int, int]]:
+        """
+        Read the balances of the safe and, unless cached, its nonce and allowances concurrently.
+
+        :param token: the token to read the balance of.
+        :param pair_addresses: if given, the state of these pairs is refreshed concurrently as well.
+        :yield: None
+        :return: the token and the native balance of the safe.
+        """
+        safe = self.synchronized_data.safe_contract_address
+        router = self.params.uni_router_address
+        requests = {"balances": self._balances_request([token])}
+        cached = self.local_state.safe_nonce
+        if cached is None or cached[0] != self.synchronized_data.period_count:
+            requests["nonce"] = self._safe_nonce_request()
+        stale_tokens = self.local_state.allowances.stale_tokens(self.configured_tokens, safe, router)
+        if stale_tokens:
+            requests["allowances"] = self._allowances_request(stale_tokens)
+        if pair_addresses:
+            requests["pairs"] = self._pairs_state_request(pair_addresses)
+
+        responses = yield from self.get_contract_api_responses(list(requests.values()))
+        response_by_name = dict(zip(requests, responses))
+        if "nonce" in response_by_name:
+            self._parse_safe_nonce(response_by_name["nonce"])
+        if "allowances" in response_by_name:
+            self._parse_allowances(response_by_name["allowances"])
+        if "pairs" in response_by_name:
+            pairs_state = self._parse_pairs_state(response_by_name["pairs"])
+            if pairs_state is not None:
+                self.local_state.reserves.update_from_state(pairs_state["pairs"], pairs_state["block_number"])
+        return self._get_safe_balance(self._parse_balances(response_by_name["balances"]), token)
+
+    def _allowances_request(self, tokens: List[str]) -> Dict[str, Any]:
+        """Return the contract API request reading the allowances of the safe to the router."""
+        request = dict(
+            performative=ContractApiMessage.Performative.GET_STATE,  # type: ignore
+            contract_address=self.params.multicall3_address,
+            contract_id=str(ERC20.contract_id),
+            contract_callable="check_allowances",
+            tokens=tokens,
+            owner=self.synchronized_data.safe_contract_address,
+            spender=self.params.uni_router_address,
+            chain_id=GNOSIS_CHAIN_ID,
+        )
+        return self._pin_request(request)
+
+    def _parse_allowances(self, response: Optional[ContractApiMessage]) -> None:
+        """Parse the allowances read from the chain into the allowance cache."""
+        if response is None or response.performative != ContractApiMessage.Performative.STATE:
+            self.context.logger.error(f"Could not get the allowances: {response}")
+            return
+
+        self.local_state.allowances.update(
+            self.synchronized_data.safe_contract_address,
+            self.params.uni_router_address,
+            cast(Dict[str, int], response.state.body.get("allowances", {})),
+        )
+
+    def _get_safe_tx_hash(self, data: bytes) -> Generator[None, None, Optional[str]]:
+        """Prepare and return the safe transaction hash."""
+        nonce = yield from self.get_safe_nonce()
+        if nonce is None:
+            return None
+
+        return get_safe_tx_hash(
+            chain_id=self.params.safe_chain_id,
+            safe_address=self.synchronized_data.safe_contract_address,
             to_address=self.params.multisend_contract_address,
             value=0,
             data=data,
             operation=SafeOperation.DELEGATE_CALL.value,
             safe_tx_gas=SAFE_GAS,
-            chain_id=GNOSIS_CHAIN_ID
+            nonce=nonce,
+            safe_version=self.params.safe_version,
         )
-        if response.performative != ContractApiMessage.Performative.STATE:
-            self.context.logger.error(f"Failed to get safe transaction hash: {response.performative.value}, {response}")
-            return None
 
-        tx_hash = cast(str, response.state.body["tx_hash"])[2:]
-        return tx_hash
-    
+
 class SwappingRoundBehaviour(AbstractRoundBehaviour):
     """SwappingRoundBehaviour"""
 
-    initial_behaviour_cls = StrategyEvaluationBehaviour
+    initial_behaviour_cls = BlockPinningBehaviour
     abci_app_cls = SwappingAbciApp  # type: ignore
     behaviours: Set[Type[BaseBehaviour]] = [  # type: ignore
+        BlockPinningBehaviour,
         APICheckBehaviour,
         DecisionMakingBehaviour,
         TxPreparationBehaviour,
         StrategyEvaluationBehaviour,
-    ]
\ No newline at end of file
+    ]
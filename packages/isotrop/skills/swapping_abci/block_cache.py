@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""This module contains the cache of the block-pinned reads of SwappingAbciApp."""
+
+from typing import Any, Dict, Mapping, Optional
+
+
+def get_request_key(request: Mapping[str, Any]) -> str:
+    """Return the cache key of a contract API request, i.e. everything but its performative."""
+    return repr(
+        sorted((key, value) for key, value in request.items() if key != "performative")
+    )
+
+
+def get_pinned_block(request: Mapping[str, Any]) -> Optional[int]:
+    """Return the block a request is pinned to, or None if it reads the latest state."""
+    block_identifier = request.get("block_identifier")
+    return block_identifier if isinstance(block_identifier, int) else None
+
+
+class BlockReadCache:
+    """
+    Responses of the read-only requests pinned to a block.
+
+    The state at a given block does not change, so a response is reused until the reads are pinned to
+    another block; only the responses of the current block are kept.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the cache."""
+        self.block: Optional[int] = None
+        self._responses: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        """Return the number of cached responses."""
+        return len(self._responses)
+
+    def get(self, request: Mapping[str, Any]) -> Optional[Any]:
+        """Return the cached response of a pinned request, if any."""
+        block = get_pinned_block(request)
+        if block is None or block != self.block:
+            return None
+        return self._responses.get(get_request_key(request))
+
+    def put(self, request: Mapping[str, Any], response: Any) -> None:
+        """Cache the response of a pinned request, dropping the responses of any other block."""
+        block = get_pinned_block(request)
+        if block is None:
+            return
+        if block != self.block:
+            self.block = block
+            self._responses = {}
+        self._responses[get_request_key(request)] = response
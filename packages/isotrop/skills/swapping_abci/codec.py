@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""
+This module contains the compact binary codec of the strategy payloads of SwappingAbciApp.
+
+A strategy is encoded as a version byte followed by its top-level section. A section starts with a
+varint bitmap of the fields it holds, followed by these fields in the fixed order of the schema:
+addresses take 20 bytes, unsigned integers and lengths are LEB128 varints, strings are UTF-8 and
+booleans take one byte. Any change to a schema needs a new version.
+"""
+
+import base64
+from typing import Any, Dict, List, Mapping, Tuple, Union
+
+from web3 import Web3
+
+
+ADDRESS = "address"
+UINT = "uint"
+STRING = "string"
+BOOL = "bool"
+
+ADDRESS_LENGTH = 20
+
+FieldType = Union[str, Tuple[Any, ...]]
+Schema = Tuple[Tuple[str, FieldType], ...]
+
+
+def list_of(field_type: FieldType) -> Tuple[str, FieldType]:
+    """Return the type of a list of `field_type` items."""
+    return ("list", field_type)
+
+
+SAFE_TX_GAS_SCHEMA: Schema = (
+    ("enter", UINT),
+    ("exit", UINT),
+    ("swap_back", UINT),
+)
+TOKEN_SCHEMA: Schema = (
+    ("ticker", STRING),
+    ("address", ADDRESS),
+    ("amount_in_max_a", UINT),
+    ("amount_min_after_swap_back_a", UINT),
+    ("amount_after_swap", UINT),
+    ("amount_min_after_add_liq", UINT),
+    ("amount_received", UINT),
+    ("amount_received_after_exit", UINT),
+    ("is_native", BOOL),
+    ("set_allowance", UINT),
+    ("remove_allowance", UINT),
+)
+TRADE_SCHEMA: Schema = (
+    ("path", list_of(ADDRESS)),
+    ("amount_in", UINT),
+    ("amount_out_min", UINT),
+)
+QUOTE_PIN_SCHEMA: Schema = (
+    ("pair", ADDRESS),
+    ("token0", ADDRESS),
+    ("token1", ADDRESS),
+    ("reserve0", UINT),
+    ("reserve1", UINT),
+)
+STRATEGY_SCHEMA_V1: Schema = (
+    ("action", STRING),
+    ("deadline", UINT),
+    ("chain", STRING),
+    ("safe_nonce", UINT),
+    ("safe_tx_gas", ("section", SAFE_TX_GAS_SCHEMA)),
+    ("token_base", ("section", TOKEN_SCHEMA)),
+    ("token_a", ("section", TOKEN_SCHEMA)),
+    ("token_LP", ("section", TOKEN_SCHEMA)),
+    ("path", list_of(ADDRESS)),
+    ("arbitrage", BOOL),
+    ("trades", list_of(("section", TRADE_SCHEMA))),
+    ("event", STRING),
+)
+
+STRATEGY_SCHEMA_V2: Schema = STRATEGY_SCHEMA_V1 + (
+    ("quote_block", UINT),
+    ("quote_pins", list_of(("section", QUOTE_PIN_SCHEMA))),
+)
+
+STRATEGY_SCHEMA_V3: Schema = STRATEGY_SCHEMA_V2 + (("read_block", UINT),)
+
+STRATEGY_SCHEMAS: Dict[int, Schema] = {
+    1: STRATEGY_SCHEMA_V1,
+    2: STRATEGY_SCHEMA_V2,
+    3: STRATEGY_SCHEMA_V3,
+}
+STRATEGY_SCHEMA_VERSION = 3
+
+
+def encode_varint(value: int) -> bytes:
+    """Encode an unsigned integer as a LEB128 varint."""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+        raise ValueError(f"Cannot encode {value!r} as an unsigned integer")
+    encoded = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            encoded.append(byte | 0x80)
+        else:
+            encoded.append(byte)
+            return bytes(encoded)
+
+
+def decode_varint(data: bytes, offset: int) -> Tuple[int, int]:
+    """Decode a LEB128 varint at `offset` and return it with the offset that follows it."""
+    value = 0
+    shift = 0
+    while True:
+        if offset >= len(data):
+            raise ValueError("Truncated varint")
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+
+
+def _encode_field(field_type: FieldType, value: Any) -> bytes:
+    """Encode a field of the given type."""
+    if field_type == ADDRESS:
+        address = bytes.fromhex(value[2:] if value.startswith("0x") else value)
+        if len(address) != ADDRESS_LENGTH:
+            raise ValueError(f"Invalid address {value!r}")
+        return address
+    if field_type == UINT:
+        return encode_varint(value)
+    if field_type == STRING:
+        encoded = value.encode("utf-8")
+        return encode_varint(len(encoded)) + encoded
+    if field_type == BOOL:
+        return b"\x01" if value else b"\x00"
+    kind, item_type = field_type
+    if kind == "list":
+        return encode_varint(len(value)) + b"".join(
+            _encode_field(item_type, item) for item in value
+        )
+    return _encode_section(item_type, value)
+
+
+def _decode_field(field_type: FieldType, data: bytes, offset: int) -> Tuple[Any, int]:
+    """Decode a field of the given type at `offset` and return it with the offset that follows it."""
+    if field_type == ADDRESS:
+        end = offset + ADDRESS_LENGTH
+        if end > len(data):
+            raise ValueError("Truncated address")
+        return Web3.to_checksum_address(data[offset:end]), end
+    if field_type == UINT:
+        return decode_varint(data, offset)
+    if field_type == STRING:
+        length, offset = decode_varint(data, offset)
+        if offset + length > len(data):
+            raise ValueError("Truncated string")
+        return data[offset : offset + length].decode("utf-8"), offset + length
+    if field_type == BOOL:
+        if offset >= len(data) or data[offset] > 1:
+            raise ValueError("Invalid boolean")
+        return data[offset] == 1, offset + 1
+    kind, item_type = field_type
+    if kind == "list":
+        length, offset = decode_varint(data, offset)
+        items: List[Any] = []
+        for _ in range(length):
+            item, offset = _decode_field(item_type, data, offset)
+            items.append(item)
+        return items, offset
+    return _decode_section(item_type, data, offset)
+
+
+def _encode_section(schema: Schema, section: Mapping[str, Any]) -> bytes:
+    """Encode a section as its presence bitmap followed by its fields, in the order of the schema."""
+    unknown = set(section) - {name for name, _ in schema}
+    if unknown:
+        raise ValueError(f"Fields {sorted(unknown)} are not in the schema")
+    bitmap = 0
+    fields = []
+    for index, (name, field_type) in enumerate(schema):
+        if name in section:
+            bitmap |= 1 << index
+            fields.append(_encode_field(field_type, section[name]))
+    return encode_varint(bitmap) + b"".join(fields)
+
+
+def _decode_section(
+    schema: Schema, data: bytes, offset: int
+) -> Tuple[Dict[str, Any], int]:
+    """Decode a section at `offset` and return it with the offset that follows it."""
+    bitmap, offset = decode_varint(data, offset)
+    if bitmap >> len(schema):
+        raise ValueError("Unknown fields in the section bitmap")
+    section: Dict[str, Any] = {}
+    for index, (name, field_type) in enumerate(schema):
+        if bitmap & (1 << index):
+            section[name], offset = _decode_field(field_type, data, offset)
+    return section, offset
+
+
+def encode_strategy(
+    strategy: Mapping[str, Any], version: int = STRATEGY_SCHEMA_VERSION
+) -> bytes:
+    """Encode a strategy in dict form with the schema of the given version."""
+    return bytes([version]) + _encode_section(STRATEGY_SCHEMAS[version], strategy)
+
+
+def decode_strategy_bytes(data: bytes) -> Dict[str, Any]:
+    """Decode an encoded strategy into its dict form, using the schema of its version byte."""
+    if not data:
+        raise ValueError("Empty strategy")
+    schema = STRATEGY_SCHEMAS.get(data[0])
+    if schema is None:
+        raise ValueError(f"Unknown strategy schema version {data[0]}")
+    strategy, offset = _decode_section(schema, data, 1)
+    if offset != len(data):
+        raise ValueError("Trailing bytes after the strategy")
+    return strategy
+
+
+def encode_strategy_payload(strategy: Mapping[str, Any]) -> str:
+    """Encode a strategy into the base64 text carried by the payloads."""
+    return base64.b64encode(encode_strategy(strategy)).decode("ascii")
+
+
+def decode_strategy_payload(payload: str) -> Dict[str, Any]:
+    """Decode the base64 text of a payload into a strategy in dict form."""
+    return decode_strategy_bytes(base64.b64decode(payload, validate=True))
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""This module contains the Sync-event reserve indexer of SwappingAbciApp."""
+
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from packages.isotrop.skills.swapping_abci.quoting import ReserveTable
+
+
+DEFAULT_REORG_WINDOW = 64
+
+Reserves = Tuple[int, int]
+
+
+class ReserveIndexer:
+    """
+    Keep the reserves of a set of pairs current by applying their `Sync` events.
+
+    Each applied block is journaled with its hash and the reserves it overwrote, and each cursor is
+    checkpointed with its hash, for the last `reorg_window` blocks. Only the newest tracked hash is
+    checked on each fetch, and the older ones are walked back only when it changed. The journal is then
+    unwound down to the last block that is still canonical; a reorg deeper than the window requires a
+    new snapshot.
+    The cursor, the reserves and the journal are persisted to `path`, so restarts resume from there.
+    """
+
+    def __init__(
+        self,
+        reserves: ReserveTable,
+        path: Optional[str] = None,
+        reorg_window: int = DEFAULT_REORG_WINDOW,
+    ) -> None:
+        """Initialize the indexer."""
+        self._table = reserves
+        self._path = path
+        self._reorg_window = reorg_window
+        self.cursor: Optional[int] = None
+        self.cursor_hash: Optional[str] = None
+        self._tokens: Dict[str, Tuple[str, str]] = {}
+        self._reserves: Dict[str, Reserves] = {}
+        # (block number, block hash, reserves before the block for every pair it changed)
+        self._journal: List[Tuple[int, str, Dict[str, Optional[Reserves]]]] = []
+        # (block number, block hash) of the previous cursors
+        self._checkpoints: List[Tuple[int, str]] = []
+
+    @property
+    def pairs(self) -> List[str]:
+        """Return the indexed pairs."""
+        return list(self._tokens)
+
+    def covers(self, pair_addresses: Iterable[str]) -> bool:
+        """Return whether the indexer is synced and tracks all the given pairs."""
+        return self.cursor is not None and all(
+            pair in self._tokens for pair in pair_addresses
+        )
+
+    def tracked_hashes(self) -> Dict[str, str]:
+        """Return the known hashes of the tracked blocks, to check them for a reorg from the newest one."""
+        hashes = {str(block): block_hash for block, block_hash, _ in self._journal}
+        hashes.update(
+            (str(block), block_hash) for block, block_hash in self._checkpoints
+        )
+        if self.cursor is not None and self.cursor_hash is not None:
+            hashes[str(self.cursor)] = self.cursor_hash
+        return hashes
+
+    def reset_from_state(
+        self, pairs_state: dict, block_number: int, block_hash: Optional[str] = None
+    ) -> None:
+        """Start indexing from a `UniswapV2Pair.get_pairs_state` snapshot taken at `block_number`."""
+        self._tokens.clear()
+        self._reserves.clear()
+        self._journal.clear()
+        self._checkpoints.clear()
+        for pair, state in pairs_state.items():
+            self._tokens[pair] = (state["token0"], state["token1"])
+            self._set(pair, (state["reserve0"], state["reserve1"]))
+        self.cursor = block_number
+        self.cursor_hash = block_hash
+        if block_hash is not None:
+            self._checkpoints.append((block_number, block_hash))
+        self._table.block_number = block_number
+        self.save()
+
+    def apply(
+        self, events: List[dict], to_block: int, block_hashes: Dict[str, str]
+    ) -> bool:
+        """
+        Apply the `Sync` events fetched from `cursor + 1` to `to_block`.
+
+        :param events: the events, as returned by `UniswapV2Pair.get_sync_events`, ordered.
+        :param to_block: the last block the events were fetched up to.
+        :param block_hashes: the current hashes of `to_block` and of the tracked blocks that were checked.
+        :return: whether the events were applied; False means a reorg was rolled back and they must be refetched.
+        """
+        if self.cursor is None:
+            raise ValueError(
+                "The indexer must be reset from a snapshot before applying events."
+            )
+
+        if self._rollback_reorg(block_hashes):
+            return False
+
+        block_changes: Dict[str, Optional[Reserves]] = {}
+        current_block: Optional[Tuple[int, str]] = None
+        for event in events:
+            block = (event["block_number"], event["block_hash"])
+            if block != current_block:
+                self._journal_block(current_block, block_changes)
+                current_block, block_changes = block, {}
+            pair = event["pair"]
+            if pair not in self._tokens:
+                continue
+            block_changes.setdefault(pair, self._reserves.get(pair))
+            self._set(pair, (event["reserve0"], event["reserve1"]))
+        self._journal_block(current_block, block_changes)
+
+        self.cursor = to_block
+        self.cursor_hash = block_hashes.get(str(to_block))
+        if self.cursor_hash is not None:
+            self._checkpoints.append((self.cursor, self.cursor_hash))
+        self._table.block_number = to_block
+        self._prune_journal()
+        self.save()
+        return True
+
+    def _journal_block(
+        self, block: Optional[Tuple[int, str]], changes: Dict[str, Optional[Reserves]]
+    ) -> None:
+        """Journal the changes of a block."""
+        if block is not None and changes:
+            self._journal.append((block[0], block[1], changes))
+
+    def _rollback_reorg(self, block_hashes: Dict[str, str]) -> bool:
+        """Unwind the journal down to the last canonical block; return whether a reorg was found."""
+        tracked = [(block, block_hash) for block, block_hash, _ in self._journal]
+        tracked.extend(self._checkpoints)
+        if self.cursor is not None and self.cursor_hash is not None:
+            tracked.append((self.cursor, self.cursor_hash))
+        orphaned = [
+            block
+            for block, block_hash in tracked
+            if block_hashes.get(str(block), block_hash) != block_hash
+        ]
+        if not orphaned:
+            return False
+
+        fork_block = min(orphaned)
+        canonical = [
+            (block, block_hash) for block, block_hash in tracked if block < fork_block
+        ]
+        if not canonical:
+            # the reorg is deeper than the window; the reserves cannot be trusted anymore
+            self.cursor = None
+            self.cursor_hash = None
+            self.save()
+            return True
+
+        self.cursor, self.cursor_hash = max(canonical)
+        self._checkpoints = [
+            entry for entry in self._checkpoints if entry[0] <= self.cursor
+        ]
+        while self._journal and self._journal[-1][0] > self.cursor:
+            _, _, changes = self._journal.pop()
+            for pair, previous in changes.items():
+                if previous is None:
+                    self._reserves.pop(pair, None)
+                else:
+                    self._set(pair, previous)
+        self._table.block_number = self.cursor
+        self.save()
+        return True
+
+    def _prune_journal(self) -> None:
+        """Drop the journaled blocks that fell out of the reorg window."""
+        if self.cursor is None:
+            return
+        oldest = self.cursor - self._reorg_window
+        self._journal = [entry for entry in self._journal if entry[0] > oldest]
+        self._checkpoints = [entry for entry in self._checkpoints if entry[0] > oldest]
+
+    def _set(self, pair: str, reserves: Reserves) -> None:
+        """Set the reserves of a pair, in the indexer and in the reserve table."""
+        self._reserves[pair] = reserves
+        token0, token1 = self._tokens[pair]
+        self._table.update(pair, token0, token1, *reserves)
+
+    def save(self) -> None:
+        """Persist the indexer state, if a path is set."""
+        if self._path is None:
+            return
+        state = {
+            "cursor": self.cursor,
+            "cursor_hash": self.cursor_hash,
+            "tokens": self._tokens,
+            "reserves": self._reserves,
+            "journal": self._journal,
+            "checkpoints": self._checkpoints,
+        }
+        tmp_path = f"{self._path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(state, file)
+        os.replace(tmp_path, self._path)
+
+    def load(self) -> bool:
+        """Restore the persisted indexer state; return whether there was one."""
+        if self._path is None or not os.path.exists(self._path):
+            return False
+        with open(self._path, encoding="utf-8") as file:
+            state = json.load(file)
+        self.cursor = state["cursor"]
+        self.cursor_hash = state["cursor_hash"]
+        self._tokens = {pair: tuple(tokens) for pair, tokens in state["tokens"].items()}  # type: ignore
+        self._reserves = {}
+        for pair, reserves in state["reserves"].items():
+            self._set(pair, tuple(reserves))  # type: ignore
+        self._journal = [
+            (
+                block,
+                block_hash,
+                {pair: tuple(r) if r is not None else None for pair, r in changes.items()},  # type: ignore
+            )
+            for block, block_hash, changes in state["journal"]
+        ]
+        self._checkpoints = [tuple(checkpoint) for checkpoint in state["checkpoints"]]  # type: ignore
+        self._table.block_number = self.cursor
+        return True
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""This module contains the vectorized quote ladder of SwappingAbciApp."""
+
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from packages.isotrop.skills.swapping_abci.quoting import (
+    FEE_DENOMINATOR,
+    FEE_NUMERATOR,
+    ReserveTable,
+    get_amount_out,
+)
+
+
+FEE_FACTOR = FEE_NUMERATOR / FEE_DENOMINATOR
+
+
+@dataclass(frozen=True)
+class QuoteLadder:
+    """
+    Approximate quotes of every (token, size) candidate, computed in one NumPy pass.
+
+    All arrays have the shape (len(tokens), len(sizes)). The values are float approximations,
+    meant for ranking candidates; the chosen trade must be re-quoted with `exact_amount_out`.
+    The price impact excludes the pool fee, i.e. it is only the slippage caused by the trade size.
+    """
+
+    source_token: str
+    tokens: Tuple[str, ...]
+    sizes: np.ndarray
+    reserves_in: np.ndarray
+    reserves_out: np.ndarray
+    amounts_out: np.ndarray
+    effective_prices: np.ndarray
+    price_impacts: np.ndarray
+
+    def best(self, max_price_impact: float) -> Optional[Tuple[str, int]]:
+        """
+        Return the candidate with the largest size within `max_price_impact`.
+
+        Sizes are denominated in the source token, so they are comparable across tokens.
+        Ties are broken by the lowest price impact.
+
+        :param max_price_impact: the maximum price impact, e.g. 0.01 for 1%.
+        :return: the (token, size) candidate, or None if no candidate is within the bound.
+        """
+        eligible = self.price_impacts <= max_price_impact
+        if not eligible.any():
+            return None
+        scores = np.where(eligible, self.sizes[np.newaxis, :], -np.inf)
+        best_size = scores.max()
+        impacts = np.where(scores == best_size, self.price_impacts, np.inf)
+        token_index, size_index = np.unravel_index(np.argmin(impacts), impacts.shape)
+        return self.tokens[token_index], int(self.sizes[size_index])
+
+    def exact_amount_out(self, token: str, amount_in: int) -> int:
+        """Return the exact integer output of the chosen trade, as the router would."""
+        index = self.tokens.index(token)
+        return get_amount_out(
+            amount_in, int(self.reserves_in[index]), int(self.reserves_out[index])
+        )
+
+
+def size_ladder(max_size: int, steps: int, min_fraction: float = 0.01) -> np.ndarray:
+    """Return `steps` geometrically spaced integer sizes from `max_size * min_fraction` to `max_size`."""
+    # token amounts overflow int64, so they are spaced as floats
+    sizes = np.geomspace(float(max_size) * min_fraction, float(max_size), num=steps)
+    return np.unique(np.floor(sizes).astype(np.float64))
+
+
+def build_quote_ladder(
+    reserves: ReserveTable,
+    source_token: str,
+    tokens: Sequence[str],
+    sizes: np.ndarray,
+) -> Optional[QuoteLadder]:
+    """
+    Quote every size of the ladder against every `source_token` -> token pair at once.
+
+    :param reserves: the cached reserves.
+    :param source_token: the token being sold.
+    :param tokens: the candidate tokens to buy; tokens without a cached pair are skipped.
+    :param sizes: the input sizes, denominated in `source_token`.
+    :return: the quote ladder, or None if no candidate pair is cached.
+    """
+    candidates: List[str] = []
+    reserves_in: List[int] = []
+    reserves_out: List[int] = []
+    for token in tokens:
+        token_reserves = reserves.get_reserves(source_token, token)
+        if token_reserves is None or token.lower() == source_token.lower():
+            continue
+        candidates.append(token)
+        reserves_in.append(token_reserves[0])
+        reserves_out.append(token_reserves[1])
+
+    if not candidates:
+        return None
+
+    r_in = np.asarray(reserves_in, dtype=np.float64)[:, np.newaxis]
+    r_out = np.asarray(reserves_out, dtype=np.float64)[:, np.newaxis]
+    amounts_in = np.asarray(sizes, dtype=np.float64)[np.newaxis, :]
+    amounts_in_with_fee = amounts_in * FEE_FACTOR
+    amounts_out = amounts_in_with_fee * r_out / (r_in + amounts_in_with_fee)
+    effective_prices = amounts_out / amounts_in
+    price_impacts = 1.0 - effective_prices / (FEE_FACTOR * r_out / r_in)
+
+    return QuoteLadder(
+        source_token=source_token,
+        tokens=tuple(candidates),
+        sizes=np.asarray(sizes, dtype=np.float64),
+        reserves_in=np.asarray(reserves_in, dtype=object),
+        reserves_out=np.asarray(reserves_out, dtype=object),
+        amounts_out=amounts_out,
+        effective_prices=effective_prices,
+        price_impacts=price_impacts,
+    )
@@ -19,7 +19,7 @@
 
 """This module contains the shared state for the abci skill of SwappingAbciApp."""
 
-from typing import Any
+from typing import Any, Optional, Tuple
 
 from packages.valory.skills.abstract_round_abci.models import BaseParams
 from packages.valory.skills.abstract_round_abci.models import (
@@ -29,6 +29,12 @@ from packages.valory.skills.abstract_round_abci.models import Requests as BaseRe
 from packages.valory.skills.abstract_round_abci.models import (
     SharedState as BaseSharedState,
 )
+from packages.isotrop.skills.swapping_abci.allowances import AllowanceCache
+from packages.isotrop.skills.swapping_abci.arbitrage import ArbitrageDetector
+from packages.isotrop.skills.swapping_abci.block_cache import BlockReadCache
+from packages.isotrop.skills.swapping_abci.indexer import ReserveIndexer
+from packages.isotrop.skills.swapping_abci.quoting import ReserveTable
+from packages.isotrop.skills.swapping_abci.registry import PairRegistry
 from packages.isotrop.skills.swapping_abci.rounds import SwappingAbciApp
 
 class SharedState(BaseSharedState):
@@ -36,6 +42,18 @@ class SharedState(BaseSharedState):
 
     abci_app_cls = SwappingAbciApp
 
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        """Initialize the state."""
+        super().__init__(*args, **kwargs)
+        self.reserves = ReserveTable()
+        self.reserve_indexer: Optional[ReserveIndexer] = None
+        self.pair_registry: Optional[PairRegistry] = None
+        self.arbitrage_detector: Optional[ArbitrageDetector] = None
+        self.allowances = AllowanceCache()
+        # (period, nonce) of the safe, read once per period
+        self.safe_nonce: Optional[Tuple[int, int]] = None
+        self.block_reads = BlockReadCache()
+
 
 Requests = BaseRequests
 BenchmarkTool = BaseBenchmarkTool
@@ -48,7 +66,29 @@ class Params(BaseParams):
         """Initialize the parameters object."""
         self.uni_router_address = kwargs.get("uni_router_address", None)
         self.multisend_contract_address = kwargs.get("multisend_contract_address", "0xA238CBeb142c10Ef7Ad8442C6D1f9E89e07e7761")
+        self.multicall3_address = kwargs.get("multicall3_address", "0xcA11bde05977b3631167028862bE2a173976CA11")
         self.rebalancing_params = self._ensure("rebalancing", kwargs,dict)
         self.min_xdai_val: int = self._ensure("min_xdai_val", kwargs, int)
+        self.pool_addresses: list = kwargs.get("pool_addresses", [])
+        self.uni_factory_address: str = kwargs.get("uni_factory_address", "0xA818b4F111Ccac7AA31D0BCc0806d64F2E0737D7")
+        self.pair_init_code_hash: str = kwargs.get("pair_init_code_hash", "0x3f88503e8580ab941773b59034fb4b2a63e86dbc031b3633a925533ad3ed2b93")
+        self.max_price_impact: float = kwargs.get("max_price_impact", 0.01)
+        self.quote_ladder_steps: int = kwargs.get("quote_ladder_steps", 32)
+        self.max_route_hops: int = kwargs.get("max_route_hops", 3)
+        self.max_cycle_length: int = kwargs.get("max_cycle_length", 4)
+        self.min_arbitrage_profit: int = kwargs.get("min_arbitrage_profit", 0)
+        self.safe_chain_id: int = kwargs.get("safe_chain_id", 100)
+        self.safe_version: str = kwargs.get("safe_version", "1.3.0")
+        self.use_native_swaps: bool = kwargs.get("use_native_swaps", False)
+        self.use_direct_pair_swaps: bool = kwargs.get("use_direct_pair_swaps", False)
+        self.max_trades_per_period: int = kwargs.get("max_trades_per_period", 1)
+        self.use_fast_path: bool = kwargs.get("use_fast_path", False)
+        self.use_digest_voting: bool = kwargs.get("use_digest_voting", False)
+        self.use_keeper_quotes: bool = kwargs.get("use_keeper_quotes", False)
+        self.use_block_pinning: bool = kwargs.get("use_block_pinning", False)
+        self.block_pin_confirmations: int = kwargs.get("block_pin_confirmations", 1)
+        self.use_sync_indexer: bool = kwargs.get("use_sync_indexer", False)
+        self.sync_indexer_chunk_size: int = kwargs.get("sync_indexer_chunk_size", 2000)
+        self.sync_indexer_reorg_window: int = kwargs.get("sync_indexer_reorg_window", 64)
 
         super().__init__(*args, **kwargs)
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""This module contains the in-process MultiSend encoding of SwappingAbciApp."""
+
+from typing import Dict, Iterable
+
+from packages.valory.contracts.erc20.contract import encode_bytes, encode_uint256
+from packages.valory.contracts.multisend.contract import MultiSendOperation
+
+
+MULTISEND_SELECTOR = bytes.fromhex("8d80ff0a")  # multiSend(bytes)
+
+
+def pack_transaction(tx: Dict) -> bytes:
+    """
+    Pack a sub-transaction, exactly as `MultiSendContract` does.
+
+    The layout is operation (1 byte), to (20 bytes), value (32 bytes), data length (32 bytes) and data.
+
+    :param tx: the sub-transaction, with `operation`, `to`, `value` and `data` keys.
+    :return: the packed sub-transaction.
+    """
+    operation = MultiSendOperation(tx.get("operation", MultiSendOperation.CALL))
+    to = int(tx["to"], 16).to_bytes(20, "big")
+    data = bytes(tx.get("data", b""))
+    return (
+        operation.value.to_bytes(1, "big")
+        + to
+        + int(tx.get("value", 0)).to_bytes(32, "big")
+        + len(data).to_bytes(32, "big")
+        + data
+    )
+
+
+def encode_multisend(txs: Iterable[Dict]) -> bytes:
+    """Return the `multiSend(bytes)` calldata of a list of sub-transactions."""
+    packed = b"".join(pack_transaction(tx) for tx in txs)
+    # the offset of the bytes argument, after the single head word
+    return MULTISEND_SELECTOR + encode_uint256(32) + encode_bytes(packed)
@@ -38,17 +38,27 @@ class StrategyType(Enum):
         """Get the string value of the strategy type."""
         return self.value
 
+
+@dataclass(frozen=True)
+class BlockPinningPayload(BaseTxPayload):
+    """Represent a transaction payload for the BlockPinningRound."""
+
+    block: Optional[int] = None
+
+
 @dataclass(frozen=True)
 class StrategyEvaluationPayload(BaseTxPayload):
     """Represent a transaction payload for the APICheckRound."""
 
     strategy: str
+    digest: Optional[str] = None
 
 @dataclass(frozen=True)
 class APICheckPayload(BaseTxPayload):
     """Represent a transaction payload for the APICheckRound."""
 
     strategy: str
+    digest: Optional[str] = None
 
 
 @dataclass(frozen=True)
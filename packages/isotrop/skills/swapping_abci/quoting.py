@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""This module contains the in-process Uniswap V2 quoting engine of SwappingAbciApp."""
+
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+
+FEE_NUMERATOR = 997
+FEE_DENOMINATOR = 1000
+
+PairKey = Tuple[str, str]
+
+
+def get_amount_out(amount_in: int, reserve_in: int, reserve_out: int) -> int:
+    """Return the output amount of a swap, exactly as `UniswapV2Library.getAmountOut`."""
+    if amount_in <= 0:
+        raise ValueError("UniswapV2Library: INSUFFICIENT_INPUT_AMOUNT")
+    if reserve_in <= 0 or reserve_out <= 0:
+        raise ValueError("UniswapV2Library: INSUFFICIENT_LIQUIDITY")
+    amount_in_with_fee = amount_in * FEE_NUMERATOR
+    numerator = amount_in_with_fee * reserve_out
+    denominator = reserve_in * FEE_DENOMINATOR + amount_in_with_fee
+    return numerator // denominator
+
+
+def check_swap_invariant(
+    reserve_in: int, reserve_out: int, amount_in: int, amount_out: int
+) -> bool:
+    """Return whether `UniswapV2Pair.swap` accepts `amount_out` for `amount_in`, i.e. whether the fee-adjusted K holds."""
+    if amount_out <= 0 or amount_out >= reserve_out or amount_in <= 0:
+        return False
+    balance_in = reserve_in + amount_in
+    balance_out = reserve_out - amount_out
+    fee = FEE_DENOMINATOR - FEE_NUMERATOR
+    balance_in_adjusted = balance_in * FEE_DENOMINATOR - amount_in * fee
+    balance_out_adjusted = balance_out * FEE_DENOMINATOR
+    return (
+        balance_in_adjusted * balance_out_adjusted
+        >= reserve_in * reserve_out * FEE_DENOMINATOR**2
+    )
+
+
+def pair_key(token_a: str, token_b: str) -> PairKey:
+    """Return the sorted, lower-cased key of a pair, i.e. (token0, token1)."""
+    token_a, token_b = token_a.lower(), token_b.lower()
+    return (token_a, token_b) if token_a < token_b else (token_b, token_a)
+
+
+class ReserveTable:
+    """Cached reserves of the Uniswap V2 pairs, keyed by their sorted tokens."""
+
+    def __init__(self) -> None:
+        """Initialize the table."""
+        self._reserves: Dict[PairKey, Tuple[int, int]] = {}
+        self._pairs: Dict[PairKey, str] = {}
+        self._neighbours: Dict[str, Set[str]] = {}
+        self.block_number: Optional[int] = None
+
+    def __len__(self) -> int:
+        """Return the number of cached pairs."""
+        return len(self._reserves)
+
+    def __iter__(self) -> Iterator[PairKey]:
+        """Iterate over the cached pair keys."""
+        return iter(self._reserves)
+
+    def update(
+        self, pair_address: str, token0: str, token1: str, reserve0: int, reserve1: int
+    ) -> None:
+        """Store the reserves of a pair."""
+        key = pair_key(token0, token1)
+        if key != (token0.lower(), token1.lower()):
+            reserve0, reserve1 = reserve1, reserve0
+        self._reserves[key] = (reserve0, reserve1)
+        self._pairs[key] = pair_address
+        self._neighbours.setdefault(key[0], set()).add(key[1])
+        self._neighbours.setdefault(key[1], set()).add(key[0])
+
+    def update_from_state(
+        self, pairs_state: dict, block_number: Optional[int] = None
+    ) -> None:
+        """Store the reserves returned by `UniswapV2Pair.get_pairs_state`."""
+        for pair_address, state in pairs_state.items():
+            self.update(
+                pair_address,
+                state["token0"],
+                state["token1"],
+                state["reserve0"],
+                state["reserve1"],
+            )
+        self.block_number = block_number
+
+    def neighbours(self, token: str) -> Set[str]:
+        """Return the tokens that have a cached pair with `token`, lower-cased."""
+        return self._neighbours.get(token.lower(), set())
+
+    def pair_address(self, token_a: str, token_b: str) -> Optional[str]:
+        """Return the address of the pair of two tokens, if cached."""
+        return self._pairs.get(pair_key(token_a, token_b))
+
+    def get_reserves(self, token_in: str, token_out: str) -> Optional[Tuple[int, int]]:
+        """Return (reserve_in, reserve_out) for a swap from `token_in` to `token_out`, if cached."""
+        key = pair_key(token_in, token_out)
+        reserves = self._reserves.get(key)
+        if reserves is None:
+            return None
+        if key[0] == token_in.lower():
+            return reserves
+        return reserves[1], reserves[0]
+
+    def get_amounts_out(
+        self, amount_in: int, path: Sequence[str]
+    ) -> Optional[List[int]]:
+        """
+        Return the amounts of a swap along `path`, exactly as `UniswapV2Router02.getAmountsOut`.
+
+        :param amount_in: the input amount.
+        :param path: the swap path of token addresses.
+        :return: the amounts, starting with `amount_in`, or None if a pair of the path is not cached.
+        """
+        if len(path) < 2:
+            raise ValueError("UniswapV2Library: INVALID_PATH")
+        amounts = [amount_in]
+        for token_in, token_out in zip(path, path[1:]):
+            reserves = self.get_reserves(token_in, token_out)
+            if reserves is None:
+                return None
+            amounts.append(get_amount_out(amounts[-1], *reserves))
+        return amounts
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""This module contains the Uniswap V2 pair registry of SwappingAbciApp."""
+
+from dataclasses import dataclass
+from itertools import combinations
+from typing import Dict, Iterable, List, Tuple
+
+from web3 import Web3
+
+from packages.isotrop.skills.swapping_abci.quoting import PairKey, pair_key
+
+
+@dataclass(frozen=True)
+class PairInfo:
+    """A Uniswap V2 pair, with its tokens in the pair's own order."""
+
+    address: str
+    token0: str
+    token1: str
+
+
+def compute_pair_address(
+    factory: str, init_code_hash: str, token_a: str, token_b: str
+) -> str:
+    """Derive the CREATE2 address of a pair, exactly as `UniswapV2Library.pairFor`."""
+    token0, token1 = pair_key(token_a, token_b)
+    salt = Web3.keccak(bytes.fromhex(token0[2:]) + bytes.fromhex(token1[2:]))
+    digest = Web3.keccak(
+        b"\xff" + bytes.fromhex(factory[2:]) + salt + bytes.fromhex(init_code_hash[2:])
+    )
+    return Web3.to_checksum_address(digest[12:])
+
+
+class PairRegistry:
+    """Memoized pair addresses and token orderings, derived locally from the factory."""
+
+    def __init__(self, factory: str, init_code_hash: str) -> None:
+        """Initialize the registry."""
+        self.factory = factory
+        self.init_code_hash = init_code_hash
+        self._pairs: Dict[PairKey, PairInfo] = {}
+
+    def __len__(self) -> int:
+        """Return the number of registered pairs."""
+        return len(self._pairs)
+
+    def get_pair(self, token_a: str, token_b: str) -> PairInfo:
+        """Return the pair of two tokens, deriving it on first use."""
+        key = pair_key(token_a, token_b)
+        pair = self._pairs.get(key)
+        if pair is None:
+            address = compute_pair_address(self.factory, self.init_code_hash, *key)
+            pair = PairInfo(address, *key)
+            self._pairs[key] = pair
+        return pair
+
+    def get_orientation(self, token_in: str, token_out: str) -> Tuple[PairInfo, bool]:
+        """Return the pair of a swap and whether it sells token0 for token1."""
+        pair = self.get_pair(token_in, token_out)
+        return pair, pair.token0 == token_in.lower()
+
+    def register(self, tokens: Iterable[str]) -> List[PairInfo]:
+        """Derive the pairs of every combination of `tokens`."""
+        return [
+            self.get_pair(token_a, token_b)
+            for token_a, token_b in combinations(tokens, 2)
+        ]
@@ -20,8 +20,10 @@
 """This package contains the rounds of SwappingAbciApp."""
 
 import json
+from collections import Counter
 from enum import Enum
-from typing import Dict, FrozenSet, Mapping, Optional, Set, Tuple,Type, cast
+from types import MappingProxyType
+from typing import Any, Callable, Dict, FrozenSet, List, Mapping, Optional, Set, Tuple, Type, cast
 from abc import ABC
 
 from packages.valory.skills.abstract_round_abci.base import (
@@ -30,6 +32,7 @@ from packages.valory.skills.abstract_round_abci.base import (
     AbciAppTransitionFunction,
     AppState,
     BaseSynchronizedData,
+    BaseTxPayload,
     CollectSameUntilThresholdRound,
     CollectionRound,
     DegenerateRound,
@@ -39,11 +42,13 @@ from packages.valory.skills.abstract_round_abci.base import (
 )
 from packages.isotrop.skills.swapping_abci.payloads import (
     APICheckPayload,
+    BlockPinningPayload,
     DecisionMakingPayload,
     TxPreparationPayload,
     StrategyType,
     StrategyEvaluationPayload,
 )
+from packages.isotrop.skills.swapping_abci.strategy import Strategy, get_strategy_digest
 
 
 class Event(Enum):
@@ -60,6 +65,54 @@ class Event(Enum):
     DONE_SWAP_BACK = "done_swap_back"
 
 
+def get_quoted_amounts(strategy: Strategy) -> Tuple[int, ...]:
+    """
+    Return the (amount in, quoted minimum out) of every swap of a strategy, flattened, in wei.
+
+    The path of a strategy is only set once it was quoted, so a strategy without one has no amounts.
+    """
+    if strategy.path is None:
+        return ()
+    if strategy.trades:
+        swaps = [(trade["amount_in"], trade["amount_out_min"]) for trade in strategy.trades]
+    elif strategy.action == StrategyType.SWAP_BACK.value:
+        swaps = [
+            (strategy.token_a.get("amount_received", 0), strategy.token_base["amount_min_after_swap_back_a"])
+        ]
+    else:
+        swaps = [(strategy.token_base["amount_in_max_a"], strategy.token_a["amount_after_swap"])]
+    return tuple(int(amount) for swap in swaps for amount in swap)
+
+
+def get_quoted_prices(amounts: Tuple[int, ...]) -> Tuple[float, ...]:
+    """Return the price of every swap of the flattened (amount in, amount out) amounts."""
+    return tuple(
+        amount_out / amount_in if amount_in else 0.0
+        for amount_in, amount_out in zip(amounts[::2], amounts[1::2])
+    )
+
+
+def decode_prices(stored: Any) -> Tuple[float, ...]:
+    """Decode the stored prices, also accepting the legacy JSON list."""
+    if isinstance(stored, str):
+        stored = json.loads(stored)
+    return tuple(float(price) for price in stored)
+
+
+def decode_amounts(stored: Any) -> Tuple[int, ...]:
+    """
+    Decode the stored amounts, kept in wei.
+
+    They are uint256 values, so they do not fit the fixed-width array typecodes and are kept as a tuple.
+    The legacy JSON form maps an index to each amount.
+    """
+    if isinstance(stored, str):
+        if not stored:
+            return ()
+        stored = [amount for _, amount in sorted(json.loads(stored).items(), key=lambda x: x[0])]
+    return tuple(int(amount) for amount in stored)
+
+
 class SynchronizedData(BaseSynchronizedData):
     """
     Class to represent the synchronized data.
@@ -67,23 +120,43 @@ class SynchronizedData(BaseSynchronizedData):
     This data is replicated by the tendermint application.
     """
 
+    # key -> (stored value, decoded value), shared by the instances built over the same DB
+    _decoded: Dict[str, Tuple[Any, Any]] = {}
+
+    def _get_decoded(self, key: str, decode: Callable[[Any], Any], default: Any = None) -> Any:
+        """
+        Get a value decoded from the DB, decoding it only once per DB update.
+
+        A DB update stores a new object under the key, so the cache is validated on the identity of
+        the stored object; holding a reference to it guarantees its identity is not reused. The decoded
+        value is shared by every reader, so `decode` must return an immutable value.
+        """
+        stored = self.db.get(key, None)
+        if stored is None:
+            return default
+        cached = self._decoded.get(key)
+        if cached is not None and cached[0] is stored:
+            return cached[1]
+        decoded = decode(stored)
+        self._decoded[key] = (stored, decoded)
+        return decoded
+
     def _get_deserialized(self, key: str) -> DeserializedCollection:
         """Strictly get a collection and return it deserialized."""
-        serialized = self.db.get_strict(key)
-        return CollectionRound.deserialize_collection(serialized)
+        self.db.get_strict(key)
+        return self._get_decoded(
+            key, lambda stored: MappingProxyType(CollectionRound.deserialize_collection(stored))
+        )
 
     @property
-    def prices(self) -> Optional[list]:
-        return self.db.get("prices", None)
+    def prices(self) -> Optional[Tuple[float, ...]]:
+        """Get the quoted price of every swap."""
+        return self._get_decoded("prices", decode_prices)
 
     @property
-    def amounts(self) -> Optional[list]:
-        amounts_str = self.db.get("amounts", "")
-        amounts = []
-        if amounts_str:
-            amounts = [a for _, a in sorted(json.loads(amounts_str).items(), key=lambda x: x[0])]
-
-        return amounts
+    def amounts(self) -> Tuple[int, ...]:
+        """Get the (amount in, quoted minimum out) of every swap, flattened."""
+        return self._get_decoded("amounts", decode_amounts, ())
 
     @property
     def participant_to_price_round(self) -> DeserializedCollection:
@@ -105,10 +178,31 @@ class SynchronizedData(BaseSynchronizedData):
         """Get the round that submitted a tx to transaction_settlement_abci."""
         return str(self.db.get_strict("tx_submitter"))
     
+    @property
+    def keeper(self) -> str:
+        """
+        Get the keeper of the current round.
+
+        It is elected from the sorted participants by the round count, which every agent agrees on, so
+        that a round retried after a missing keeper elects the next agent.
+        """
+        participants = sorted(self.participants)
+        return participants[self.round_count % len(participants)]
+
+    @property
+    def read_block(self) -> Optional[int]:
+        """Get the block the reads of the period are pinned to, or None if they read the latest state."""
+        return cast(Optional[int], self.db.get("read_block", None))
+
     @property
     def most_voted_strategy(self) -> str:
-        """Get the most_voted_strategy."""
+        """Get the most_voted_strategy, which also describes the open position across periods."""
         return cast(str, self.db.get("most_voted_strategy"))
+
+    @property
+    def strategy(self) -> Optional[Strategy]:
+        """Get the decoded most_voted_strategy, parsed once per DB value."""
+        return self._get_decoded("most_voted_strategy", Strategy.deserialize)
     
     @property
     def final_tx_hash(self) -> str:
@@ -142,9 +236,110 @@ class LiquidityRebalancingAbstractRound(AbstractRound[Event], ABC):
         return self.synchronized_data, Event.NO_MAJORITY
     
 
-class StrategyEvaluationRound(
-    CollectSameUntilThresholdRound,LiquidityRebalancingAbstractRound
-):
+class BlockPinningRound(CollectionRound, LiquidityRebalancingAbstractRound):
+    """
+    A round in which agents agree on the block the reads of the period are pinned to.
+
+    Every agent proposes the latest block it sees less the confirmations, and the median proposal is
+    pinned once the proposals reach the threshold. With less than a third of faulty agents, the median
+    is within the blocks proposed by the others, so no single agent picks the block. An agent that does
+    not pin proposes no block, and the reads are not pinned once the threshold can no longer be reached.
+    """
+
+    payload_class = BlockPinningPayload
+    synchronized_data_class = SynchronizedData
+
+    @property
+    def proposed_blocks(self) -> List[int]:
+        """Get the blocks proposed so far, sorted."""
+        blocks = (cast(BlockPinningPayload, payload).block for payload in self.collection.values())
+        return sorted(block for block in blocks if block is not None)
+
+    def end_block(self) -> Optional[Tuple[BaseSynchronizedData, Event]]:
+        """Process the end of the block."""
+        threshold = self.synchronized_data.consensus_threshold
+        blocks = self.proposed_blocks
+        if len(blocks) >= threshold:
+            read_block: Optional[int] = blocks[len(blocks) // 2]
+        elif len(self.collection) - len(blocks) > self.synchronized_data.nb_participants - threshold:
+            # too many agents proposed no block for the proposals to ever reach the threshold
+            read_block = None
+        else:
+            return None
+        synchronized_data = self.synchronized_data.update(
+            read_block=read_block,
+            synchronized_data_class=SynchronizedData,
+        )
+        return synchronized_data, Event.DONE
+
+
+class StrategyVotingRound(CollectSameUntilThresholdRound, LiquidityRebalancingAbstractRound, ABC):
+    """
+    A round in which agents agree on a strategy.
+
+    A payload votes with the digest of its strategy if it has one, and with the strategy itself
+    otherwise. With digest voting, only the keeper sends the strategy, which is taken as the most voted
+    payload once the digest reaches the threshold and the strategy is checked against it. With keeper
+    quotes, a payload with neither defers to the keeper and votes like the keeper's payload; the quotes
+    are then spot-checked before the decision.
+    """
+
+    @staticmethod
+    def _get_vote(payload: BaseTxPayload) -> Optional[str]:
+        """Get the vote of a payload, or None if it defers to the keeper."""
+        digest = getattr(payload, "digest", None)
+        return digest if digest is not None else getattr(payload, "strategy") or None
+
+    @property
+    def keeper_vote(self) -> Optional[str]:
+        """Get the vote of the keeper, if its payload was received."""
+        payload = self.collection.get(self.synchronized_data.keeper)
+        return self._get_vote(payload) if payload is not None else None
+
+    @property
+    def vote_counts(self) -> Counter:
+        """Get the number of payloads per vote, the deferring ones counting for the keeper."""
+        keeper_vote = self.keeper_vote
+        votes = (self._get_vote(payload) or keeper_vote for payload in self.collection.values())
+        return Counter(vote for vote in votes if vote is not None)
+
+    @property
+    def most_voted_payload(self) -> Optional[str]:
+        """Get the strategy voted by at least the threshold, if its body was received."""
+        vote_counts = self.vote_counts
+        if not vote_counts:
+            # no payload is in yet, or only the ones deferring to the keeper
+            return None
+        vote, count = vote_counts.most_common(1)[0]
+        if count < self.synchronized_data.consensus_threshold:
+            return None
+        for payload in self.collection.values():
+            strategy = getattr(payload, "strategy")
+            if not strategy or self._get_vote(payload) != vote:
+                continue
+            if getattr(payload, "digest", None) is None or get_strategy_digest(strategy) == vote:
+                return strategy
+        return None
+
+    @property
+    def threshold_reached(self) -> bool:
+        """Check that a strategy reached the threshold and its body was received."""
+        return self.most_voted_payload is not None
+
+    def is_vote_majority_possible(self) -> bool:
+        """Check whether a vote can still reach the threshold with the payloads yet to come."""
+        remaining = self.synchronized_data.nb_participants - len(self.collection)
+        if self.synchronized_data.keeper not in self.collection:
+            # the deferring payloads still count for the keeper, whose payload may yet come
+            remaining += sum(self._get_vote(payload) is None for payload in self.collection.values())
+        if remaining <= 0:
+            # every payload is in, so a missing keeper body can no longer arrive
+            return self.threshold_reached
+        best = max(self.vote_counts.values(), default=0)
+        return best + remaining >= self.synchronized_data.consensus_threshold
+
+
+class StrategyEvaluationRound(StrategyVotingRound):
     """A round in which agents evaluate the financial strategy"""
 
     #round_id = "strategy_evaluation"
@@ -158,38 +353,41 @@ class StrategyEvaluationRound(
                 most_voted_strategy=self.most_voted_payload,
                 synchronized_data_class=SynchronizedData,
             )
-            strategy = json.loads(self.most_voted_payload)
-            if strategy["action"] == StrategyType.WAIT.value:
+            strategy = Strategy.deserialize(self.most_voted_payload)
+            if strategy.event is not None:
+                # the fast path already quoted the strategy and decided on it
+                return synchronized_data, Event(strategy.event)
+            if strategy.action == StrategyType.WAIT.value:
                 return synchronized_data, Event.DONE
-            if strategy["action"] == StrategyType.ENTER.value:
+            if strategy.action == StrategyType.ENTER.value:
                 return synchronized_data, Event.DONE_ENTER
-            if strategy["action"] == StrategyType.EXIT.value:
+            if strategy.action == StrategyType.EXIT.value:
                 return synchronized_data, Event.DONE
-            if strategy["action"] == StrategyType.SWAP_BACK.value:
+            if strategy.action == StrategyType.SWAP_BACK.value:
                 return synchronized_data, Event.DONE_ENTER
-        if not self.is_majority_possible(
-            self.collection, self.synchronized_data.nb_participants
-        ):
+        if not self.is_vote_majority_possible():
             return self._return_no_majority_event()
         return None
 
 
-class APICheckRound(CollectSameUntilThresholdRound,LiquidityRebalancingAbstractRound):
+class APICheckRound(StrategyVotingRound):
     """APICheckRound"""
 
     payload_class = APICheckPayload
     def end_block(self) -> Optional[Tuple[BaseSynchronizedData, Event]]:
         """Process the end of the block."""
         if self.threshold_reached:
+            # the quote is stored in its typed form, so that the decision reads it without parsing
+            amounts = get_quoted_amounts(Strategy.deserialize(cast(str, self.most_voted_payload)))
             synchronized_data = self.synchronized_data.update(
                 most_voted_strategy=self.most_voted_payload,
+                amounts=amounts,
+                prices=get_quoted_prices(amounts),
                 synchronized_data_class=SynchronizedData,
             )
             return synchronized_data, Event.DONE
 
-        if not self.is_majority_possible(
-            self.collection, self.synchronized_data.nb_participants
-        ):
+        if not self.is_vote_majority_possible():
             return self._return_no_majority_event()
         return None
 
@@ -214,7 +412,7 @@ class DecisionMakingRound(CollectSameUntilThresholdRound,LiquidityRebalancingAbs
 
         return None
 
-    # Event.DONE, Event.ERROR, Event.TRANSACT, Event.ROUND_TIMEOUT  # this needs to be referenced for static checkers
+    # Event.DONE, Event.ERROR, Event.TRANSACT, Event.MULTI_TRANSACT, Event.ROUND_TIMEOUT  # this needs to be referenced for static checkers
 
 
 class TxPreparationRound(CollectSameUntilThresholdRound,LiquidityRebalancingAbstractRound):
@@ -247,16 +445,22 @@ class FinishedStrategyEvaluationRound(DegenerateRound):
 class SwappingAbciApp(AbciApp[Event]):
     """SwappingAbciApp"""
 
-    initial_round_cls: AppState = StrategyEvaluationRound
+    initial_round_cls: AppState = BlockPinningRound
     initial_states: Set[AppState] = {
-        StrategyEvaluationRound,
+        BlockPinningRound,
     }
     transition_function: AbciAppTransitionFunction = {
+        BlockPinningRound: {
+            Event.ROUND_TIMEOUT: BlockPinningRound,
+            Event.DONE: StrategyEvaluationRound,
+        },
         StrategyEvaluationRound: {
             Event.NO_MAJORITY: StrategyEvaluationRound,
             Event.ROUND_TIMEOUT: StrategyEvaluationRound,
             Event.DONE: FinishedStrategyEvaluationRound,
             Event.DONE_ENTER: APICheckRound,
+            Event.TRANSACT: TxPreparationRound,
+            Event.MULTI_TRANSACT: TxPreparationRound,
         },
         APICheckRound: {
             Event.NO_MAJORITY: APICheckRound,
@@ -269,6 +473,7 @@ class SwappingAbciApp(AbciApp[Event]):
             Event.DONE: FinishedDecisionMakingRound,
             Event.ERROR: FinishedDecisionMakingRound,
             Event.TRANSACT: TxPreparationRound,
+            Event.MULTI_TRANSACT: TxPreparationRound,
         },
         TxPreparationRound: {
             Event.NO_MAJORITY: TxPreparationRound,
@@ -285,12 +490,17 @@ class SwappingAbciApp(AbciApp[Event]):
         FinishedStrategyEvaluationRound,
     }
     event_to_timeout: EventToTimeout = {}
-    cross_period_persisted_keys: FrozenSet[str] = frozenset()
+    cross_period_persisted_keys: FrozenSet[str] = frozenset(
+        {get_name(SynchronizedData.most_voted_strategy)}
+    )
     db_pre_conditions: Dict[AppState, Set[str]] = {
-        StrategyEvaluationRound: set(),
+        BlockPinningRound: set(),
     }
     db_post_conditions: Dict[AppState, Set[str]] = {
-        FinishedDecisionMakingRound: set(),
-        FinishedStrategyEvaluationRound: set(),
-        FinishedTxPreparationRound: {get_name(SynchronizedData.most_voted_tx_hash)},
+        FinishedDecisionMakingRound: {get_name(SynchronizedData.most_voted_strategy)},
+        FinishedStrategyEvaluationRound: {get_name(SynchronizedData.most_voted_strategy)},
+        FinishedTxPreparationRound: {
+            get_name(SynchronizedData.most_voted_strategy),
+            get_name(SynchronizedData.most_voted_tx_hash),
+        },
     }
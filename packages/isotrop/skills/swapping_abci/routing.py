@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""This module contains the multi-hop route search of SwappingAbciApp."""
+
+from dataclasses import dataclass
+from typing import Collection, Dict, Optional, Tuple
+
+from packages.isotrop.skills.swapping_abci.quoting import ReserveTable, get_amount_out
+
+
+DEFAULT_MAX_HOPS = 3
+
+
+@dataclass(frozen=True)
+class Route:
+    """A swap path with its exact amounts, as `getAmountsOut` would return them."""
+
+    path: Tuple[str, ...]
+    amounts: Tuple[int, ...]
+
+    @property
+    def amount_out(self) -> int:
+        """Return the output amount of the route."""
+        return self.amounts[-1]
+
+
+def find_best_route(
+    reserves: ReserveTable,
+    amount_in: int,
+    token_in: str,
+    token_out: str,
+    max_hops: int = DEFAULT_MAX_HOPS,
+    tokens: Optional[Collection[str]] = None,
+) -> Optional[Route]:
+    """
+    Find the path of at most `max_hops` swaps that maximizes the output amount.
+
+    The search relaxes the pool graph one hop at a time, keeping the best exact amount reaching each
+    token, so each layer costs one `getAmountOut` per pool edge.
+
+    :param reserves: the cached reserves, whose pairs are the edges of the graph.
+    :param amount_in: the input amount.
+    :param token_in: the token to sell.
+    :param token_out: the token to buy.
+    :param max_hops: the maximum number of swaps of the path.
+    :param tokens: if given, only these tokens can be used as intermediate hops.
+    :return: the best route, or None if `token_out` cannot be reached.
+    """
+    source, target = token_in.lower(), token_out.lower()
+    allowed = {token.lower() for token in tokens} if tokens is not None else None
+    best: Optional[Route] = None
+    frontier: Dict[str, Route] = {source: Route((token_in,), (amount_in,))}
+
+    for _ in range(max_hops):
+        next_frontier: Dict[str, Route] = {}
+        for token, route in frontier.items():
+            # sorted, so that ties are broken the same way by every agent
+            for neighbour in sorted(reserves.neighbours(token)):
+                if neighbour == source or neighbour in route.path:
+                    continue
+                if (
+                    neighbour != target
+                    and allowed is not None
+                    and neighbour not in allowed
+                ):
+                    continue
+                reserve_in, reserve_out = reserves.get_reserves(token, neighbour)  # type: ignore
+                if reserve_in <= 0 or reserve_out <= 0:
+                    continue
+                amount_out = get_amount_out(route.amount_out, reserve_in, reserve_out)
+                if amount_out <= 0:
+                    continue
+                if neighbour == target:
+                    if best is None or amount_out > best.amount_out:
+                        best = Route(
+                            route.path + (token_out,), route.amounts + (amount_out,)
+                        )
+                    continue
+                current = next_frontier.get(neighbour)
+                if current is None or amount_out > current.amount_out:
+                    next_frontier[neighbour] = Route(
+                        route.path + (neighbour,), route.amounts + (amount_out,)
+                    )
+        if not next_frontier:
+            break
+        frontier = next_frontier
+
+    return best
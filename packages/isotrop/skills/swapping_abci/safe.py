@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""This module contains the in-process Safe transaction hashing of SwappingAbciApp."""
+
+from functools import lru_cache
+
+from packaging.version import Version
+from web3 import Web3
+
+from packages.valory.contracts.erc20.contract import encode_address, encode_uint256
+
+
+NULL_ADDRESS = "0x0000000000000000000000000000000000000000"
+# the version of the Safes deployed by the service
+DEFAULT_SAFE_VERSION = "1.3.0"
+# Safe 1.0.0 renamed `dataGas` to `baseGas`, and Safe 1.3.0 added `chainId` to the domain
+BASE_GAS_VERSION = Version("1.0.0")
+CHAIN_ID_DOMAIN_VERSION = Version("1.3.0")
+
+DOMAIN_SEPARATOR_TYPEHASH = Web3.keccak(
+    text="EIP712Domain(uint256 chainId,address verifyingContract)"
+)
+LEGACY_DOMAIN_SEPARATOR_TYPEHASH = Web3.keccak(
+    text="EIP712Domain(address verifyingContract)"
+)
+SAFE_TX_TYPEHASH = Web3.keccak(
+    text="SafeTx(address to,uint256 value,bytes data,uint8 operation,uint256 safeTxGas,"
+    "uint256 baseGas,uint256 gasPrice,address gasToken,address refundReceiver,uint256 nonce)"
+)
+LEGACY_SAFE_TX_TYPEHASH = Web3.keccak(
+    text="SafeTx(address to,uint256 value,bytes data,uint8 operation,uint256 safeTxGas,"
+    "uint256 dataGas,uint256 gasPrice,address gasToken,address refundReceiver,uint256 nonce)"
+)
+
+
+@lru_cache(maxsize=None)
+def get_domain_separator(
+    chain_id: int, safe_address: str, safe_version: str = DEFAULT_SAFE_VERSION
+) -> bytes:
+    """Return the EIP-712 domain separator of a Safe, which includes the chain id from Safe 1.3.0 on."""
+    if Version(safe_version) < CHAIN_ID_DOMAIN_VERSION:
+        return Web3.keccak(
+            LEGACY_DOMAIN_SEPARATOR_TYPEHASH + encode_address(safe_address)
+        )
+    return Web3.keccak(
+        DOMAIN_SEPARATOR_TYPEHASH
+        + encode_uint256(chain_id)
+        + encode_address(safe_address)
+    )
+
+
+def get_safe_tx_hash(  # pylint: disable=too-many-arguments
+    chain_id: int,
+    safe_address: str,
+    to_address: str,
+    value: int,
+    data: bytes,
+    operation: int,
+    safe_tx_gas: int,
+    nonce: int,
+    base_gas: int = 0,
+    gas_price: int = 0,
+    gas_token: str = NULL_ADDRESS,
+    refund_receiver: str = NULL_ADDRESS,
+    safe_version: str = DEFAULT_SAFE_VERSION,
+) -> str:
+    """
+    Compute the hash of a Safe transaction, as `GnosisSafeContract.get_raw_safe_transaction_hash`.
+
+    :param chain_id: the chain id of the Safe's domain.
+    :param safe_address: the Safe address.
+    :param to_address: the tx recipient address.
+    :param value: the native value of the transaction.
+    :param data: the data of the transaction.
+    :param operation: the Safe operation.
+    :param safe_tx_gas: the gas of the Safe transaction.
+    :param nonce: the current nonce of the Safe.
+    :param base_gas: the gas independent of the transaction execution.
+    :param gas_price: the gas price used for the refund.
+    :param gas_token: the token used for the refund.
+    :param refund_receiver: the receiver of the refund.
+    :param safe_version: the version of the Safe, which sets the type hashes of its EIP-712 domain and transaction.
+    :return: the hash, hex-encoded without the `0x` prefix.
+    """
+    legacy_gas = Version(safe_version) < BASE_GAS_VERSION
+    struct_hash = Web3.keccak(
+        (LEGACY_SAFE_TX_TYPEHASH if legacy_gas else SAFE_TX_TYPEHASH)
+        + encode_address(to_address)
+        + encode_uint256(value)
+        + Web3.keccak(data)
+        + encode_uint256(operation)
+        + encode_uint256(safe_tx_gas)
+        + encode_uint256(base_gas)
+        + encode_uint256(gas_price)
+        + encode_address(gas_token)
+        + encode_address(refund_receiver)
+        + encode_uint256(nonce)
+    )
+    digest = Web3.keccak(
+        b"\x19\x01"
+        + get_domain_separator(chain_id, safe_address.lower(), safe_version)
+        + struct_hash
+    )
+    return digest.hex()[-64:]
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""This module contains the closed-form trade sizing of SwappingAbciApp."""
+
+import math
+from typing import Optional, Sequence, Tuple
+
+from packages.isotrop.skills.swapping_abci.quoting import (
+    FEE_DENOMINATOR,
+    FEE_NUMERATOR,
+    ReserveTable,
+)
+
+
+FEE_FACTOR = FEE_NUMERATOR / FEE_DENOMINATOR
+
+
+def get_virtual_reserves(
+    reserves: ReserveTable, path: Sequence[str]
+) -> Optional[Tuple[float, float]]:
+    """
+    Compose the pools of a path into a single virtual constant-product pool.
+
+    A swap of `a` along the path then yields `f * a * virtual_out / (virtual_in + f * a)`.
+
+    :param reserves: the cached reserves.
+    :param path: the swap path.
+    :return: the virtual (reserve_in, reserve_out), or None if a pair of the path is not cached.
+    """
+    virtual_in: Optional[float] = None
+    virtual_out = 0.0
+    for token_in, token_out in zip(path, path[1:]):
+        pool = reserves.get_reserves(token_in, token_out)
+        if pool is None:
+            return None
+        reserve_in, reserve_out = float(pool[0]), float(pool[1])
+        if virtual_in is None:
+            virtual_in, virtual_out = reserve_in, reserve_out
+            continue
+        denominator = reserve_in + FEE_FACTOR * virtual_out
+        virtual_in = virtual_in * reserve_in / denominator
+        virtual_out = FEE_FACTOR * virtual_out * reserve_out / denominator
+    if virtual_in is None:
+        return None
+    return virtual_in, virtual_out
+
+
+def get_optimal_cycle_input(virtual_in: float, virtual_out: float) -> int:
+    """Return the input maximizing `amount_out - amount_in` on a virtual pool, or 0 if it is not profitable."""
+    optimal = (
+        math.sqrt(virtual_in * virtual_out * FEE_FACTOR) - virtual_in
+    ) / FEE_FACTOR
+    return max(int(optimal), 0)
+
+
+def get_impact_bounded_input(virtual_in: float, max_price_impact: float) -> int:
+    """
+    Return the largest input whose price impact stays within `max_price_impact`.
+
+    The impact excludes the fee, as in the quote ladder: `f * a / (virtual_in + f * a)`.
+
+    :param virtual_in: the (virtual) input reserve.
+    :param max_price_impact: the maximum price impact, e.g. 0.01 for 1%.
+    :return: the input amount.
+    """
+    if max_price_impact <= 0 or virtual_in <= 0:
+        return 0
+    if max_price_impact >= 1:
+        raise ValueError(
+            "The price impact of a constant-product swap is always below 1."
+        )
+    return int(max_price_impact * virtual_in / ((1 - max_price_impact) * FEE_FACTOR))
+
+
+def size_trade(
+    reserves: ReserveTable,
+    path: Sequence[str],
+    max_price_impact: float,
+    max_amount: int,
+) -> Optional[int]:
+    """
+    Size a trade along `path` in closed form.
+
+    :param reserves: the cached reserves.
+    :param path: the swap path.
+    :param max_price_impact: the maximum price impact of the whole path.
+    :param max_amount: the upper bound of the trade.
+    :return: the input amount, or None if a pair of the path is not cached.
+    """
+    virtual = get_virtual_reserves(reserves, path)
+    if virtual is None:
+        return None
+    return min(get_impact_bounded_input(virtual[0], max_price_impact), max_amount)
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""This module contains the strategy value type of SwappingAbciApp."""
+
+import hashlib
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from packages.isotrop.skills.swapping_abci.codec import (
+    decode_strategy_payload,
+    encode_strategy_payload,
+)
+
+
+STRATEGY_CACHE_SIZE = 8
+
+
+def _freeze(section: Mapping[str, Any]) -> Mapping[str, Any]:
+    """Return a read-only view of a section, with its lists turned into tuples."""
+    return MappingProxyType(
+        {
+            key: tuple(value) if isinstance(value, list) else value
+            for key, value in section.items()
+        }
+    )
+
+
+def _thaw(section: Mapping[str, Any]) -> Dict[str, Any]:
+    """Return a mutable copy of a section, with its tuples turned back into lists."""
+    return {
+        key: list(value) if isinstance(value, tuple) else value
+        for key, value in section.items()
+    }
+
+
+@dataclass(frozen=True, slots=True)
+class Strategy:
+    """
+    The strategy agreed on by the agents.
+
+    It is immutable, so that a decoded strategy can be shared by every reader of the same DB value.
+    The behaviours that update it work on the mutable `to_dict` copy and build a new strategy from it.
+    """
+
+    action: str
+    deadline: int
+    chain: str
+    safe_nonce: int
+    safe_tx_gas: Mapping[str, int]
+    token_base: Mapping[str, Any]
+    token_a: Mapping[str, Any]
+    token_lp: Mapping[str, Any]
+    path: Optional[Tuple[str, ...]] = None
+    arbitrage: bool = False
+    trades: Tuple[Mapping[str, Any], ...] = ()
+    event: Optional[str] = None
+    quote_block: Optional[int] = None
+    quote_pins: Tuple[Mapping[str, Any], ...] = ()
+    read_block: Optional[int] = None
+
+    @classmethod
+    def from_dict(cls, strategy: Mapping[str, Any]) -> "Strategy":
+        """Build a strategy from its dict form."""
+        path = strategy.get("path")
+        return cls(
+            action=strategy["action"],
+            deadline=strategy["deadline"],
+            chain=strategy["chain"],
+            safe_nonce=strategy["safe_nonce"],
+            safe_tx_gas=_freeze(strategy["safe_tx_gas"]),
+            token_base=_freeze(strategy["token_base"]),
+            token_a=_freeze(strategy["token_a"]),
+            token_lp=_freeze(strategy["token_LP"]),
+            path=tuple(path) if path else None,
+            arbitrage=bool(strategy.get("arbitrage", False)),
+            trades=tuple(_freeze(trade) for trade in strategy.get("trades", ())),
+            event=strategy.get("event"),
+            quote_block=strategy.get("quote_block"),
+            quote_pins=tuple(_freeze(pin) for pin in strategy.get("quote_pins", ())),
+            read_block=strategy.get("read_block"),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a mutable dict form of the strategy, leaving out the unset optional fields."""
+        strategy: Dict[str, Any] = {
+            "action": self.action,
+            "deadline": self.deadline,
+            "chain": self.chain,
+            "safe_nonce": self.safe_nonce,
+            "safe_tx_gas": _thaw(self.safe_tx_gas),
+            "token_base": _thaw(self.token_base),
+            "token_a": _thaw(self.token_a),
+            "token_LP": _thaw(self.token_lp),
+        }
+        if self.path is not None:
+            strategy["path"] = list(self.path)
+        if self.arbitrage:
+            strategy["arbitrage"] = True
+        if self.trades:
+            strategy["trades"] = [_thaw(trade) for trade in self.trades]
+        if self.event is not None:
+            strategy["event"] = self.event
+        if self.quote_block is not None:
+            strategy["quote_block"] = self.quote_block
+        if self.quote_pins:
+            strategy["quote_pins"] = [_thaw(pin) for pin in self.quote_pins]
+        if self.read_block is not None:
+            strategy["read_block"] = self.read_block
+        return strategy
+
+    def serialize(self) -> str:
+        """Return the canonical compact form, identical for every agent holding the same strategy."""
+        return serialize_strategy(self.to_dict())
+
+    @classmethod
+    def deserialize(cls, serialized: str) -> "Strategy":
+        """Decode a serialized strategy; the same string is only parsed once."""
+        return decode_strategy(serialized)
+
+
+def serialize_strategy(strategy: Mapping[str, Any]) -> str:
+    """Return the canonical compact form of a strategy in dict form, as carried by the payloads."""
+    return encode_strategy_payload(strategy)
+
+
+@lru_cache(maxsize=STRATEGY_CACHE_SIZE)
+def decode_strategy(serialized: str) -> Strategy:
+    """Decode a serialized strategy, memoized on the serialized string."""
+    return Strategy.from_dict(decode_strategy_payload(serialized))
+
+
+def get_strategy_digest(serialized: str) -> str:
+    """Return the 32-byte SHA-256 digest of a serialized strategy, in hex."""
+    return hashlib.sha256(serialized.encode("ascii")).hexdigest()
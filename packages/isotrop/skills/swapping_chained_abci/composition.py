@@ -36,13 +36,13 @@ from packages.valory.skills.termination_abci.rounds import (
 
 
 abci_app_transition_mapping: AbciAppTransitionMapping = {
-    RegistrationAbci.FinishedRegistrationRound: SwappingAbci.StrategyEvaluationRound,
+    RegistrationAbci.FinishedRegistrationRound: SwappingAbci.BlockPinningRound,
     SwappingAbci.FinishedStrategyEvaluationRound: ResetAndPauseAbci.ResetAndPauseRound,
     SwappingAbci.FinishedDecisionMakingRound: ResetAndPauseAbci.ResetAndPauseRound,
     SwappingAbci.FinishedTxPreparationRound: TxSettlementAbci.RandomnessTransactionSubmissionRound,
     TxSettlementAbci.FinishedTransactionSubmissionRound: ResetAndPauseAbci.ResetAndPauseRound,
     TxSettlementAbci.FailedRound: TxSettlementAbci.RandomnessTransactionSubmissionRound,
-    ResetAndPauseAbci.FinishedResetAndPauseRound: SwappingAbci.StrategyEvaluationRound,
+    ResetAndPauseAbci.FinishedResetAndPauseRound: SwappingAbci.BlockPinningRound,
     ResetAndPauseAbci.FinishedResetAndPauseErrorRound: RegistrationAbci.RegistrationRound,
 }
 
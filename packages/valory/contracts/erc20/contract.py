@@ -19,7 +19,7 @@
 
 """This module contains the class to connect to an ERC20 token contract."""
 
-from typing import Dict
+from typing import Any, Dict, List
 
 from aea.common import JSONLike
 from aea.configurations.base import PublicId
@@ -30,6 +30,101 @@ from aea_ledger_ethereum import EthereumApi
 
 PUBLIC_ID = PublicId.from_str("valory/erc20:0.1.0")
 
+NATIVE_TOKEN_ADDRESS = "0x0000000000000000000000000000000000000000"
+MULTICALL3_ABI = [
+    {
+        "inputs": [
+            {
+                "components": [
+                    {"name": "target", "type": "address"},
+                    {"name": "allowFailure", "type": "bool"},
+                    {"name": "callData", "type": "bytes"},
+                ],
+                "name": "calls",
+                "type": "tuple[]",
+            }
+        ],
+        "name": "aggregate3",
+        "outputs": [
+            {
+                "components": [
+                    {"name": "success", "type": "bool"},
+                    {"name": "returnData", "type": "bytes"},
+                ],
+                "name": "returnData",
+                "type": "tuple[]",
+            }
+        ],
+        "stateMutability": "payable",
+        "type": "function",
+    },
+    {
+        "inputs": [{"name": "addr", "type": "address"}],
+        "name": "getEthBalance",
+        "outputs": [{"name": "balance", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function",
+    },
+    {
+        "inputs": [],
+        "name": "getBlockNumber",
+        "outputs": [{"name": "blockNumber", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function",
+    },
+]
+
+APPROVE_SELECTOR = bytes.fromhex("095ea7b3")  # approve(address,uint256)
+TRANSFER_SELECTOR = bytes.fromhex("a9059cbb")  # transfer(address,uint256)
+DEPOSIT_SELECTOR = bytes.fromhex("d0e30db0")  # deposit()
+WITHDRAW_SELECTOR = bytes.fromhex("2e1a7d4d")  # withdraw(uint256)
+ALLOWANCE_SELECTOR = bytes.fromhex("dd62ed3e")  # allowance(address,address)
+
+
+def encode_uint256(value: int) -> bytes:
+    """Encode a uint256 ABI word."""
+    if value < 0:
+        raise ValueError(f"Cannot encode a negative uint256: {value}")
+    return int(value).to_bytes(32, "big")
+
+
+def encode_address(address: str) -> bytes:
+    """Encode an address ABI word."""
+    raw = bytes.fromhex(address[2:] if address.startswith("0x") else address)
+    if len(raw) != 20:
+        raise ValueError(f"Invalid address: {address}")
+    return bytes(12) + raw
+
+
+def encode_bytes(data: bytes) -> bytes:
+    """Encode the tail of a `bytes` argument, right-padded to a whole word."""
+    return encode_uint256(len(data)) + data + bytes(-len(data) % 32)
+
+
+def encode_approve(spender: str, amount: int) -> bytes:
+    """Encode the calldata of `approve(spender, amount)`."""
+    return APPROVE_SELECTOR + encode_address(spender) + encode_uint256(amount)
+
+
+def encode_transfer(receiver: str, amount: int) -> bytes:
+    """Encode the calldata of `transfer(receiver, amount)`."""
+    return TRANSFER_SELECTOR + encode_address(receiver) + encode_uint256(amount)
+
+
+def encode_allowance(owner: str, spender: str) -> bytes:
+    """Encode the calldata of `allowance(owner, spender)`."""
+    return ALLOWANCE_SELECTOR + encode_address(owner) + encode_address(spender)
+
+
+def encode_deposit() -> bytes:
+    """Encode the calldata of `deposit()`."""
+    return DEPOSIT_SELECTOR
+
+
+def encode_withdraw(amount: int) -> bytes:
+    """Encode the calldata of `withdraw(amount)`."""
+    return WITHDRAW_SELECTOR + encode_uint256(amount)
+
 
 class ERC20(Contract):
     """The ERC20 contract."""
@@ -42,14 +137,62 @@ class ERC20(Contract):
         ledger_api: EthereumApi,
         contract_address: str,
         account: str,
+        block_identifier: Any = "latest",
     ) -> JSONLike:
         """Check the balance of the given account."""
         contract_instance = cls.get_instance(ledger_api, contract_address)
         balance_of = getattr(contract_instance.functions, "balanceOf")  # noqa
-        token_balance = balance_of(account).call()
-        wallet_balance = ledger_api.api.eth.get_balance(account)
+        token_balance = balance_of(account).call(block_identifier=block_identifier)
+        wallet_balance = ledger_api.api.eth.get_balance(account, block_identifier=block_identifier)
         return dict(token=token_balance, wallet=wallet_balance)
 
+    @classmethod
+    def check_balances(
+        cls,
+        ledger_api: EthereumApi,
+        contract_address: str,
+        tokens: List[str],
+        accounts: List[str],
+        block_identifier: Any = "latest",
+    ) -> JSONLike:
+        """
+        Check the balances of many (token, account) pairs with a single Multicall3 `aggregate3` call.
+
+        :param ledger_api: the ledger API object
+        :param contract_address: the Multicall3 contract address
+        :param tokens: the ERC20 tokens to read; `NATIVE_TOKEN_ADDRESS` reads the native balance
+        :param accounts: the accounts to read the balances of
+        :param block_identifier: the block to read the balances at
+        :return: dict with one key `balances` mapping token -> account -> balance
+        """
+        multicall = ledger_api.api.eth.contract(
+            address=ledger_api.api.to_checksum_address(contract_address),
+            abi=MULTICALL3_ABI,
+        )
+        keys = []
+        calls = []
+        for token in tokens:
+            if token.lower() == NATIVE_TOKEN_ADDRESS:
+                instance, target, fn_name = multicall, multicall.address, "getEthBalance"
+            else:
+                target = ledger_api.api.to_checksum_address(token)
+                instance, fn_name = cls.get_instance(ledger_api, target), "balanceOf"
+            for account in accounts:
+                call_data = instance.encodeABI(
+                    fn_name, args=(ledger_api.api.to_checksum_address(account),)
+                )
+                keys.append((token, account))
+                calls.append((target, True, bytes.fromhex(call_data[2:])))
+
+        results = multicall.functions.aggregate3(calls).call(block_identifier=block_identifier)
+        balances: Dict[str, Dict[str, int]] = {}
+        for (token, account), (success, return_data) in zip(keys, results):
+            if not success or len(return_data) < 32:
+                continue
+            balance = ledger_api.api.codec.decode(["uint256"], return_data)[0]
+            balances.setdefault(token, {})[account] = balance
+        return dict(balances=balances)
+
     @classmethod
     def get_allowance(
         cls,
@@ -57,12 +200,51 @@ class ERC20(Contract):
         contract_address: str,
         owner: str,
         spender: str,
+        block_identifier: Any = "latest",
     ) -> JSONLike:
         """Check the balance of the given account."""
         contract_instance = cls.get_instance(ledger_api, contract_address)
-        allowance = contract_instance.functions.allowance(owner, spender).call()
+        allowance = contract_instance.functions.allowance(owner, spender).call(
+            block_identifier=block_identifier
+        )
         return dict(data=allowance)
 
+    @classmethod
+    def check_allowances(
+        cls,
+        ledger_api: EthereumApi,
+        contract_address: str,
+        tokens: List[str],
+        owner: str,
+        spender: str,
+        block_identifier: Any = "latest",
+    ) -> JSONLike:
+        """
+        Check the allowances of many tokens with a single Multicall3 `aggregate3` call.
+
+        :param ledger_api: the ledger API object
+        :param contract_address: the Multicall3 contract address
+        :param tokens: the ERC20 tokens to read
+        :param owner: the owner of the tokens
+        :param spender: the spender of the tokens
+        :param block_identifier: the block to read the allowances at
+        :return: dict with one key `allowances` mapping token -> allowance
+        """
+        multicall = ledger_api.api.eth.contract(
+            address=ledger_api.api.to_checksum_address(contract_address),
+            abi=MULTICALL3_ABI,
+        )
+        call_data = encode_allowance(owner, spender)
+        calls = [(ledger_api.api.to_checksum_address(token), True, call_data) for token in tokens]
+
+        results = multicall.functions.aggregate3(calls).call(block_identifier=block_identifier)
+        allowances: Dict[str, int] = {}
+        for token, (success, return_data) in zip(tokens, results):
+            if not success or len(return_data) < 32:
+                continue
+            allowances[token] = ledger_api.api.codec.decode(["uint256"], return_data)[0]
+        return dict(allowances=allowances)
+
     @classmethod
     def build_deposit_tx(
         cls,
@@ -70,9 +252,7 @@ class ERC20(Contract):
         contract_address: str,
     ) -> Dict[str, bytes]:
         """Build a deposit transaction."""
-        contract_instance = cls.get_instance(ledger_api, contract_address)
-        data = contract_instance.encodeABI("deposit")
-        return {"data": bytes.fromhex(data[2:])}
+        return {"data": encode_deposit()}
 
     @classmethod
     def build_withdraw_tx(
@@ -81,10 +261,8 @@ class ERC20(Contract):
         contract_address: str,
         amount: int,
     ) -> Dict[str, bytes]:
-        """Build a deposit transaction."""
-        contract_instance = cls.get_instance(ledger_api, contract_address)
-        data = contract_instance.encodeABI("withdraw", args=(amount,))
-        return {"data": bytes.fromhex(data[2:])}
+        """Build a withdraw transaction."""
+        return {"data": encode_withdraw(amount)}
 
     @classmethod
     def build_approval_tx(
@@ -95,10 +273,7 @@ class ERC20(Contract):
         amount: int,
     ) -> Dict[str, bytes]:
         """Build an ERC20 approval."""
-        contract_instance = cls.get_instance(ledger_api, contract_address)
-        checksumed_spender = ledger_api.api.to_checksum_address(spender)
-        data = contract_instance.encodeABI("approve", args=(checksumed_spender, amount))
-        return {"data": bytes.fromhex(data[2:])}
+        return {"data": encode_approve(spender, amount)}
 
     @classmethod
     def build_transfer_tx(
@@ -109,7 +284,4 @@ class ERC20(Contract):
         amount: int,
     ) -> Dict[str, bytes]:
         """Build an ERC20 transfer."""
-        contract_instance = cls.get_instance(ledger_api, contract_address)
-        checksumed_receiver = ledger_api.api.to_checksum_address(receiver)
-        data = contract_instance.encodeABI("transfer", args=(checksumed_receiver, amount))
-        return {"data": bytes.fromhex(data[2:])}
+        return {"data": encode_transfer(receiver, amount)}
@@ -19,30 +19,68 @@
 
 """This module contains the class to connect to an UniswapV2Pair contract."""
 
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, cast
+
+from aea.common import JSONLike
 from aea.configurations.base import PublicId
-from aea.crypto.base import LedgerApi
 from aea.contracts.base import Contract
+from aea.crypto.base import LedgerApi
 from aea_ledger_ethereum import EthereumApi
-from typing import Any,Dict, List, Optional, cast
-from aea.common import JSONLike
+from web3 import Web3
+
+from packages.valory.contracts.erc20.contract import (
+    MULTICALL3_ABI,
+    encode_address,
+    encode_bytes,
+    encode_uint256,
+)
+
 
 PUBLIC_ID = PublicId.from_str("valory/uniswapv2pair:0.1.0")
 
+SYNC_EVENT_TOPIC = "0x1c411e9a96e071241c2f21f7726b17ae89e3cab4c78be50e062b03a9fffbbad1"
+DEFAULT_LOGS_CHUNK_SIZE = 2000
+CHECKSUM_CACHE_SIZE = 1024
+PAIR_STATE_CALLS = (
+    ("getReserves", ["uint112", "uint112", "uint32"]),
+    ("token0", ["address"]),
+    ("token1", ["address"]),
+    ("totalSupply", ["uint256"]),
+)
+SWAP_SELECTOR = bytes.fromhex("022c0d9f")  # swap(uint256,uint256,address,bytes)
+
+
+def encode_swap(amount0_out: int, amount1_out: int, to_address: str, data: bytes) -> bytes:
+    """Encode the calldata of `swap(amount0Out, amount1Out, to, data)`."""
+    return (
+        SWAP_SELECTOR
+        + encode_uint256(amount0_out)
+        + encode_uint256(amount1_out)
+        + encode_address(to_address)
+        + encode_uint256(4 * 32)  # offset of the data, after the four head words
+        + encode_bytes(data)
+    )
+
+
+@lru_cache(maxsize=CHECKSUM_CACHE_SIZE)
+def to_checksum_address(address: str) -> str:
+    """Return the checksummed address, memoized since the same few pairs are used over and over."""
+    return Web3.to_checksum_address(address)
+
 
 class UniswapV2Pair(Contract):
-    """
-    A wrapper for interacting with the Uniswap V2 Pair contract using AEA components.
-    """
+    """A wrapper for interacting with the Uniswap V2 Pair contract using AEA components."""
 
     contract_id = PUBLIC_ID
 
     @classmethod
-    def get_reserves(cls, ledger_api: EthereumApi, contract_address: str):
+    def get_reserves(cls, ledger_api: EthereumApi, contract_address: str, block_identifier: Any = "latest"):
         """Fetch reserves in this pair."""
         try:
-            contract_instance = cls.get_instance(ledger_api, ledger_api.api.to_checksum_address(contract_address))
+            contract_instance = cls.get_instance(ledger_api, to_checksum_address(contract_address))
             get_reserves = getattr(contract_instance.functions, "getReserves")  # noqa
-            reserves = get_reserves().call()
+            reserves = get_reserves().call(block_identifier=block_identifier)
             return {
                 "reserve0": reserves[0],
                 "reserve1": reserves[1],
@@ -53,28 +91,152 @@ class UniswapV2Pair(Contract):
             return None
 
     @classmethod
-    def get_token0(cls, ledger_api: LedgerApi, contract_address: str) -> str:
+    def get_token0(cls, ledger_api: LedgerApi, contract_address: str, block_identifier: Any = "latest") -> str:
         """Get the address of token0."""
-        contract = cls.get_instance(ledger_api, ledger_api.api.to_checksum_address(contract_address))
-        return contract.functions.token0().call()
+        contract = cls.get_instance(ledger_api, to_checksum_address(contract_address))
+        return contract.functions.token0().call(block_identifier=block_identifier)
 
     @classmethod
-    def get_token1(cls, ledger_api: LedgerApi, contract_address: str) -> str:
+    def get_token1(cls, ledger_api: LedgerApi, contract_address: str, block_identifier: Any = "latest") -> str:
         """Get the address of token1."""
-        contract = cls.get_instance(ledger_api, ledger_api.api.to_checksum_address(contract_address))
-        return contract.functions.token1().call()
+        contract = cls.get_instance(ledger_api, to_checksum_address(contract_address))
+        return contract.functions.token1().call(block_identifier=block_identifier)
 
     @classmethod
-    def get_total_supply(cls, ledger_api: LedgerApi, contract_address: str) -> int:
+    def get_total_supply(cls, ledger_api: LedgerApi, contract_address: str, block_identifier: Any = "latest") -> int:
         """Get the total supply of liquidity tokens."""
-        contract = cls.get_instance(ledger_api, ledger_api.api.to_checksum_address(contract_address))
-        return contract.functions.totalSupply().call()
+        contract = cls.get_instance(ledger_api, to_checksum_address(contract_address))
+        return contract.functions.totalSupply().call(block_identifier=block_identifier)
 
     @classmethod
-    def get_symbol(cls, ledger_api: LedgerApi, contract_address: str) -> str:
+    def get_symbol(cls, ledger_api: LedgerApi, contract_address: str, block_identifier: Any = "latest") -> str:
         """Get the symbol of the liquidity token."""
-        contract = cls.get_instance(ledger_api, ledger_api.api.to_checksum_address(contract_address))
-        return contract.functions.symbol().call()
+        contract = cls.get_instance(ledger_api, to_checksum_address(contract_address))
+        return contract.functions.symbol().call(block_identifier=block_identifier)
+
+    @classmethod
+    def get_pairs_state(
+        cls,
+        ledger_api: EthereumApi,
+        contract_address: str,
+        pair_addresses: List[str],
+        block_identifier: Any = "latest",
+        with_block_hash: bool = False,
+    ) -> JSONLike:
+        """
+        Fetch reserves, tokens and total supply of many pairs with a single Multicall3 `aggregate3` call.
+
+        The block number is read inside the same call, so every value belongs to the same block.
+
+        :param ledger_api: the ledger API object
+        :param contract_address: the Multicall3 contract address
+        :param pair_addresses: the UniswapV2Pair addresses to read
+        :param block_identifier: the block to read the state at
+        :param with_block_hash: whether to also return the hash of the block, at the cost of one more request
+        :return: dict with the `block_number`, the `block_hash` if asked for, and the state of each pair under `pairs`
+        """
+        multicall = ledger_api.api.eth.contract(
+            address=to_checksum_address(contract_address),
+            abi=MULTICALL3_ABI,
+        )
+        calls = [(multicall.address, False, bytes.fromhex(multicall.encodeABI("getBlockNumber")[2:]))]
+        for pair_address in pair_addresses:
+            pair = cls.get_instance(ledger_api, to_checksum_address(pair_address))
+            for fn_name, _ in PAIR_STATE_CALLS:
+                calls.append((pair.address, True, bytes.fromhex(pair.encodeABI(fn_name)[2:])))
+
+        results = multicall.functions.aggregate3(calls).call(block_identifier=block_identifier)
+        codec = ledger_api.api.codec
+        block_number = codec.decode(["uint256"], results[0][1])[0]
+        pairs: Dict[str, Dict[str, Any]] = {}
+        for i, pair_address in enumerate(pair_addresses):
+            pair_results = results[1 + i * len(PAIR_STATE_CALLS) : 1 + (i + 1) * len(PAIR_STATE_CALLS)]
+            if not all(success and return_data for success, return_data in pair_results):
+                continue
+            decoded = [
+                codec.decode(types, return_data)
+                for (_, types), (_, return_data) in zip(PAIR_STATE_CALLS, pair_results)
+            ]
+            (reserve0, reserve1, timestamp), (token0,), (token1,), (total_supply,) = decoded
+            pairs[pair_address] = {
+                "reserve0": reserve0,
+                "reserve1": reserve1,
+                "blockTimestampLast": timestamp,
+                "token0": token0,
+                "token1": token1,
+                "totalSupply": total_supply,
+            }
+        if with_block_hash:
+            block_hash = ledger_api.api.eth.get_block(block_number)["hash"].hex()
+            return dict(block_number=block_number, block_hash=block_hash, pairs=pairs)
+        return dict(block_number=block_number, pairs=pairs)
+
+    @classmethod
+    def get_sync_events(  # pylint: disable=too-many-arguments
+        cls,
+        ledger_api: EthereumApi,
+        contract_address: str,
+        pair_addresses: List[str],
+        from_block: int,
+        to_block: Optional[int] = None,
+        chunk_size: int = DEFAULT_LOGS_CHUNK_SIZE,
+        known_hashes: Optional[Dict[str, str]] = None,
+    ) -> JSONLike:
+        """
+        Fetch the `Sync` events of many pairs with `eth_getLogs`, in chunked block ranges.
+
+        :param ledger_api: the ledger API object
+        :param contract_address: any of the pairs; all the pairs are given by `pair_addresses`
+        :param pair_addresses: the UniswapV2Pair addresses to fetch the events of
+        :param from_block: the first block to fetch, inclusive
+        :param to_block: the last block to fetch, inclusive, defaults to the latest block
+        :param chunk_size: the maximum number of blocks per `eth_getLogs` request
+        :param known_hashes: the known hashes of the tracked blocks, keyed by block number, to detect reorgs
+        :return: the ordered events, the `to_block` with its hash and the current hashes of the checked blocks
+        """
+        eth = ledger_api.api.eth
+        if to_block is None:
+            to_block = eth.block_number
+        addresses = [to_checksum_address(a) for a in pair_addresses]
+        by_checksum = dict(zip(addresses, pair_addresses))
+
+        events = []
+        for start in range(from_block, to_block + 1, chunk_size):
+            logs = eth.get_logs(
+                {
+                    "fromBlock": start,
+                    "toBlock": min(start + chunk_size - 1, to_block),
+                    "address": addresses,
+                    "topics": [SYNC_EVENT_TOPIC],
+                }
+            )
+            for log in logs:
+                reserve0, reserve1 = ledger_api.api.codec.decode(["uint112", "uint112"], bytes(log["data"]))
+                events.append(
+                    {
+                        "pair": by_checksum.get(log["address"], log["address"]),
+                        "block_number": log["blockNumber"],
+                        "block_hash": log["blockHash"].hex(),
+                        "log_index": log["logIndex"],
+                        "reserve0": reserve0,
+                        "reserve1": reserve1,
+                    }
+                )
+        events.sort(key=lambda event: (event["block_number"], event["log_index"]))
+
+        block_hashes = {str(to_block): eth.get_block(to_block)["hash"].hex()}
+        # the newest known block is checked; older ones only while their hash changed, down to the fork
+        known_hashes = known_hashes or {}
+        for block in sorted(known_hashes, key=int, reverse=True):
+            if block not in block_hashes:
+                block_hashes[block] = eth.get_block(int(block))["hash"].hex()
+            if block_hashes[block] == known_hashes[block]:
+                break
+        return dict(
+            events=events,
+            to_block=to_block,
+            block_hashes=block_hashes,
+        )
 
     @classmethod
     def build_swap_transaction(
@@ -97,18 +259,10 @@ class UniswapV2Pair(Contract):
         :param data: The additional calldata (typically empty for standard swaps).
         :return: A transaction dictionary ready to be signed and sent.
         """
-        contract = cls.get_instance(ledger_api, ledger_api.api.to_checksum_address(contract_address))
-        data = contract.encodeABI(
-            "swap",
-            args=(
-                amount0_out,
-                amount1_out,
-                to_address,
-                data
-            )
-        )
-        return {"data": bytes.fromhex(data[2:])}
-    
+        if isinstance(data, str):
+            data = bytes.fromhex(data[2:] if data.startswith("0x") else data)
+        return {"data": encode_swap(amount0_out, amount1_out, to_address, data)}
+
     @classmethod
     def get_transaction_transfer_logs(  # type: ignore  # pylint: disable=too-many-arguments,too-many-locals,unused-argument,arguments-differ
         cls,
@@ -152,7 +306,7 @@ class UniswapV2Pair(Contract):
                 for log in transfer_logs
             ]
 
-            if target_address: 
+            if target_address:
                 transfer_logs = list(
                     filter(
                         lambda log: target_address in (log["from"], log["to"]),  # type: ignore
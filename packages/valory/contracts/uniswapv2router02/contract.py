@@ -19,19 +19,76 @@
 
 """This module contains the class to connect to an UniswapV2Router02 contract."""
 
+from typing import Any, Dict, List
+
 from aea.configurations.base import PublicId
 from aea.contracts.base import Contract
 from aea_ledger_ethereum import EthereumApi
-from typing import Any,Dict, List, Optional, cast
-from aea.common import JSONLike
+
+from packages.valory.contracts.erc20.contract import encode_address, encode_uint256
+
 
 PUBLIC_ID = PublicId.from_str("valory/uniswapv2router02:0.1.0")
 
+# swapExactTokensForTokens(uint256,uint256,address[],address,uint256)
+SWAP_EXACT_TOKENS_FOR_TOKENS_SELECTOR = bytes.fromhex("38ed1739")
+# swapExactETHForTokens(uint256,address[],address,uint256)
+SWAP_EXACT_ETH_FOR_TOKENS_SELECTOR = bytes.fromhex("7ff36ab5")
+# swapExactTokensForETH(uint256,uint256,address[],address,uint256)
+SWAP_EXACT_TOKENS_FOR_ETH_SELECTOR = bytes.fromhex("18cbafe5")
+
+
+def encode_address_array(addresses: List[str]) -> bytes:
+    """Encode the tail of an `address[]` argument."""
+    return encode_uint256(len(addresses)) + b"".join(encode_address(a) for a in addresses)
+
+
+def encode_swap_exact_tokens_for_tokens(
+    amount_in: int, amount_out_min: int, path: List[str], to: str, deadline: int
+) -> bytes:
+    """Encode the calldata of `swapExactTokensForTokens`."""
+    return (
+        SWAP_EXACT_TOKENS_FOR_TOKENS_SELECTOR
+        + encode_uint256(amount_in)
+        + encode_uint256(amount_out_min)
+        + encode_uint256(5 * 32)  # offset of the path, after the five head words
+        + encode_address(to)
+        + encode_uint256(deadline)
+        + encode_address_array(path)
+    )
+
+
+def encode_swap_exact_eth_for_tokens(
+    amount_out_min: int, path: List[str], to: str, deadline: int
+) -> bytes:
+    """Encode the calldata of `swapExactETHForTokens`; the input amount is the value of the call."""
+    return (
+        SWAP_EXACT_ETH_FOR_TOKENS_SELECTOR
+        + encode_uint256(amount_out_min)
+        + encode_uint256(4 * 32)  # offset of the path, after the four head words
+        + encode_address(to)
+        + encode_uint256(deadline)
+        + encode_address_array(path)
+    )
+
+
+def encode_swap_exact_tokens_for_eth(
+    amount_in: int, amount_out_min: int, path: List[str], to: str, deadline: int
+) -> bytes:
+    """Encode the calldata of `swapExactTokensForETH`."""
+    return (
+        SWAP_EXACT_TOKENS_FOR_ETH_SELECTOR
+        + encode_uint256(amount_in)
+        + encode_uint256(amount_out_min)
+        + encode_uint256(5 * 32)  # offset of the path, after the five head words
+        + encode_address(to)
+        + encode_uint256(deadline)
+        + encode_address_array(path)
+    )
+
 
 class UniswapV2Router02(Contract):
-    """
-    A wrapper for interacting with the Uniswap V2 Router contract using AEA components.
-    """
+    """A wrapper for interacting with the Uniswap V2 Router contract using AEA components."""
 
     contract_id = PUBLIC_ID
 
@@ -41,7 +98,8 @@ class UniswapV2Router02(Contract):
         ledger_api: EthereumApi,
         contract_address: str,
         amount_in: int,
-        path: list
+        path: list,
+        block_identifier: Any = "latest",
     ):
         """
         Call the getAmountsOut method of the Uniswap V2 Router contract.
@@ -50,13 +108,14 @@ class UniswapV2Router02(Contract):
         :param contract_address: The router contract address on the target chain
         :param amount_in: The amount of input tokens.
         :param path: The swap path of token addresses.
+        :param block_identifier: The block to quote at.
         :return: dict with one key `amounts` and the value is the amounts of output tokens including the amount_in
         """
         contract_instance = cls.get_instance(ledger_api, ledger_api.api.to_checksum_address(contract_address))
         _path = [ledger_api.api.to_checksum_address(a) for a in path]
         print(f"UniswapV2Router02.get_amounts_out: {contract_address}, {contract_instance}, {_path}")
         get_amounts_out = getattr(contract_instance.functions, "getAmountsOut")  # noqa
-        return {"amounts": get_amounts_out(amount_in, _path).call()}
+        return {"amounts": get_amounts_out(amount_in, _path).call(block_identifier=block_identifier)}
 
     @classmethod
     def build_swap_transaction(
@@ -81,16 +140,59 @@ class UniswapV2Router02(Contract):
         :param deadline: Transaction deadline timestamp.
         :return: The transaction dictionary.
         """
-        contract_instance = cls.get_instance(ledger_api, ledger_api.api.to_checksum_address(contract_address))
-        _path = [ledger_api.api.to_checksum_address(a) for a in path]
-        data = contract_instance.encodeABI(
-            "swapExactTokensForTokens",
-            args=(
-                amount_in,
-                amount_out_min,
-                _path,
-                ledger_api.api.to_checksum_address(to),
-                deadline
-            )
-        )
-        return {"data": bytes.fromhex(data[2:])}
+        data = encode_swap_exact_tokens_for_tokens(amount_in, amount_out_min, path, to, deadline)
+        return {"data": data}
+
+    @classmethod
+    def build_swap_exact_eth_for_tokens_transaction(
+        cls,
+        ledger_api: EthereumApi,
+        contract_address: str,
+        amount_out_min: int,
+        path: list,
+        to: str,
+        deadline: int,
+    ) -> Dict[str, bytes]:
+        """
+        Build a swap of the native token using the Uniswap V2 Router contract.
+
+        The input amount is the value of the transaction, and `path` must start with the wrapped native token.
+
+        :param ledger_api: The AEA LedgerApi object (e.g., EthereumApi).
+        :param contract_address: The router contract address on the target chain
+        :param amount_out_min: Minimum output tokens to receive.
+        :param path: List of token addresses.
+        :param to: Recipient address.
+        :param deadline: Transaction deadline timestamp.
+        :return: The transaction dictionary.
+        """
+        data = encode_swap_exact_eth_for_tokens(amount_out_min, path, to, deadline)
+        return {"data": data}
+
+    @classmethod
+    def build_swap_exact_tokens_for_eth_transaction(
+        cls,
+        ledger_api: EthereumApi,
+        contract_address: str,
+        amount_in: int,
+        amount_out_min: int,
+        path: list,
+        to: str,
+        deadline: int,
+    ) -> Dict[str, bytes]:
+        """
+        Build a swap to the native token using the Uniswap V2 Router contract.
+
+        `path` must end with the wrapped native token, which the router unwraps to `to`.
+
+        :param ledger_api: The AEA LedgerApi object (e.g., EthereumApi).
+        :param contract_address: The router contract address on the target chain
+        :param amount_in: Amount of input tokens.
+        :param amount_out_min: Minimum native tokens to receive.
+        :param path: List of token addresses.
+        :param to: Recipient address.
+        :param deadline: Transaction deadline timestamp.
+        :return: The transaction dictionary.
+        """
+        data = encode_swap_exact_tokens_for_eth(amount_in, amount_out_min, path, to, deadline)
+        return {"data": data}
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+"""
+This script benchmarks the static calldata encoders of the contract wrappers against `encodeABI`.
+
+Every encoder is first checked to produce the same bytes as web3. It is assumed the script is run
+from the repository root.
+"""
+
+import json
+import timeit
+from pathlib import Path
+from typing import Any, Callable, List, Tuple
+
+from web3 import Web3
+
+from packages.valory.contracts.erc20.contract import (
+    encode_approve,
+    encode_deposit,
+    encode_transfer,
+    encode_withdraw,
+)
+from packages.valory.contracts.uniswapv2pair.contract import encode_swap
+from packages.valory.contracts.uniswapv2router02.contract import (
+    encode_swap_exact_tokens_for_tokens,
+)
+
+
+CONTRACTS_DIR = Path("packages", "valory", "contracts")
+NUMBER = 10_000
+
+SPENDER = Web3.to_checksum_address("0x1c232f01118cb8b424793ae03f870aa7d0ac7f77")
+TOKENS = [
+    Web3.to_checksum_address("0xe91d153e0b41518a2ce8dd3d7944fa863463a97d"),
+    Web3.to_checksum_address("0x6a023ccd1ff6f2045c3309768ead9e68f978f6e1"),
+    Web3.to_checksum_address("0xddafbb505ad214d7b80b1f830fccc89b60fb7a83"),
+]
+AMOUNT = 2 * 10**18
+
+
+def load_contract(package: str, name: str) -> Any:
+    """Build a web3 contract instance from the ABI of a contract package."""
+    build = json.loads((CONTRACTS_DIR / package / "build" / f"{name}.json").read_text())
+    return Web3().eth.contract(address=SPENDER, abi=build["abi"])
+
+
+def cases() -> List[Tuple[str, Callable[[], bytes], Callable[[], str]]]:
+    """Return the (name, static encoder, encodeABI) cases."""
+    erc20 = load_contract("erc20", "ERC20")
+    router = load_contract("uniswapv2router02", "UniswapV2Router02")
+    pair = load_contract("uniswapv2pair", "UniswapV2Pair")
+    return [
+        (
+            "approve",
+            lambda: encode_approve(SPENDER, AMOUNT),
+            lambda: erc20.encodeABI("approve", args=(SPENDER, AMOUNT)),
+        ),
+        (
+            "transfer",
+            lambda: encode_transfer(SPENDER, AMOUNT),
+            lambda: erc20.encodeABI("transfer", args=(SPENDER, AMOUNT)),
+        ),
+        ("deposit", encode_deposit, lambda: erc20.encodeABI("deposit")),
+        (
+            "withdraw",
+            lambda: encode_withdraw(AMOUNT),
+            lambda: erc20.encodeABI("withdraw", args=(AMOUNT,)),
+        ),
+        (
+            "swapExactTokensForTokens",
+            lambda: encode_swap_exact_tokens_for_tokens(
+                AMOUNT, 1, TOKENS, SPENDER, 1_700_000_000
+            ),
+            lambda: router.encodeABI(
+                "swapExactTokensForTokens",
+                args=(AMOUNT, 1, TOKENS, SPENDER, 1_700_000_000),
+            ),
+        ),
+        (
+            "swap",
+            lambda: encode_swap(0, AMOUNT, SPENDER, b"\x01" * 33),
+            lambda: pair.encodeABI("swap", args=(0, AMOUNT, SPENDER, b"\x01" * 33)),
+        ),
+    ]
+
+
+def main() -> None:
+    """Check and benchmark every encoder."""
+    print(f"{'function':<28}{'encodeABI (us)':>16}{'static (us)':>14}{'speedup':>10}")
+    for name, static, web3_encoder in cases():
+        if static() != bytes.fromhex(web3_encoder()[2:]):
+            raise ValueError(f"The static encoding of {name} differs from encodeABI")
+        web3_time = timeit.timeit(
+            lambda enc=web3_encoder: bytes.fromhex(enc()[2:]), number=NUMBER
+        )
+        static_time = timeit.timeit(static, number=NUMBER)
+        print(
+            f"{name:<28}{web3_time / NUMBER * 1e6:>16.2f}{static_time / NUMBER * 1e6:>14.2f}"
+            f"{web3_time / static_time:>9.0f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+"""
+This script reports the size of the strategy payloads in their JSON and compact binary encodings.
+
+The strategies are built from the rebalancing parameters of the skill configuration, at each stage of
+a period. Every strategy is first checked to round-trip through the binary codec. The repository
+root is put on the import path, so the script runs with `python scripts/payload_size_report.py`.
+"""
+
+import copy
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import yaml
+
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from packages.isotrop.skills.swapping_abci.codec import (  # noqa: E402  # pylint: disable=wrong-import-position
+    decode_strategy_payload,
+    encode_strategy,
+    encode_strategy_payload,
+)
+
+
+SKILL_CONFIG = (
+    ROOT_DIR / "packages" / "isotrop" / "skills" / "swapping_abci" / "skill.yaml"
+)
+
+
+def base_strategy(rebalancing: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the strategy the evaluation behaviour starts a period with."""
+    return {
+        "action": "enter",
+        "safe_nonce": 0,
+        "safe_tx_gas": {"enter": 10**6, "exit": 10**6, "swap_back": 10**6},
+        "deadline": 1_700_000_000 + rebalancing["deadline"],
+        "chain": rebalancing["chain"],
+        "token_base": {
+            "ticker": rebalancing["token_base_ticker"],
+            "address": rebalancing["token_base_address"],
+            "amount_in_max_a": rebalancing["default_max_allowance"],
+            "amount_min_after_swap_back_a": int(1e2),
+            "is_native": False,
+            "set_allowance": rebalancing["max_allowance"],
+            "remove_allowance": 0,
+        },
+        "token_LP": {
+            "address": rebalancing["lp_token_address"],
+            "set_allowance": rebalancing["max_allowance"],
+            "remove_allowance": 0,
+        },
+        "token_a": {
+            "ticker": rebalancing["token_a_ticker"],
+            "address": rebalancing["token_a_address"],
+            "amount_after_swap": int(1e3),
+            "amount_min_after_add_liq": int(0.5e3),
+            "is_native": False,
+            "set_allowance": rebalancing["max_allowance"],
+            "remove_allowance": 0,
+            "amount_received_after_exit": 0,
+        },
+    }
+
+
+def cases(rebalancing: Dict[str, Any]) -> List[Tuple[str, str, Dict[str, Any]]]:
+    """Return the (payload type, stage, strategy) cases."""
+    base, token_a = rebalancing["token_base_address"], rebalancing["token_a_address"]
+    entry = base_strategy(rebalancing)
+
+    quoted = copy.deepcopy(entry)
+    quoted["path"] = [base, rebalancing["token_b_address"], token_a]
+    quoted["token_a"]["amount_after_swap"] = 612_345_678_901_234
+
+    swap_back = copy.deepcopy(quoted)
+    swap_back["action"] = "swap_back"
+    swap_back["path"] = [token_a, base]
+    swap_back["token_a"]["amount_received"] = 612_345_678_901_234
+    swap_back["token_base"]["amount_min_after_swap_back_a"] = 1_987_654_321_098_765_432
+
+    arbitrage = copy.deepcopy(entry)
+    cycles = [
+        [base, token_a, rebalancing["token_b_address"], base],
+        [base, rebalancing["token_c_address"], rebalancing["token_d_address"], base],
+        [base, rebalancing["token_e_address"], rebalancing["token_f_address"], base],
+    ]
+    arbitrage["arbitrage"] = True
+    arbitrage["path"] = cycles[0]
+    arbitrage["trades"] = [
+        {
+            "path": cycle,
+            "amount_in": 10**18 + i,
+            "amount_out_min": 10**18 + 10**15 + i,
+        }
+        for i, cycle in enumerate(cycles)
+    ]
+
+    fast_path = copy.deepcopy(quoted)
+    fast_path["event"] = "transact"
+
+    return [
+        ("StrategyEvaluationPayload", "entry", entry),
+        ("StrategyEvaluationPayload", "swap back", swap_back),
+        ("StrategyEvaluationPayload", "arbitrage, 3 trades", arbitrage),
+        ("StrategyEvaluationPayload", "fast path", fast_path),
+        ("APICheckPayload", "quoted entry", quoted),
+        ("APICheckPayload", "quoted swap back", swap_back),
+    ]
+
+
+def main() -> None:
+    """Check the codec and report the payload sizes."""
+    rebalancing = yaml.safe_load(SKILL_CONFIG.read_text())["models"]["params"]["args"][
+        "rebalancing"
+    ]
+    print(
+        f"{'payload':<27}{'stage':<22}{'json (B)':>10}{'binary (B)':>12}{'base64 (B)':>12}{'ratio':>8}"
+    )
+    for payload_type, stage, strategy in cases(rebalancing):
+        encoded = encode_strategy_payload(strategy)
+        decoded = decode_strategy_payload(encoded)
+        if encode_strategy_payload(decoded) != encoded:
+            raise ValueError(
+                f"The {stage} strategy does not round-trip through the codec"
+            )
+        json_size = len(json.dumps(strategy, sort_keys=True))
+        print(
+            f"{payload_type:<27}{stage:<22}{json_size:>10}{len(encode_strategy(strategy)):>12}"
+            f"{len(encoded):>12}{json_size / len(encoded):>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2021-2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for the allowance cache of the swapping skill."""
+
+from packages.isotrop.skills.swapping_abci.allowances import AllowanceCache, MAX_UINT256
+
+
+WXDAI = "0xe91D153E0b41518A2Ce8Dd3D7944Fa863463a97d"
+WETH = "0x6A023CCd1ff6F2045C3309768eAd9E68F978f6e1"
+SAFE = "0x5d1A6e6f3E1c4DF8e7e5D5c6A1B6E7Cc7E4F3a21"
+ROUTER = "0x1C232F01118CB8B424793ae03F870aa7D0ac7f77"
+
+
+def test_read_allowances_are_cached_whatever_the_case() -> None:
+    """Test that the allowances read from the chain are cached, keyed case-insensitively."""
+    cache = AllowanceCache()
+    assert cache.get(WXDAI, SAFE, ROUTER) is None
+    assert cache.stale_tokens([WXDAI, WETH], SAFE, ROUTER) == [WXDAI, WETH]
+
+    cache.update(SAFE.lower(), ROUTER, {WXDAI.lower(): 10**18})
+
+    assert cache.get(WXDAI, SAFE, ROUTER) == 10**18
+    assert cache.stale_tokens([WXDAI, WETH], SAFE, ROUTER) == [WETH]
+    assert cache.get(WXDAI, SAFE, WETH) is None
+
+
+def test_submitted_approval_is_unconfirmed_until_read() -> None:
+    """Test that an approval is assumed, but read again before it is relied upon."""
+    cache = AllowanceCache()
+    cache.update(SAFE, ROUTER, {WXDAI: 0})
+
+    cache.approve(WXDAI, SAFE, ROUTER, MAX_UINT256)
+
+    assert cache.get(WXDAI, SAFE, ROUTER) == MAX_UINT256
+    assert cache.stale_tokens([WXDAI], SAFE, ROUTER) == [WXDAI]
+    cache.update(SAFE, ROUTER, {WXDAI: MAX_UINT256})
+    assert cache.stale_tokens([WXDAI], SAFE, ROUTER) == []
+
+
+def test_spend_decreases_a_finite_allowance() -> None:
+    """Test that a swap spends a finite allowance, down to zero, and leaves it unconfirmed."""
+    cache = AllowanceCache()
+    cache.update(SAFE, ROUTER, {WXDAI: 10**18})
+
+    cache.spend(WXDAI, SAFE, ROUTER, 4 * 10**17)
+    assert cache.get(WXDAI, SAFE, ROUTER) == 6 * 10**17
+    assert cache.stale_tokens([WXDAI], SAFE, ROUTER) == [WXDAI]
+
+    cache.spend(WXDAI, SAFE, ROUTER, 10**18)
+    assert cache.get(WXDAI, SAFE, ROUTER) == 0
+
+
+def test_spend_keeps_an_infinite_or_unknown_allowance() -> None:
+    """Test that an infinite allowance is never decreased, and an unknown one is not assumed."""
+    cache = AllowanceCache()
+    cache.update(SAFE, ROUTER, {WXDAI: MAX_UINT256})
+
+    cache.spend(WXDAI, SAFE, ROUTER, 10**18)
+    cache.spend(WETH, SAFE, ROUTER, 10**18)
+
+    assert cache.get(WXDAI, SAFE, ROUTER) == MAX_UINT256
+    assert cache.stale_tokens([WXDAI, WETH], SAFE, ROUTER) == [WETH]
+    assert cache.get(WETH, SAFE, ROUTER) is None
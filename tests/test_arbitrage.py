@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2021-2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for the cyclic arbitrage detector of the swapping skill."""
+
+import random
+from itertools import combinations
+from typing import List
+from unittest.mock import patch
+
+import pytest
+
+from packages.isotrop.skills.swapping_abci.arbitrage import (
+    ArbitrageDetector,
+    evaluate_cycle,
+    rotate_cycle,
+)
+from packages.isotrop.skills.swapping_abci.quoting import ReserveTable
+
+
+WXDAI = "0xe91d153e0b41518a2ce8dd3d7944fa863463a97d"
+WETH = "0x6a023ccd1ff6f2045c3309768ead9e68f978f6e1"
+USDC = "0xddafbb505ad214d7b80b1f830fccc89b60fb7a83"
+HNY = "0x71850b7e9ee3f13ab46d67167341e4bdc905eef9"
+TOKENS = [WXDAI, WETH, USDC, HNY]
+
+
+def balanced_reserves() -> ReserveTable:
+    """Return pools of four tokens priced consistently, so that no cycle is profitable."""
+    prices = {WXDAI: 1, WETH: 2000, USDC: 1, HNY: 20}
+    table = ReserveTable()
+    for index, (token_a, token_b) in enumerate(combinations(TOKENS, 2)):
+        table.update(
+            f"0x{index:040x}",
+            token_a,
+            token_b,
+            10**24 // prices[token_a],
+            10**24 // prices[token_b],
+        )
+    return table
+
+
+def set_price(table: ReserveTable, token_a: str, token_b: str, factor: float) -> None:
+    """Make `token_b` cheaper in the pool of `token_a` and `token_b`, by `factor`."""
+    reserve_a, reserve_b = table.get_reserves(token_a, token_b)  # type: ignore
+    table.update(
+        table.pair_address(token_a, token_b),  # type: ignore
+        token_a,
+        token_b,
+        reserve_a,
+        int(reserve_b * factor),
+    )
+
+
+def paths(detector: ArbitrageDetector) -> List[tuple]:
+    """Return the ranked paths of the known opportunities."""
+    return [opportunity.path for opportunity in detector.opportunities]
+
+
+def test_balanced_pools_have_no_opportunity() -> None:
+    """Test that consistent prices yield no cycle."""
+    assert ArbitrageDetector().update(balanced_reserves()) == []
+
+
+def test_mispriced_pool_is_arbitraged() -> None:
+    """Test that cycles through a mispriced pool are found, sized and ranked by profit."""
+    table = balanced_reserves()
+    set_price(table, WXDAI, WETH, 1.05)
+
+    opportunities = ArbitrageDetector().update(table)
+
+    assert opportunities
+    best = opportunities[0]
+    assert best.profit == max(opportunity.profit for opportunity in opportunities)
+    assert best.path[0] == best.path[-1] == min(best.path)
+    assert list(best.amounts) == table.get_amounts_out(best.amount_in, best.path)
+    for opportunity in opportunities:
+        assert opportunity.profit > 0
+        assert (WETH, WXDAI) in opportunity.pairs
+        assert 3 <= len(opportunity.path) <= 5
+    # a slightly larger or smaller input yields less
+    for amount_in in (best.amount_in * 99 // 100, best.amount_in * 101 // 100):
+        amounts = table.get_amounts_out(amount_in, best.path)
+        assert amounts[-1] - amount_in <= best.profit  # type: ignore
+
+
+def test_cycle_length_is_bounded() -> None:
+    """Test that no cycle is longer than `max_cycle_length` swaps."""
+    table = balanced_reserves()
+    set_price(table, WXDAI, WETH, 1.05)
+
+    opportunities = ArbitrageDetector(max_cycle_length=3).update(table)
+
+    assert opportunities
+    assert all(len(opportunity.path) == 4 for opportunity in opportunities)
+
+
+def test_tokens_restrict_the_pools() -> None:
+    """Test that only the pools between the given tokens are searched."""
+    table = balanced_reserves()
+    set_price(table, WXDAI, HNY, 1.05)
+
+    opportunities = ArbitrageDetector().update(table, [WXDAI, WETH, USDC])
+
+    assert opportunities == []
+
+
+def test_unchanged_reserves_are_not_searched_again() -> None:
+    """Test that a second call with the same reserves returns the same result without searching."""
+    table = balanced_reserves()
+    set_price(table, WXDAI, WETH, 1.05)
+    detector = ArbitrageDetector()
+    first = detector.update(table)
+
+    with patch.object(ArbitrageDetector, "_find_negative_cycles") as search:
+        assert detector.update(table) == first
+    search.assert_not_called()
+
+
+def test_only_the_changed_pools_are_searched() -> None:
+    """Test that only the cycles through the pools whose reserves changed are searched again."""
+    table = balanced_reserves()
+    detector = ArbitrageDetector()
+    detector.update(table)
+    set_price(table, USDC, HNY, 1.05)
+
+    with patch.object(
+        ArbitrageDetector, "_find_negative_cycles", autospec=True, return_value=[]
+    ) as search:
+        detector.update(table)
+
+    (_, _, changed), _ = search.call_args
+    assert changed == {(HNY, USDC)}
+
+
+def test_incremental_updates_match_a_full_search() -> None:
+    """Test that the opportunities only depend on the reserves, whatever the previous updates."""
+    rng = random.Random(7)
+    table = balanced_reserves()
+    detector = ArbitrageDetector()
+    for _ in range(30):
+        for token_a, token_b in rng.sample(list(combinations(TOKENS, 2)), k=2):
+            set_price(table, token_a, token_b, rng.uniform(0.95, 1.05))
+
+        expected = ArbitrageDetector().update(table)
+        assert detector.update(table) == expected
+        assert paths(detector) == [opportunity.path for opportunity in expected]
+
+
+@pytest.mark.parametrize(
+    "token, expected",
+    [
+        (WETH, (WETH, USDC, WXDAI, WETH)),
+        (WXDAI, (WXDAI, WETH, USDC, WXDAI)),
+        (HNY, None),
+    ],
+)
+def test_rotate_cycle(token: str, expected: tuple) -> None:
+    """Test that a cycle is rotated to start and end at a token it goes through."""
+    assert rotate_cycle((USDC, WXDAI, WETH, USDC), token.upper()) == expected
+
+
+def test_unprofitable_cycle_is_not_evaluated() -> None:
+    """Test that a cycle on consistent prices has no opportunity."""
+    assert evaluate_cycle(balanced_reserves(), (WXDAI, WETH, USDC, WXDAI)) is None
@@ -0,0 +1,449 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2021-2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for the behaviours of the swapping skill."""
+
+from functools import partial
+from typing import Any, Callable, Dict, Generator, List, Optional
+from unittest.mock import MagicMock
+
+import pytest
+
+from packages.isotrop.skills.swapping_abci.allowances import AllowanceCache, MAX_UINT256
+from packages.isotrop.skills.swapping_abci.behaviours import (
+    BlockPinningBehaviour,
+    StrategyEvaluationBehaviour,
+    SwappingBaseBehaviour,
+    TxPreparationBehaviour,
+)
+from packages.isotrop.skills.swapping_abci.block_cache import BlockReadCache
+from packages.isotrop.skills.swapping_abci.payloads import StrategyType
+from packages.isotrop.skills.swapping_abci.quoting import ReserveTable
+from packages.isotrop.skills.swapping_abci.rounds import Event, get_quoted_amounts
+from packages.isotrop.skills.swapping_abci.strategy import Strategy, get_strategy_digest
+from packages.valory.contracts.erc20.contract import encode_approve, encode_transfer
+from packages.valory.contracts.multisend.contract import MultiSendOperation
+from packages.valory.contracts.uniswapv2pair.contract import encode_swap
+from packages.valory.protocols.contract_api import ContractApiMessage
+from packages.valory.protocols.ledger_api.message import LedgerApiMessage
+from packages.valory.skills.abstract_round_abci.behaviour_utils import TimeoutException
+
+
+PAIR = "0x7BEa4Af5D425f2d4485BDad1859c88617dF31A67"
+
+
+def make_behaviour() -> MagicMock:
+    """Return a swapping behaviour whose framework calls are mocked, and whose nonces are the request order."""
+    behaviour = MagicMock()
+    behaviour.local_state.block_reads = BlockReadCache()
+    behaviour.context.requests.request_id_to_callback = {}
+    behaviour.context.contract_api_dialogues.create.side_effect = lambda **kwargs: (
+        MagicMock(kwargs=kwargs),
+        MagicMock(),
+    )
+    nonces = iter(range(100))
+    behaviour._get_request_nonce_from_dialogue.side_effect = lambda _: str(next(nonces))
+    behaviour._collect_response = (  # pylint: disable=protected-access
+        SwappingBaseBehaviour._collect_response  # pylint: disable=protected-access
+    )
+    return behaviour
+
+
+def reserves_request(block: Any = 100, pair: str = PAIR) -> Dict[str, Any]:
+    """Return the request of the reserves of a pair."""
+    return dict(
+        performative=ContractApiMessage.Performative.GET_STATE,
+        contract_address=pair,
+        contract_id="valory/uniswapv2pair:0.1.0",
+        contract_callable="get_reserves",
+        block_identifier=block,
+    )
+
+
+def state_response(value: int) -> MagicMock:
+    """Return a `STATE` response."""
+    return MagicMock(
+        performative=ContractApiMessage.Performative.STATE,
+        state=MagicMock(body={"value": value}),
+    )
+
+
+def respond(behaviour: MagicMock, answers: Dict[str, Any]) -> Callable:
+    """Return a `wait_for_condition` that delivers the answers, by nonce, in the given order."""
+
+    def wait_for_condition(
+        condition: Callable[[], bool], timeout: Optional[float] = None
+    ) -> Generator[None, None, None]:
+        callbacks = behaviour.context.requests.request_id_to_callback
+        for nonce, answer in answers.items():
+            callbacks.pop(nonce)(answer, behaviour)
+            yield
+        if not condition():
+            raise TimeoutException()
+
+    return wait_for_condition
+
+
+def run(generator: Generator) -> Any:
+    """Run a behaviour generator to completion and return its result."""
+    try:
+        while True:
+            next(generator)
+    except StopIteration as stop:
+        return stop.value
+
+
+def fan_out(behaviour: MagicMock, requests: List[Dict], **kwargs: Any) -> List:
+    """Call `get_contract_api_responses` on the behaviour."""
+    return run(
+        SwappingBaseBehaviour.get_contract_api_responses(behaviour, requests, **kwargs)
+    )
+
+
+def test_requests_are_sent_at_once_and_answered_in_their_order() -> None:
+    """Test that every request is sent before waiting, and that the responses are in the order of the requests."""
+    behaviour = make_behaviour()
+    first, second, third = state_response(1), state_response(2), state_response(3)
+    behaviour.wait_for_condition.side_effect = respond(
+        behaviour, {"2": third, "0": first, "1": second}
+    )
+    requests = [reserves_request(pair=f"0x{index:040x}") for index in range(3)]
+
+    responses = fan_out(behaviour, requests)
+
+    assert responses == [first, second, third]
+    assert behaviour.context.outbox.put_message.call_count == 3
+    behaviour.wait_for_condition.assert_called_once()
+    sent = [
+        call.kwargs["kwargs"]
+        for call in behaviour.context.contract_api_dialogues.create.call_args_list
+    ]
+    assert [dict(kwargs.body) for kwargs in sent] == [{"block_identifier": 100}] * 3
+
+
+def test_timeout_returns_none_for_the_missing_responses() -> None:
+    """Test that a timeout does not raise, and that the missing responses are None."""
+    behaviour = make_behaviour()
+    response = state_response(1)
+    behaviour.wait_for_condition.side_effect = respond(behaviour, {"1": response})
+    requests = [reserves_request(pair=f"0x{index:040x}") for index in range(2)]
+
+    responses = fan_out(behaviour, requests, timeout=1.0)
+
+    assert responses == [None, response]
+    behaviour.context.logger.warning.assert_called_once()
+
+
+def test_min_responses_resumes_early() -> None:
+    """Test that the behaviour resumes once the minimum number of responses arrived."""
+    behaviour = make_behaviour()
+    response = state_response(1)
+    behaviour.wait_for_condition.side_effect = respond(behaviour, {"0": response})
+    requests = [reserves_request(pair=f"0x{index:040x}") for index in range(3)]
+
+    responses = fan_out(behaviour, requests, min_responses=1)
+
+    assert responses == [response, None, None]
+    behaviour.context.logger.warning.assert_not_called()
+
+
+def test_pinned_reads_are_answered_from_the_block_cache() -> None:
+    """Test that the pinned responses are cached, and that only the other requests are sent again."""
+    behaviour = make_behaviour()
+    pinned, latest = state_response(1), state_response(2)
+    behaviour.wait_for_condition.side_effect = respond(
+        behaviour, {"0": pinned, "1": latest}
+    )
+    requests = [reserves_request(), reserves_request("latest")]
+    assert fan_out(behaviour, requests) == [pinned, latest]
+
+    refreshed = state_response(3)
+    behaviour.wait_for_condition.side_effect = respond(behaviour, {"2": refreshed})
+
+    assert fan_out(behaviour, requests) == [pinned, refreshed]
+    assert behaviour.context.outbox.put_message.call_count == 3
+
+
+def test_cached_responses_count_towards_min_responses() -> None:
+    """Test that the behaviour does not wait when the cache already has enough responses."""
+    behaviour = make_behaviour()
+    pinned = state_response(1)
+    behaviour.local_state.block_reads.put(reserves_request(), pinned)
+
+    responses = fan_out(
+        behaviour, [reserves_request(), reserves_request("latest")], min_responses=1
+    )
+
+    assert responses == [pinned, None]
+    behaviour.wait_for_condition.assert_not_called()
+
+
+WXDAI = "0xe91d153e0b41518a2ce8dd3d7944fa863463a97d"
+WETH = "0x6a023ccd1ff6f2045c3309768ead9e68f978f6e1"
+USDC = "0xddafbb505ad214d7b80b1f830fccc89b60fb7a83"
+HNY = "0x71850b7e9ee3f13ab46d67167341e4bdc905eef9"
+SAFE = "0x5d1A6e6f3E1c4DF8e7e5D5c6A1B6E7Cc7E4F3a21"
+ROUTER = "0x1C232F01118CB8B424793ae03F870aa7D0ac7f77"
+WXDAI_WETH_PAIR = "0x0000000000000000000000000000000000000001"
+WETH_USDC_PAIR = "0x0000000000000000000000000000000000000002"
+
+
+def make_tx_preparation(use_direct_pair_swaps: bool = True) -> MagicMock:
+    """Return a TxPreparation behaviour with cached reserves, whose trade building methods are the real ones."""
+    behaviour = MagicMock()
+    behaviour.params.use_direct_pair_swaps = use_direct_pair_swaps
+    behaviour.params.uni_router_address = ROUTER
+    behaviour.synchronized_data.safe_contract_address = SAFE
+    behaviour.local_state.allowances = AllowanceCache()
+    reserves = ReserveTable()
+    reserves.update(WXDAI_WETH_PAIR, WXDAI, WETH, 2 * 10**24, 10**21)
+    reserves.update(WETH_USDC_PAIR, WETH, USDC, 10**21, 2 * 10**15)
+    behaviour.local_state.reserves = reserves
+    for name in (
+        "_build_direct_swap_txs",
+        "_get_path_pairs",
+        "_build_approval_tx",
+        "_build_arbitrage_swap_tx_v1",
+    ):
+        setattr(
+            behaviour, name, partial(getattr(TxPreparationBehaviour, name), behaviour)
+        )
+    return behaviour
+
+
+def build_trade_txs(behaviour: MagicMock, path: List[str], **kwargs: Any) -> List[dict]:
+    """Call `_build_trade_txs` on the behaviour."""
+    return TxPreparationBehaviour._build_trade_txs(  # pylint: disable=protected-access
+        behaviour,
+        path,
+        kwargs.pop("amount_in", 10**21),
+        kwargs.pop("amount_out_min", 0),
+        kwargs.pop("native_in", False),
+        kwargs.pop("native_out", False),
+    )
+
+
+def test_direct_swap_chains_the_pairs() -> None:
+    """Test that a direct swap transfers into the first pair, and that each hop pays the next pair, then the Safe."""
+    behaviour = make_tx_preparation()
+    path = [WXDAI, WETH, USDC]
+    amounts = behaviour.local_state.reserves.get_amounts_out(10**21, path)
+
+    txs = build_trade_txs(behaviour, path)
+
+    assert [tx["to"] for tx in txs] == [WXDAI, WXDAI_WETH_PAIR, WETH_USDC_PAIR]
+    assert all(tx["operation"] == MultiSendOperation.CALL for tx in txs)
+    assert bytes(txs[0]["data"]) == encode_transfer(WXDAI_WETH_PAIR, 10**21)
+    # WETH is token0 of the WXDAI/WETH pair, and token1 of the WETH/USDC pair
+    assert bytes(txs[1]["data"]) == encode_swap(amounts[1], 0, WETH_USDC_PAIR, b"")
+    assert bytes(txs[2]["data"]) == encode_swap(0, amounts[2], SAFE, b"")
+    assert behaviour.local_state.allowances.get(WXDAI, SAFE, ROUTER) is None
+
+
+def test_direct_swap_falls_back_to_the_router() -> None:
+    """Test that the router is used for an uncached pair, a quote below the minimum, or native xDAI."""
+    behaviour = make_tx_preparation()
+    amount_out = behaviour.local_state.reserves.get_amounts_out(
+        10**21, [WXDAI, WETH]
+    )[-1]
+
+    for path, kwargs in (
+        ([WXDAI, HNY], {}),
+        ([WXDAI, WETH], {"amount_out_min": amount_out + 1}),
+        ([WXDAI, WETH], {"native_in": True}),
+    ):
+        txs = build_trade_txs(behaviour, path, **kwargs)
+        assert txs[-1]["to"] == ROUTER
+
+
+def test_router_swap_approves_only_an_insufficient_allowance() -> None:
+    """Test that the router path approves the source token once, then relies on the cached allowance."""
+    behaviour = make_tx_preparation(use_direct_pair_swaps=False)
+
+    first = build_trade_txs(behaviour, [WXDAI, WETH])
+    second = build_trade_txs(behaviour, [WXDAI, WETH])
+
+    assert [tx["to"] for tx in first] == [WXDAI, ROUTER]
+    assert bytes(first[0]["data"]) == encode_approve(ROUTER, MAX_UINT256)
+    assert [tx["to"] for tx in second] == [ROUTER]
+
+
+def entered_strategy() -> Dict[str, Any]:
+    """Return the dict form of an entry into WETH, as agreed on in a previous period."""
+    return {
+        "action": StrategyType.ENTER.value,
+        "deadline": 1_700_000_300,
+        "chain": "gnosis",
+        "safe_nonce": 3,
+        "safe_tx_gas": {"enter": 0, "exit": 0, "swap_back": 0},
+        "token_base": {
+            "ticker": "WXDAI",
+            "address": WXDAI,
+            "amount_in_max_a": 10**21,
+        },
+        "token_a": {
+            "ticker": "WETH",
+            "address": WETH,
+            "amount_after_swap": 5 * 10**17,
+        },
+        "token_LP": {"address": WXDAI_WETH_PAIR},
+        "path": [WXDAI, WETH],
+        "event": Event.TRANSACT.value,
+    }
+
+
+def make_strategy_evaluation(quote: Callable[[dict], None]) -> MagicMock:
+    """Return a StrategyEvaluation behaviour on the fast path, whose quotes are done by `quote`."""
+    behaviour = MagicMock()
+    behaviour.params.use_block_pinning = False
+    behaviour.params.use_fast_path = True
+    behaviour.synchronized_data.strategy = Strategy.from_dict(entered_strategy())
+    behaviour.synchronized_data.safe_contract_address = SAFE
+
+    def quote_strategy(strategy: dict) -> Generator[None, None, None]:
+        quote(strategy)
+        yield
+
+    behaviour.quote_strategy.side_effect = quote_strategy
+    behaviour.get_decision_event = partial(
+        SwappingBaseBehaviour.get_decision_event, behaviour
+    )
+    return behaviour
+
+
+def test_fast_path_without_quote_ends_the_period() -> None:
+    """Test that the fast path decides DONE when quoting failed, rather than transacting without a path."""
+    behaviour = make_strategy_evaluation(lambda strategy: None)
+
+    strategy = run(StrategyEvaluationBehaviour.evaluate_strategy(behaviour))
+
+    assert strategy["action"] == StrategyType.SWAP_BACK.value
+    assert "path" not in strategy
+    assert strategy["event"] == Event.DONE.value
+
+
+def test_fast_path_transacts_a_quoted_swap_back() -> None:
+    """Test that the fast path decides to transact a swap back that was quoted."""
+
+    def quote(strategy: dict) -> None:
+        strategy["path"] = [WETH, WXDAI]
+        strategy["token_a"]["amount_received"] = 5 * 10**17
+        strategy["token_base"]["amount_min_after_swap_back_a"] = 10**21
+
+    behaviour = make_strategy_evaluation(quote)
+
+    strategy = run(StrategyEvaluationBehaviour.evaluate_strategy(behaviour))
+
+    assert strategy["event"] == Event.TRANSACT.value
+
+
+def test_swap_back_without_balance_is_not_quoted() -> None:
+    """Test that a swap back of an empty balance is not quoted as an entry, so that the period ends."""
+    behaviour = MagicMock()
+    behaviour.synchronized_data.safe_contract_address = SAFE
+    behaviour._get_safe_balance = partial(  # pylint: disable=protected-access
+        SwappingBaseBehaviour._get_safe_balance,  # pylint: disable=protected-access
+        behaviour,
+    )
+    strategy = entered_strategy()
+    strategy["action"] = StrategyType.SWAP_BACK.value
+    del strategy["path"], strategy["event"]
+
+    quote = run(SwappingBaseBehaviour.get_eq_prices(behaviour, strategy, balances={}))
+
+    assert quote == ([], [])
+    assert "path" not in strategy and "amount_received" not in strategy["token_a"]
+    behaviour._get_amounts_and_prices.assert_not_called()  # pylint: disable=protected-access
+    amounts = get_quoted_amounts(Strategy.from_dict(strategy))
+    assert (
+        SwappingBaseBehaviour.get_decision_event(behaviour, amounts, [])
+        == Event.DONE.value
+    )
+
+
+def make_block_pinning(latest: Optional[int]) -> MagicMock:
+    """Return a BlockPinning behaviour whose latest block is `latest`, or unreadable if None."""
+    behaviour = MagicMock()
+    behaviour.params.use_block_pinning = True
+    behaviour.params.block_pin_confirmations = 2
+    response = MagicMock(
+        performative=LedgerApiMessage.Performative.STATE,
+        state=MagicMock(body={"get_block_number_result": latest}),
+    )
+    if latest is None:
+        response.performative = LedgerApiMessage.Performative.ERROR
+
+    def get_ledger_api_response(**_: Any) -> Generator[None, None, MagicMock]:
+        yield
+        return response
+
+    behaviour.get_ledger_api_response.side_effect = get_ledger_api_response
+    behaviour.propose_read_block = partial(
+        BlockPinningBehaviour.propose_read_block, behaviour
+    )
+    return behaviour
+
+
+def sent_payload(behaviour: MagicMock) -> Any:
+    """Return the payload the behaviour sent."""
+    behaviour.send_a2a_transaction.assert_called_once()
+    return behaviour.send_a2a_transaction.call_args.args[0]
+
+
+@pytest.mark.parametrize(
+    "use_block_pinning, latest, expected",
+    [(True, 1000, 998), (True, 1, 0), (True, None, None), (False, 1000, None)],
+)
+def test_block_proposal(
+    use_block_pinning: bool, latest: Optional[int], expected: Optional[int]
+) -> None:
+    """Test that an agent proposes the latest block less the confirmations, if it pins the reads."""
+    behaviour = make_block_pinning(latest)
+    behaviour.params.use_block_pinning = use_block_pinning
+
+    run(BlockPinningBehaviour.async_act(behaviour))
+
+    assert sent_payload(behaviour).block == expected
+    assert behaviour.get_ledger_api_response.called == use_block_pinning
+
+
+def test_every_agent_evaluates_the_strategy_at_the_pinned_block() -> None:
+    """Test that an agent other than the keeper evaluates the strategy at the pinned block, and votes its digest."""
+    behaviour = make_strategy_evaluation(lambda strategy: None)
+    behaviour.params.use_block_pinning = True
+    behaviour.params.use_digest_voting = True
+    behaviour.is_keeper = False
+    behaviour.synchronized_data.read_block = 998
+    behaviour.read_block = SwappingBaseBehaviour.read_block.fget(behaviour)
+    behaviour.evaluate_strategy = partial(
+        StrategyEvaluationBehaviour.evaluate_strategy, behaviour
+    )
+    behaviour.get_strategy_vote = partial(
+        SwappingBaseBehaviour.get_strategy_vote, behaviour
+    )
+
+    run(StrategyEvaluationBehaviour.async_act(behaviour))
+
+    payload = sent_payload(behaviour)
+    assert payload.strategy == ""
+    evaluated = behaviour.quote_strategy.call_args.args[0]
+    assert evaluated["read_block"] == 998
+    assert payload.digest == get_strategy_digest(
+        Strategy.from_dict(evaluated).serialize()
+    )
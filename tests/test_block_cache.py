@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2021-2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for the cache of the block-pinned reads of the swapping skill."""
+
+from typing import Any, Dict
+
+import pytest
+
+from packages.isotrop.skills.swapping_abci.block_cache import (
+    BlockReadCache,
+    get_pinned_block,
+    get_request_key,
+)
+
+
+PAIR = "0x7BEa4Af5D425f2d4485BDad1859c88617dF31A67"
+
+
+def reserves_request(block: Any = 100, **kwargs: Any) -> Dict[str, Any]:
+    """Return the request of the reserves of a pair."""
+    return dict(
+        performative="get_state",
+        contract_address=kwargs.get("pair", PAIR),
+        contract_id="valory/uniswapv2pair:0.1.0",
+        contract_callable="get_reserves",
+        block_identifier=block,
+    )
+
+
+def test_request_key_ignores_the_performative_and_the_order() -> None:
+    """Test that the key of a request only depends on its arguments."""
+    request = reserves_request()
+    reordered = dict(reversed(list(request.items())))
+    reordered["performative"] = "get_raw_transaction"
+
+    assert get_request_key(request) == get_request_key(reordered)
+    assert get_request_key(request) != get_request_key(reserves_request(101))
+
+
+@pytest.mark.parametrize(
+    "block_identifier, expected",
+    [(100, 100), (0, 0), ("latest", None), (None, None)],
+)
+def test_pinned_block(block_identifier: Any, expected: Any) -> None:
+    """Test that only a block number pins a request."""
+    assert get_pinned_block(reserves_request(block_identifier)) == expected
+    assert get_pinned_block({"contract_callable": "get_reserves"}) is None
+
+
+def test_pinned_responses_are_cached() -> None:
+    """Test that the response of a pinned request is returned for the same request at the same block."""
+    cache = BlockReadCache()
+    response = object()
+
+    cache.put(reserves_request(), response)
+
+    assert cache.block == 100
+    assert len(cache) == 1
+    assert cache.get(reserves_request()) is response
+    assert cache.get(reserves_request(pair=f"0x{1:040x}")) is None
+    assert cache.get(reserves_request(101)) is None
+
+
+def test_latest_reads_are_not_cached() -> None:
+    """Test that the response of a request of the latest state is neither cached nor returned."""
+    cache = BlockReadCache()
+
+    cache.put(reserves_request("latest"), object())
+
+    assert len(cache) == 0
+    assert cache.block is None
+    assert cache.get(reserves_request("latest")) is None
+
+
+def test_a_new_block_drops_the_responses_of_the_previous_one() -> None:
+    """Test that only the responses of the last pinned block are kept."""
+    cache = BlockReadCache()
+    previous, current = object(), object()
+    cache.put(reserves_request(), previous)
+
+    cache.put(reserves_request(101, pair=f"0x{1:040x}"), current)
+
+    assert cache.block == 101
+    assert len(cache) == 1
+    assert cache.get(reserves_request()) is None
+    assert cache.get(reserves_request(101, pair=f"0x{1:040x}")) is current
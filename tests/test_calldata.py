@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2021-2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for the static calldata encoders of the contract wrappers and of the multisend."""
+
+from typing import Any, List
+
+import pytest
+from eth_abi import encode
+from eth_abi.packed import encode_packed
+from web3 import Web3
+
+from packages.isotrop.skills.swapping_abci.multisend import encode_multisend
+from packages.valory.contracts.erc20.contract import (
+    encode_address,
+    encode_allowance,
+    encode_approve,
+    encode_bytes,
+    encode_deposit,
+    encode_transfer,
+    encode_uint256,
+    encode_withdraw,
+)
+from packages.valory.contracts.multisend.contract import MultiSendOperation
+from packages.valory.contracts.uniswapv2pair.contract import encode_swap
+from packages.valory.contracts.uniswapv2router02.contract import (
+    encode_swap_exact_eth_for_tokens,
+    encode_swap_exact_tokens_for_eth,
+    encode_swap_exact_tokens_for_tokens,
+)
+
+
+ACCOUNT = Web3.to_checksum_address("0x1c232f01118cb8b424793ae03f870aa7d0ac7f77")
+TOKENS = [
+    Web3.to_checksum_address("0xe91d153e0b41518a2ce8dd3d7944fa863463a97d"),
+    Web3.to_checksum_address("0x6a023ccd1ff6f2045c3309768ead9e68f978f6e1"),
+    Web3.to_checksum_address("0xddafbb505ad214d7b80b1f830fccc89b60fb7a83"),
+]
+AMOUNTS = [0, 1, 2 * 10**18, 2**256 - 1]
+DEADLINE = 1_700_000_000
+
+
+def abi_calldata(signature: str, types: List[str], args: List[Any]) -> bytes:
+    """Return the calldata of a call, encoded by eth_abi."""
+    return Web3.keccak(text=signature)[:4] + encode(types, args)
+
+
+@pytest.mark.parametrize("amount", AMOUNTS)
+def test_word_encoders(amount: int) -> None:
+    """Test the shared ABI word encoders against eth_abi."""
+    assert encode_uint256(amount) == encode(["uint256"], [amount])
+    assert encode_address(ACCOUNT) == encode(["address"], [ACCOUNT])
+    assert encode_address(ACCOUNT.lower()[2:]) == encode(["address"], [ACCOUNT])
+    data = amount.to_bytes(32, "big").lstrip(b"\x00")
+    # the tail of a dynamic `bytes` argument follows its offset word
+    assert encode_uint256(32) + encode_bytes(data) == encode(["bytes"], [data])
+
+
+def test_word_encoders_reject_invalid_values() -> None:
+    """Test that negative amounts and malformed addresses are not encoded."""
+    with pytest.raises(ValueError, match="negative"):
+        encode_uint256(-1)
+    with pytest.raises(ValueError, match="Invalid address"):
+        encode_address(ACCOUNT[:-2])
+
+
+@pytest.mark.parametrize("amount", AMOUNTS)
+def test_erc20_encoders(amount: int) -> None:
+    """Test the ERC20 encoders against eth_abi."""
+    assert encode_approve(ACCOUNT, amount) == abi_calldata(
+        "approve(address,uint256)", ["address", "uint256"], [ACCOUNT, amount]
+    )
+    assert encode_transfer(ACCOUNT, amount) == abi_calldata(
+        "transfer(address,uint256)", ["address", "uint256"], [ACCOUNT, amount]
+    )
+    assert encode_withdraw(amount) == abi_calldata(
+        "withdraw(uint256)", ["uint256"], [amount]
+    )
+
+
+def test_erc20_argument_free_encoders() -> None:
+    """Test the ERC20 encoders whose calldata does not depend on amounts against eth_abi."""
+    assert encode_deposit() == abi_calldata("deposit()", [], [])
+    assert encode_allowance(ACCOUNT, TOKENS[0]) == abi_calldata(
+        "allowance(address,address)", ["address", "address"], [ACCOUNT, TOKENS[0]]
+    )
+
+
+@pytest.mark.parametrize("data", [b"", b"\x01", bytes(range(33))])
+def test_pair_swap_encoder(data: bytes) -> None:
+    """Test the pair swap encoder against eth_abi, with data of any length."""
+    assert encode_swap(10**18, 0, ACCOUNT, data) == abi_calldata(
+        "swap(uint256,uint256,address,bytes)",
+        ["uint256", "uint256", "address", "bytes"],
+        [10**18, 0, ACCOUNT, data],
+    )
+
+
+@pytest.mark.parametrize("path", [TOKENS[:2], TOKENS, TOKENS + TOKENS[:1]])
+def test_router_swap_encoders(path: List[str]) -> None:
+    """Test the router swap encoders against eth_abi, with paths of any length."""
+    amount_in, amount_out_min = 2 * 10**18, 10**15
+    assert encode_swap_exact_tokens_for_tokens(
+        amount_in, amount_out_min, path, ACCOUNT, DEADLINE
+    ) == abi_calldata(
+        "swapExactTokensForTokens(uint256,uint256,address[],address,uint256)",
+        ["uint256", "uint256", "address[]", "address", "uint256"],
+        [amount_in, amount_out_min, path, ACCOUNT, DEADLINE],
+    )
+    assert encode_swap_exact_tokens_for_eth(
+        amount_in, amount_out_min, path, ACCOUNT, DEADLINE
+    ) == abi_calldata(
+        "swapExactTokensForETH(uint256,uint256,address[],address,uint256)",
+        ["uint256", "uint256", "address[]", "address", "uint256"],
+        [amount_in, amount_out_min, path, ACCOUNT, DEADLINE],
+    )
+    assert encode_swap_exact_eth_for_tokens(
+        amount_out_min, path, ACCOUNT, DEADLINE
+    ) == abi_calldata(
+        "swapExactETHForTokens(uint256,address[],address,uint256)",
+        ["uint256", "address[]", "address", "uint256"],
+        [amount_out_min, path, ACCOUNT, DEADLINE],
+    )
+
+
+def test_multisend_encoder() -> None:
+    """Test the multisend encoder against the eth_abi packed encoding of its sub-transactions."""
+    txs = [
+        {
+            "operation": MultiSendOperation.CALL,
+            "to": TOKENS[0],
+            "value": 10**18,
+            "data": encode_deposit(),
+        },
+        {
+            "operation": MultiSendOperation.CALL,
+            "to": TOKENS[0],
+            "value": 0,
+            "data": encode_approve(ACCOUNT, 1),
+        },
+        {
+            "operation": MultiSendOperation.DELEGATE_CALL,
+            "to": ACCOUNT,
+            "value": 0,
+            "data": b"",
+        },
+    ]
+    packed = b"".join(
+        encode_packed(
+            ["uint8", "address", "uint256", "uint256", "bytes"],
+            [tx["operation"].value, tx["to"], tx["value"], len(tx["data"]), tx["data"]],
+        )
+        for tx in txs
+    )
+
+    assert encode_multisend(txs) == abi_calldata(
+        "multiSend(bytes)", ["bytes"], [packed]
+    )
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2021-2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for the compact binary codec of the strategy payloads."""
+
+import base64
+import copy
+from typing import Any, Dict
+
+import pytest
+from web3 import Web3
+
+from packages.isotrop.skills.swapping_abci.codec import (
+    STRATEGY_SCHEMA_VERSION,
+    decode_strategy_bytes,
+    decode_strategy_payload,
+    decode_varint,
+    encode_strategy,
+    encode_strategy_payload,
+    encode_varint,
+)
+from packages.isotrop.skills.swapping_abci.strategy import Strategy
+
+
+BASE = Web3.to_checksum_address("0xe91d153e0b41518a2ce8dd3d7944fa863463a97d")
+TOKEN_A = Web3.to_checksum_address("0x6a023ccd1ff6f2045c3309768ead9e68f978f6e1")
+TOKEN_B = Web3.to_checksum_address("0xddafbb505ad214d7b80b1f830fccc89b60fb7a83")
+PAIR = Web3.to_checksum_address("0x8c36f7ca02f40c0d7d8f4d2e2a6a3f6c38a5d3c4")
+MAX_UINT256 = 2**256 - 1
+
+
+def entry_strategy() -> Dict[str, Any]:
+    """Return an entry strategy, as built by the evaluation behaviour."""
+    return {
+        "action": "enter",
+        "deadline": 1_700_000_300,
+        "chain": "gnosis",
+        "safe_nonce": 0,
+        "safe_tx_gas": {"enter": 10**6, "exit": 10**6, "swap_back": 10**6},
+        "token_base": {
+            "ticker": "WXDAI",
+            "address": BASE,
+            "amount_in_max_a": 10**18,
+            "amount_min_after_swap_back_a": 100,
+            "is_native": False,
+            "set_allowance": MAX_UINT256,
+            "remove_allowance": 0,
+        },
+        "token_a": {
+            "ticker": "WETH",
+            "address": TOKEN_A,
+            "amount_after_swap": 612_345_678_901_234,
+            "amount_min_after_add_liq": 500,
+            "is_native": False,
+            "set_allowance": MAX_UINT256,
+            "remove_allowance": 0,
+            "amount_received_after_exit": 0,
+        },
+        "token_LP": {
+            "address": PAIR,
+            "set_allowance": MAX_UINT256,
+            "remove_allowance": 0,
+        },
+    }
+
+
+def arbitrage_strategy() -> Dict[str, Any]:
+    """Return an arbitrage strategy of two cycles, with the keeper pins and the read block."""
+    strategy = entry_strategy()
+    cycles = [[BASE, TOKEN_A, TOKEN_B, BASE], [BASE, TOKEN_B, BASE]]
+    strategy["arbitrage"] = True
+    strategy["path"] = cycles[0]
+    strategy["trades"] = [
+        {
+            "path": cycle,
+            "amount_in": 10**18 + i,
+            "amount_out_min": 10**18 + 10**15 + i,
+        }
+        for i, cycle in enumerate(cycles)
+    ]
+    strategy["event"] = "multi_transact"
+    strategy["quote_block"] = 35_123_456
+    strategy["quote_pins"] = [
+        {
+            "pair": PAIR,
+            "token0": TOKEN_A,
+            "token1": BASE,
+            "reserve0": 2**112 - 1,
+            "reserve1": 1,
+        }
+    ]
+    strategy["read_block"] = 35_123_455
+    return strategy
+
+
+@pytest.mark.parametrize("value", [0, 1, 127, 128, 300, 2**64, MAX_UINT256])
+def test_varint_round_trip(value: int) -> None:
+    """Test that a varint decodes to the encoded value, and ends where it was encoded."""
+    encoded = encode_varint(value)
+    assert decode_varint(encoded + b"\xff", 0) == (value, len(encoded))
+
+
+@pytest.mark.parametrize("value", [-1, True, 1.5, "1"])
+def test_varint_rejects_non_unsigned_integers(value: Any) -> None:
+    """Test that only unsigned integers are encoded."""
+    with pytest.raises(ValueError):
+        encode_varint(value)
+
+
+@pytest.mark.parametrize("build", [entry_strategy, arbitrage_strategy])
+def test_strategy_round_trip(build: Any) -> None:
+    """Test that a strategy decodes to itself and re-encodes to the same payload."""
+    strategy = build()
+    encoded = encode_strategy_payload(strategy)
+
+    decoded = decode_strategy_payload(encoded)
+
+    assert decoded == strategy
+    assert encode_strategy_payload(decoded) == encoded
+    assert Strategy.deserialize(encoded).to_dict() == strategy
+
+
+def test_addresses_decode_checksummed() -> None:
+    """Test that addresses are encoded whatever their case, and decode checksummed."""
+    strategy = entry_strategy()
+    lowered = copy.deepcopy(strategy)
+    lowered["token_base"]["address"] = BASE.lower()
+
+    assert encode_strategy_payload(lowered) == encode_strategy_payload(strategy)
+    assert (
+        decode_strategy_payload(encode_strategy_payload(lowered))["token_base"][
+            "address"
+        ]
+        == BASE
+    )
+
+
+def test_older_schema_versions_decode() -> None:
+    """Test that a payload encoded with the first schema still decodes."""
+    strategy = entry_strategy()
+    strategy["path"] = [BASE, TOKEN_A]
+
+    encoded = encode_strategy(strategy, version=1)
+
+    assert encoded[0] == 1 < STRATEGY_SCHEMA_VERSION
+    assert decode_strategy_bytes(encoded) == strategy
+
+
+def test_newer_fields_need_a_newer_schema() -> None:
+    """Test that a field is not encoded with a schema that predates it."""
+    with pytest.raises(ValueError, match="not in the schema"):
+        encode_strategy(arbitrage_strategy(), version=1)
+
+
+@pytest.mark.parametrize(
+    "data, error",
+    [
+        (b"", "Empty strategy"),
+        (bytes([255]), "Unknown strategy schema version"),
+        (encode_strategy(entry_strategy()) + b"\x00", "Trailing bytes"),
+        (encode_strategy(entry_strategy())[:-1], "Truncated"),
+    ],
+)
+def test_malformed_payloads_are_rejected(data: bytes, error: str) -> None:
+    """Test that malformed payloads raise instead of decoding to a partial strategy."""
+    with pytest.raises(ValueError, match=error):
+        decode_strategy_bytes(data)
+
+
+def test_payload_is_strict_base64() -> None:
+    """Test that the payload text must be valid base64."""
+    encoded = encode_strategy_payload(entry_strategy())
+    assert base64.b64decode(encoded, validate=True) == encode_strategy(entry_strategy())
+    with pytest.raises(ValueError):
+        decode_strategy_payload(encoded + "!")
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2021-2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for the Sync-event reserve indexer and its reorg handling."""
+
+from pathlib import Path
+from typing import Dict, List, Optional
+from unittest.mock import MagicMock
+
+import pytest
+from hexbytes import HexBytes
+
+from packages.isotrop.skills.swapping_abci.indexer import ReserveIndexer
+from packages.isotrop.skills.swapping_abci.quoting import ReserveTable
+from packages.valory.contracts.uniswapv2pair.contract import UniswapV2Pair
+
+
+PAIR = "0x7BEa4Af5D425f2d4485BDad1859c88617dF31A67"
+TOKEN0 = "0x6a023ccd1ff6f2045c3309768ead9e68f978f6e1"
+TOKEN1 = "0xe91d153e0b41518a2ce8dd3d7944fa863463a97d"
+SNAPSHOT_BLOCK = 100
+
+
+def sync_event(block: int, reserve0: int, reserve1: int, fork: str = "") -> dict:
+    """Return a `Sync` event as returned by `UniswapV2Pair.get_sync_events`."""
+    return {
+        "pair": PAIR,
+        "block_number": block,
+        "block_hash": f"0x{fork}{block}",
+        "log_index": 0,
+        "reserve0": reserve0,
+        "reserve1": reserve1,
+    }
+
+
+def make_indexer(reorg_window: int = 64, path: Optional[str] = None) -> ReserveIndexer:
+    """Return an indexer reset from a snapshot of one pair at `SNAPSHOT_BLOCK`."""
+    indexer = ReserveIndexer(ReserveTable(), path, reorg_window)
+    indexer.reset_from_state(
+        {PAIR: {"token0": TOKEN0, "token1": TOKEN1, "reserve0": 10, "reserve1": 20}},
+        SNAPSHOT_BLOCK,
+        f"0x{SNAPSHOT_BLOCK}",
+    )
+    return indexer
+
+
+def hashes(*blocks: int, fork: str = "") -> Dict[str, str]:
+    """Return the hashes of `blocks`, on the canonical chain or on a fork."""
+    return {str(block): f"0x{fork}{block}" for block in blocks}
+
+
+def reserves_of(indexer: ReserveIndexer) -> tuple:
+    """Return the reserves of the pair in the reserve table of the indexer."""
+    table = indexer._table  # pylint: disable=protected-access
+    return table.get_reserves(TOKEN0, TOKEN1)
+
+
+def test_apply_updates_the_reserves_and_the_cursor() -> None:
+    """Test that the events are applied in order, and the cursor moves to `to_block`."""
+    indexer = make_indexer()
+
+    applied = indexer.apply(
+        [sync_event(102, 11, 19), sync_event(104, 12, 18)], 105, hashes(105)
+    )
+
+    assert applied
+    assert indexer.cursor == 105
+    assert indexer.cursor_hash == "0x105"
+    assert reserves_of(indexer) == (12, 18)
+    assert indexer._table.block_number == 105  # pylint: disable=protected-access
+    assert indexer.tracked_hashes() == hashes(100, 102, 104, 105)
+
+
+def test_apply_requires_a_snapshot() -> None:
+    """Test that events cannot be applied before a snapshot."""
+    with pytest.raises(ValueError, match="reset from a snapshot"):
+        ReserveIndexer(ReserveTable()).apply([], 1, {})
+
+
+def test_reorg_rolls_back_to_the_last_canonical_block() -> None:
+    """Test that a reorg unwinds the blocks from the fork, and that they can be refetched."""
+    indexer = make_indexer()
+    indexer.apply([sync_event(102, 11, 19), sync_event(104, 12, 18)], 105, hashes(105))
+
+    # blocks 104 and 105 were replaced, 102 is still canonical
+    current = {**hashes(106), **hashes(105, 104, fork="f"), **hashes(102)}
+    applied = indexer.apply([sync_event(106, 99, 99)], 106, current)
+
+    assert not applied
+    assert indexer.cursor == 102
+    assert indexer.cursor_hash == "0x102"
+    assert reserves_of(indexer) == (11, 19)
+    assert indexer.tracked_hashes() == hashes(100, 102)
+
+    assert indexer.apply([sync_event(104, 13, 17, fork="f")], 106, hashes(106))
+    assert reserves_of(indexer) == (13, 17)
+    assert indexer.cursor == 106
+
+
+def test_reorg_of_the_snapshot_block_resets_the_cursor() -> None:
+    """Test that a reorg deeper than every tracked block requires a new snapshot."""
+    indexer = make_indexer()
+    indexer.apply([sync_event(102, 11, 19)], 103, hashes(103))
+
+    applied = indexer.apply([], 104, hashes(104, 103, 102, 100, fork="f"))
+
+    assert not applied
+    assert indexer.cursor is None
+    assert not indexer.covers([PAIR])
+
+
+def test_reorg_beyond_the_window_resets_the_cursor() -> None:
+    """Test that the blocks that fell out of the window are no longer tracked."""
+    indexer = make_indexer(reorg_window=2)
+    indexer.apply([sync_event(102, 11, 19)], 103, hashes(103))
+    indexer.apply([sync_event(106, 12, 18)], 107, hashes(107))
+
+    assert indexer.tracked_hashes() == hashes(106, 107)
+    assert not indexer.apply([], 108, hashes(108, 107, 106, fork="f"))
+    assert indexer.cursor is None
+
+
+def test_state_is_persisted(tmp_path: Path) -> None:
+    """Test that a restarted indexer resumes from the persisted cursor, reserves and journal."""
+    path = str(tmp_path / "reserve_indexer.json")
+    indexer = make_indexer(path=path)
+    indexer.apply([sync_event(102, 11, 19), sync_event(104, 12, 18)], 105, hashes(105))
+
+    restored = ReserveIndexer(ReserveTable(), path)
+
+    assert restored.load()
+    assert restored.cursor == 105
+    assert restored.covers([PAIR])
+    assert reserves_of(restored) == (12, 18)
+    assert not restored.apply([], 106, {**hashes(106), **hashes(105, 104, fork="f")})
+    assert reserves_of(restored) == (11, 19)
+    assert not ReserveIndexer(ReserveTable(), str(tmp_path / "missing.json")).load()
+
+
+def get_sync_events(chain: Dict[int, str], known_hashes: Dict[str, str]) -> tuple:
+    """Call `UniswapV2Pair.get_sync_events` against a chain of block hashes, without logs."""
+    ledger_api = MagicMock()
+    eth = ledger_api.api.eth
+    eth.get_logs.return_value = []
+    eth.get_block.side_effect = lambda block: {"hash": HexBytes(chain[block])}
+    result = UniswapV2Pair.get_sync_events(
+        ledger_api, PAIR, [PAIR], 106, 106, known_hashes=known_hashes
+    )
+    fetched: List[int] = [call.args[0] for call in eth.get_block.call_args_list]
+    return result["block_hashes"], fetched
+
+
+def test_sync_events_check_only_the_newest_known_block() -> None:
+    """Test that only the newest tracked hash is read when it is still canonical."""
+    chain = {block: f"0x{block:064x}" for block in range(100, 107)}
+    known = {str(block): chain[block] for block in (100, 102, 105)}
+
+    block_hashes, fetched = get_sync_events(chain, known)
+
+    assert fetched == [106, 105]
+    assert block_hashes == {"106": chain[106], "105": chain[105]}
+
+
+def test_sync_events_walk_back_to_the_fork() -> None:
+    """Test that the tracked hashes are walked back while they differ, down to a canonical one."""
+    chain = {block: f"0x{block:064x}" for block in range(100, 107)}
+    known = {str(block): chain[block] for block in (100, 102)}
+    known.update({"104": f"0x{1:064x}", "105": f"0x{2:064x}"})
+
+    block_hashes, fetched = get_sync_events(chain, known)
+
+    assert fetched == [106, 105, 104, 102]
+    assert block_hashes == {str(block): chain[block] for block in (106, 105, 104, 102)}
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2021-2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for the vectorized quote ladder of the swapping skill."""
+
+import numpy as np
+import pytest
+
+from packages.isotrop.skills.swapping_abci.ladder import build_quote_ladder, size_ladder
+from packages.isotrop.skills.swapping_abci.quoting import ReserveTable, get_amount_out
+
+
+BASE = "0xe91D153E0b41518A2Ce8Dd3D7944Fa863463a97d"
+DEEP = "0x6A023CCd1ff6F2045C3309768eAd9E68F978f6e1"
+SHALLOW = "0xDDAfbb505ad214D7b80b1f830fcCc89B60fb7A83"
+UNCACHED = "0x71850b7E9Ee3f13Ab46d67167341E4bDc905Eef9"
+
+
+@pytest.fixture
+def reserves() -> ReserveTable:
+    """Return a deep and a shallow pool against the base token."""
+    table = ReserveTable()
+    table.update("0x01", BASE, DEEP, 10**24, 10**21)
+    table.update("0x02", BASE, SHALLOW, 10**21, 10**9)
+    return table
+
+
+def test_size_ladder() -> None:
+    """Test that the sizes are increasing integers from the minimum fraction up to the maximum."""
+    sizes = size_ladder(10**18, 32)
+
+    assert len(sizes) == 32
+    assert sizes[0] == 10**16
+    assert sizes[-1] == 10**18
+    assert np.all(np.diff(sizes) > 0)
+    assert np.all(sizes == np.floor(sizes))
+
+
+def test_ladder_skips_the_uncached_and_the_source_tokens(
+    reserves: ReserveTable,
+) -> None:
+    """Test that only the tokens with a cached pair against the source token are candidates."""
+    ladder = build_quote_ladder(
+        reserves, BASE, [DEEP, UNCACHED, BASE, SHALLOW], size_ladder(10**18, 4)
+    )
+
+    assert ladder is not None
+    assert ladder.tokens == (DEEP, SHALLOW)
+    assert ladder.amounts_out.shape == ladder.price_impacts.shape == (2, 4)
+    assert (
+        build_quote_ladder(reserves, BASE, [UNCACHED], size_ladder(10**18, 4)) is None
+    )
+
+
+def test_ladder_approximates_the_exact_quotes(reserves: ReserveTable) -> None:
+    """Test that every float quote is within rounding of the exact integer quote."""
+    ladder = build_quote_ladder(
+        reserves, BASE, [DEEP, SHALLOW], size_ladder(10**20, 8)
+    )
+
+    assert ladder is not None
+    for index, token in enumerate(ladder.tokens):
+        reserve_in, reserve_out = reserves.get_reserves(BASE, token)  # type: ignore
+        for size, amount_out in zip(ladder.sizes, ladder.amounts_out[index]):
+            exact = get_amount_out(int(size), reserve_in, reserve_out)
+            assert amount_out == pytest.approx(exact, rel=1e-9, abs=1)
+            assert ladder.exact_amount_out(token, int(size)) == exact
+
+
+def test_price_impact_excludes_the_fee(reserves: ReserveTable) -> None:
+    """Test that the price impact is the slippage of the size only, i.e. dx * fee / (x + dx * fee)."""
+    ladder = build_quote_ladder(reserves, BASE, [DEEP], np.asarray([10**21]))
+
+    assert ladder is not None
+    with_fee = 10**21 * 0.997
+    assert ladder.price_impacts[0, 0] == pytest.approx(with_fee / (10**24 + with_fee))
+
+
+def test_best_picks_the_largest_size_within_the_bound(reserves: ReserveTable) -> None:
+    """Test that the largest size within the price impact wins, through the deepest pool."""
+    sizes = size_ladder(10**22, 16)
+    ladder = build_quote_ladder(reserves, BASE, [SHALLOW, DEEP], sizes)
+
+    assert ladder is not None
+    token, size = ladder.best(0.01)  # type: ignore
+
+    assert token == DEEP
+    within = sizes[sizes * 0.997 / (10**24 + sizes * 0.997) <= 0.01]
+    assert size == int(within.max())
+
+
+def test_best_without_an_eligible_candidate(reserves: ReserveTable) -> None:
+    """Test that no candidate is returned when every size exceeds the price impact."""
+    ladder = build_quote_ladder(
+        reserves, BASE, [SHALLOW], np.asarray([10**20, 10**21])
+    )
+
+    assert ladder is not None
+    assert ladder.best(0.01) is None
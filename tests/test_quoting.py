@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2021-2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for the in-process Uniswap V2 quoting of the swapping skill."""
+
+import json
+import os
+from pathlib import Path
+from typing import List
+
+import pytest
+from web3 import Web3
+
+from packages.isotrop.skills.swapping_abci.quoting import (
+    ReserveTable,
+    check_swap_invariant,
+    get_amount_out,
+)
+from packages.isotrop.skills.swapping_abci.registry import PairRegistry
+
+
+TOKEN_A = "0xe91D153E0b41518A2Ce8Dd3D7944Fa863463a97d"
+TOKEN_B = "0x6A023CCd1ff6F2045C3309768eAd9E68F978f6e1"
+TOKEN_C = "0xDDAfbb505ad214D7b80b1f830fcCc89B60fb7A83"
+TOKEN_HNY = "0x71850b7E9Ee3f13Ab46d67167341E4bDc905Eef9"
+
+HONEYSWAP_FACTORY = "0xA818b4F111Ccac7AA31D0BCc0806d64F2E0737D7"
+HONEYSWAP_ROUTER = "0x1C232F01118CB8B424793ae03F870aa7D0ac7f77"
+HONEYSWAP_INIT_CODE_HASH = (
+    "0x3f88503e8580ab941773b59034fb4b2a63e86dbc031b3633a925533ad3ed2b93"
+)
+GNOSIS_RPC_URL = os.environ.get("GNOSIS_RPC_URL")
+CONTRACTS_DIR = Path(__file__).parent.parent / "packages" / "valory" / "contracts"
+
+MAX_RESERVE = 2**112 - 1
+
+# (amount in, reserve in, reserve out, `UniswapV2Library.getAmountOut`)
+AMOUNT_OUT_CASES = [
+    (100, 1000, 1000, 90),
+    (10**18, 5 * 10**21, 7 * 10**24, 1395521732966446490569),
+    (123456789, 10**12, 3 * 10**11, 36921381),
+    (MAX_RESERVE, MAX_RESERVE, MAX_RESERVE, 2592248356514383147543768072224554),
+    (1, 10**18, 10**18, 0),
+]
+
+
+@pytest.mark.parametrize(
+    "amount_in, reserve_in, reserve_out, expected", AMOUNT_OUT_CASES
+)
+def test_get_amount_out(
+    amount_in: int, reserve_in: int, reserve_out: int, expected: int
+) -> None:
+    """Test that the output amount matches the library, rounded down."""
+    assert get_amount_out(amount_in, reserve_in, reserve_out) == expected
+
+
+@pytest.mark.parametrize(
+    "amount_in, reserve_in, reserve_out, expected", AMOUNT_OUT_CASES
+)
+def test_amount_out_is_the_largest_accepted_by_the_pair(
+    amount_in: int, reserve_in: int, reserve_out: int, expected: int
+) -> None:
+    """Test that the pair accepts the quoted amount and rejects one more."""
+    if expected > 0:
+        assert check_swap_invariant(reserve_in, reserve_out, amount_in, expected)
+    assert not check_swap_invariant(reserve_in, reserve_out, amount_in, expected + 1)
+
+
+@pytest.mark.parametrize(
+    "amount_in, reserve_in, reserve_out, error",
+    [
+        (0, 1000, 1000, "INSUFFICIENT_INPUT_AMOUNT"),
+        (100, 0, 1000, "INSUFFICIENT_LIQUIDITY"),
+        (100, 1000, 0, "INSUFFICIENT_LIQUIDITY"),
+    ],
+)
+def test_get_amount_out_reverts_like_the_library(
+    amount_in: int, reserve_in: int, reserve_out: int, error: str
+) -> None:
+    """Test that the inputs the library rejects raise."""
+    with pytest.raises(ValueError, match=error):
+        get_amount_out(amount_in, reserve_in, reserve_out)
+
+
+def test_get_amounts_out_along_a_path() -> None:
+    """Test that a two-hop quote matches `UniswapV2Router02.getAmountsOut`, whatever the token order of the pairs."""
+    reserves = ReserveTable()
+    # TOKEN_A sorts after TOKEN_B and TOKEN_C after TOKEN_B, so both pairs are stored as (TOKEN_B, _)
+    reserves.update("0x01", TOKEN_B, TOKEN_A, 7 * 10**24, 5 * 10**21)
+    reserves.update("0x02", TOKEN_B, TOKEN_C, 9 * 10**23, 4 * 10**20)
+
+    amounts = reserves.get_amounts_out(10**18, [TOKEN_A, TOKEN_B, TOKEN_C])
+
+    assert amounts == [10**18, 1395521732966446490569, 617416703926310068]
+
+
+def test_get_amounts_out_without_a_cached_pair() -> None:
+    """Test that a path through an unknown pair cannot be quoted."""
+    reserves = ReserveTable()
+    reserves.update("0x01", TOKEN_A, TOKEN_B, 10**21, 10**21)
+
+    assert reserves.get_amounts_out(10**18, [TOKEN_A, TOKEN_C]) is None
+    with pytest.raises(ValueError, match="INVALID_PATH"):
+        reserves.get_amounts_out(10**18, [TOKEN_A])
+
+
+def load_abi(contract: str, name: str) -> list:
+    """Return the ABI of a contract package from its build."""
+    build = CONTRACTS_DIR / contract / "build" / f"{name}.json"
+    return json.loads(build.read_text())["abi"]
+
+
+@pytest.mark.e2e
+@pytest.mark.skipif(
+    GNOSIS_RPC_URL is None, reason="GNOSIS_RPC_URL is needed to call the router"
+)
+@pytest.mark.parametrize(
+    "path",
+    [
+        [TOKEN_A, TOKEN_B],
+        [TOKEN_B, TOKEN_A],
+        [TOKEN_A, TOKEN_C],
+        [TOKEN_A, TOKEN_HNY, TOKEN_B],
+    ],
+)
+def test_get_amounts_out_matches_the_router(path: List[str]) -> None:
+    """Test that quoting the reserves of a block matches `getAmountsOut` of the Honeyswap router at that block."""
+    web3 = Web3(Web3.HTTPProvider(GNOSIS_RPC_URL))
+    block = web3.eth.block_number - 1
+    pair_abi = load_abi("uniswapv2pair", "UniswapV2Pair")
+    router = web3.eth.contract(
+        address=HONEYSWAP_ROUTER, abi=load_abi("uniswapv2router02", "UniswapV2Router02")
+    )
+    registry = PairRegistry(HONEYSWAP_FACTORY, HONEYSWAP_INIT_CODE_HASH)
+    reserves = ReserveTable()
+    for token_in, token_out in zip(path, path[1:]):
+        pair = registry.get_pair(token_in, token_out)
+        contract = web3.eth.contract(address=pair.address, abi=pair_abi)
+        reserve0, reserve1, _ = contract.functions.getReserves().call(
+            block_identifier=block
+        )
+        reserves.update(pair.address, pair.token0, pair.token1, reserve0, reserve1)
+
+    for amount_in in (10**15, 10**18, 10**21):
+        expected = router.functions.getAmountsOut(amount_in, path).call(
+            block_identifier=block
+        )
+        assert reserves.get_amounts_out(amount_in, path) == expected
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2021-2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for the local CREATE2 pair derivation of the swapping skill."""
+
+import pytest
+
+from packages.isotrop.skills.swapping_abci.registry import (
+    PairRegistry,
+    compute_pair_address,
+)
+
+
+HONEYSWAP_FACTORY = "0xA818b4F111Ccac7AA31D0BCc0806d64F2E0737D7"
+HONEYSWAP_INIT_CODE_HASH = (
+    "0x3f88503e8580ab941773b59034fb4b2a63e86dbc031b3633a925533ad3ed2b93"
+)
+WXDAI = "0xe91D153E0b41518A2Ce8Dd3D7944Fa863463a97d"
+WETH = "0x6A023CCd1ff6F2045C3309768eAd9E68F978f6e1"
+USDC = "0xDDAfbb505ad214D7b80b1f830fcCc89B60fb7A83"
+HNY = "0x71850b7E9Ee3f13Ab46d67167341E4bDc905Eef9"
+
+# pairs deployed by the Honeyswap factory on Gnosis
+HONEYSWAP_PAIRS = [
+    (WXDAI, WETH, "0x7BEa4Af5D425f2d4485BDad1859c88617dF31A67"),
+    (WXDAI, USDC, "0x01F4A4D82a4c1CF12EB2Dadc35fD87A14526cc79"),
+    (WXDAI, HNY, "0x4505b262DC053998C10685DC5F9098af8AE5C8ad"),
+    (WETH, HNY, "0x89e2F342b411032a580fEfa17f96da6A5bef4112"),
+]
+
+
+@pytest.mark.parametrize("token_a, token_b, expected", HONEYSWAP_PAIRS)
+def test_compute_pair_address(token_a: str, token_b: str, expected: str) -> None:
+    """Test that the derived address is the deployed pair, whatever the token order and case."""
+    for tokens in ((token_a, token_b), (token_b, token_a)):
+        assert (
+            compute_pair_address(HONEYSWAP_FACTORY, HONEYSWAP_INIT_CODE_HASH, *tokens)
+            == expected
+        )
+    assert (
+        compute_pair_address(
+            HONEYSWAP_FACTORY.lower(),
+            HONEYSWAP_INIT_CODE_HASH,
+            token_a.lower(),
+            token_b.lower(),
+        )
+        == expected
+    )
+
+
+def test_registry_orders_the_tokens_as_the_pair() -> None:
+    """Test that the registry stores the pair's token order and tells the swap direction."""
+    registry = PairRegistry(HONEYSWAP_FACTORY, HONEYSWAP_INIT_CODE_HASH)
+
+    pair, zero_for_one = registry.get_orientation(WXDAI, WETH)
+
+    assert pair.address == HONEYSWAP_PAIRS[0][2]
+    assert (pair.token0, pair.token1) == (WETH.lower(), WXDAI.lower())
+    assert not zero_for_one
+    assert registry.get_orientation(WETH, WXDAI) == (pair, True)
+
+
+def test_registry_registers_every_combination_once() -> None:
+    """Test that registering tokens derives each of their pairs once."""
+    registry = PairRegistry(HONEYSWAP_FACTORY, HONEYSWAP_INIT_CODE_HASH)
+
+    pairs = registry.register([WXDAI, WETH, USDC, HNY])
+    registry.register([HNY, WXDAI])
+
+    assert len(pairs) == len(registry) == 6
+    addresses = {pair.address for pair in pairs}
+    assert {address for *_, address in HONEYSWAP_PAIRS[:3]} <= addresses
+    assert registry.get_pair(HNY, WXDAI) is registry.get_pair(WXDAI, HNY)
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2021-2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for the rounds of the swapping skill."""
+
+from contextlib import ExitStack
+from typing import Any, Callable, Dict, Generator, Optional, Type
+from unittest.mock import MagicMock, PropertyMock, patch
+
+import pytest
+
+from packages.isotrop.skills.swapping_abci.payloads import (
+    APICheckPayload,
+    BlockPinningPayload,
+    StrategyEvaluationPayload,
+)
+from packages.isotrop.skills.swapping_abci.rounds import (
+    APICheckRound,
+    BlockPinningRound,
+    Event,
+    StrategyEvaluationRound,
+)
+from packages.isotrop.skills.swapping_abci.strategy import (
+    get_strategy_digest,
+    serialize_strategy,
+)
+
+
+AGENTS = ("agent_0", "agent_1", "agent_2", "agent_3")
+KEEPER = AGENTS[-1]
+
+
+def entry_strategy(ticker: str) -> str:
+    """Return the serialized entry into the token of the given ticker."""
+    return serialize_strategy(
+        {
+            "action": "enter",
+            "deadline": 1_700_000_300,
+            "chain": "gnosis",
+            "safe_nonce": 3,
+            "safe_tx_gas": {"enter": 0, "exit": 0, "swap_back": 0},
+            "token_base": {"ticker": "WXDAI", "amount_in_max_a": 10**18},
+            "token_a": {"ticker": ticker},
+            "token_LP": {},
+        }
+    )
+
+
+STRATEGY = entry_strategy("WETH")
+DIGEST = get_strategy_digest(STRATEGY)
+
+
+class RoundUnderTest:
+    """A round of four agents, whose payloads are set by the test."""
+
+    def __init__(self, round_cls: Type, payload_cls: Type) -> None:
+        """Initialize the round."""
+        self.payload_cls = payload_cls
+        self.collection: Dict[str, Any] = {}
+        self.synchronized_data = MagicMock(
+            keeper=KEEPER, consensus_threshold=3, nb_participants=len(AGENTS)
+        )
+        self.round = round_cls(
+            synchronized_data=self.synchronized_data, context=MagicMock()
+        )
+
+    def add(self, sender: str, *args: Any) -> None:
+        """Add the payload of an agent."""
+        self.collection[sender] = self.payload_cls(sender, *args)
+
+
+@pytest.fixture
+def make_round() -> Generator[Callable[[Type, Type], RoundUnderTest], None, None]:
+    """Return a factory of rounds whose collection and synchronized data are the test's."""
+    with ExitStack() as stack:
+
+        def factory(round_cls: Type, payload_cls: Type) -> RoundUnderTest:
+            test_round = RoundUnderTest(round_cls, payload_cls)
+            for name in ("collection", "synchronized_data"):
+                stack.enter_context(
+                    patch.object(
+                        round_cls,
+                        name,
+                        new_callable=PropertyMock,
+                        return_value=getattr(test_round, name),
+                    )
+                )
+            return test_round
+
+        yield factory
+
+
+@pytest.fixture
+def block_round(make_round: Callable) -> RoundUnderTest:
+    """Return a BlockPinningRound."""
+    return make_round(BlockPinningRound, BlockPinningPayload)
+
+
+@pytest.fixture
+def strategy_round(make_round: Callable) -> RoundUnderTest:
+    """Return a StrategyEvaluationRound."""
+    return make_round(StrategyEvaluationRound, StrategyEvaluationPayload)
+
+
+def pinned_block(test_round: RoundUnderTest) -> Optional[int]:
+    """Return the block pinned by a BlockPinningRound that ended, checking its event."""
+    synchronized_data, event = test_round.round.end_block()
+    assert event == Event.DONE
+    assert synchronized_data is test_round.synchronized_data.update.return_value
+    return test_round.synchronized_data.update.call_args.kwargs["read_block"]
+
+
+def test_block_is_pinned_once_the_proposals_reach_the_threshold(
+    block_round: RoundUnderTest,
+) -> None:
+    """Test that the round waits for the threshold of proposals, then pins the median one."""
+    block_round.add(AGENTS[0], 102)
+    block_round.add(AGENTS[1], 100)
+    assert block_round.round.end_block() is None
+
+    block_round.add(AGENTS[2], 101)
+
+    assert block_round.round.proposed_blocks == [100, 101, 102]
+    assert pinned_block(block_round) == 101
+
+
+@pytest.mark.parametrize("faulty_block", [0, 10**12])
+def test_a_faulty_proposal_cannot_move_the_pin(
+    block_round: RoundUnderTest, faulty_block: int
+) -> None:
+    """Test that an agent proposing an outlying block cannot pin a block outside the others' proposals."""
+    block_round.add(AGENTS[0], faulty_block)
+    block_round.add(AGENTS[1], 100)
+    block_round.add(AGENTS[2], 101)
+
+    assert pinned_block(block_round) in (100, 101)
+
+
+def test_reads_are_not_pinned_without_enough_proposals(
+    block_round: RoundUnderTest,
+) -> None:
+    """Test that the reads are not pinned once too many agents proposed no block."""
+    block_round.add(AGENTS[0], 100)
+    block_round.add(AGENTS[1])
+    assert block_round.round.end_block() is None
+
+    block_round.add(AGENTS[2])
+
+    assert pinned_block(block_round) is None
+
+
+def test_every_agent_votes_its_own_strategy(strategy_round: RoundUnderTest) -> None:
+    """Test that the strategy is agreed on once the digests computed by the agents reach the threshold."""
+    for agent in AGENTS[:2]:
+        strategy_round.add(agent, "", DIGEST)
+    assert strategy_round.round.most_voted_payload is None
+    assert strategy_round.round.end_block() is None
+
+    strategy_round.add(KEEPER, STRATEGY, DIGEST)
+
+    assert strategy_round.round.most_voted_payload == STRATEGY
+    _, event = strategy_round.round.end_block()
+    assert event == Event.DONE_ENTER
+
+
+def test_a_faulty_keeper_cannot_impose_its_strategy(
+    strategy_round: RoundUnderTest,
+) -> None:
+    """Test that the keeper's strategy is not taken when the other agents computed another one."""
+    for agent in AGENTS[:3]:
+        strategy_round.add(agent, "", DIGEST)
+    faulty = entry_strategy("HNY")
+    strategy_round.add(KEEPER, faulty, get_strategy_digest(faulty))
+
+    assert strategy_round.round.vote_counts == {
+        DIGEST: 3,
+        get_strategy_digest(faulty): 1,
+    }
+    assert strategy_round.round.most_voted_payload is None
+    assert not strategy_round.round.is_vote_majority_possible()
+
+
+def test_keeper_body_must_match_the_digest(strategy_round: RoundUnderTest) -> None:
+    """Test that a keeper strategy that does not match its digest is not taken."""
+    for agent in AGENTS[:2]:
+        strategy_round.add(agent, "", DIGEST)
+    strategy_round.add(KEEPER, entry_strategy("HNY"), DIGEST)
+
+    assert strategy_round.round.vote_counts == {DIGEST: 3}
+    assert strategy_round.round.most_voted_payload is None
+
+
+def test_deferring_payloads_before_the_keepers(make_round: Callable) -> None:
+    """Test that the quotes deferring to the keeper wait for its payload, then vote like it."""
+    quote_round = make_round(APICheckRound, APICheckPayload)
+    for agent in AGENTS[:2]:
+        quote_round.add(agent, "")
+
+    assert quote_round.round.most_voted_payload is None
+    assert not quote_round.round.threshold_reached
+    assert quote_round.round.is_vote_majority_possible()
+    assert quote_round.round.end_block() is None
+
+    quote_round.add(KEEPER, STRATEGY, DIGEST)
+
+    assert quote_round.round.vote_counts == {DIGEST: 3}
+    assert quote_round.round.most_voted_payload == STRATEGY
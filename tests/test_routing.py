@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2021-2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for the multi-hop route search of the swapping skill."""
+
+import pytest
+
+from packages.isotrop.skills.swapping_abci.quoting import ReserveTable
+from packages.isotrop.skills.swapping_abci.routing import find_best_route
+
+
+WXDAI = "0xe91D153E0b41518A2Ce8Dd3D7944Fa863463a97d"
+WETH = "0x6A023CCd1ff6F2045C3309768eAd9E68F978f6e1"
+USDC = "0xDDAfbb505ad214D7b80b1f830fcCc89B60fb7A83"
+HNY = "0x71850b7E9Ee3f13Ab46d67167341E4bDc905Eef9"
+LINK = "0xE2e73A1c69ecF83F464EFCE6A5be353a37cA09b2"
+
+
+@pytest.fixture
+def reserves() -> ReserveTable:
+    """Return pools where the thin direct WXDAI/WETH pool is beaten by going through USDC."""
+    table = ReserveTable()
+    table.update("0x01", WXDAI, WETH, 10**21, 10**17)
+    table.update("0x02", WXDAI, USDC, 10**24, 10**18)
+    table.update("0x03", USDC, WETH, 10**18, 5 * 10**20)
+    table.update("0x04", WXDAI, HNY, 10**22, 10**20)
+    table.update("0x05", HNY, LINK, 10**20, 10**20)
+    return table
+
+
+def test_best_route_beats_the_direct_pool(reserves: ReserveTable) -> None:
+    """Test that the route with the largest output wins, with the amounts of `getAmountsOut`."""
+    route = find_best_route(reserves, 10**18, WXDAI, WETH)
+
+    assert route is not None
+    assert route.path == (WXDAI, USDC.lower(), WETH)
+    assert list(route.amounts) == reserves.get_amounts_out(10**18, route.path)
+    assert route.amount_out > reserves.get_amounts_out(10**18, [WXDAI, WETH])[-1]  # type: ignore
+
+
+def test_max_hops_bounds_the_route(reserves: ReserveTable) -> None:
+    """Test that a single hop only allows the direct pool."""
+    route = find_best_route(reserves, 10**18, WXDAI, WETH, max_hops=1)
+
+    assert route is not None
+    assert route.path == (WXDAI, WETH)
+
+
+def test_intermediate_tokens_are_restricted(reserves: ReserveTable) -> None:
+    """Test that only the allowed tokens are used as intermediate hops."""
+    route = find_best_route(reserves, 10**18, WXDAI, WETH, tokens=[WXDAI, WETH, HNY])
+
+    assert route is not None
+    assert route.path == (WXDAI, WETH)
+
+
+def test_unreachable_token(reserves: ReserveTable) -> None:
+    """Test that no route is found to a token out of reach within the hops."""
+    assert find_best_route(reserves, 10**18, WETH, LINK, max_hops=2) is None
+    route = find_best_route(reserves, 10**18, WETH, LINK, max_hops=3)
+    assert route is not None
+    assert route.path[-1] == LINK
+    assert len(route.path) == 4
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2021-2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for the in-process Safe transaction hashing of the swapping skill."""
+
+from typing import Any, Dict
+
+import pytest
+from eth_account.messages import encode_typed_data
+from web3 import Web3
+
+from packages.isotrop.skills.swapping_abci.safe import NULL_ADDRESS, get_safe_tx_hash
+
+
+SAFE_ADDRESS = Web3.to_checksum_address("0x5d1a6e6f3e1c4df8e7e5d5c6a1b6e7cc7e4f3a21")
+MULTISEND_ADDRESS = Web3.to_checksum_address(
+    "0xa238cbeb142c10ef7ad8442c6d1f9e89e07e7761"
+)
+GNOSIS_CHAIN_ID = 100
+MULTISEND_DATA = bytes.fromhex("8d80ff0a") + bytes(96)
+
+# `GnosisSafeContract.get_raw_safe_transaction_hash` of these Safe transactions, to `MULTISEND_ADDRESS`
+RECORDED_SAFE_TX_HASHES = [
+    (
+        dict(
+            chain_id=GNOSIS_CHAIN_ID,
+            value=0,
+            data=b"",
+            operation=0,
+            safe_tx_gas=0,
+            nonce=0,
+        ),
+        "1.3.0",
+        "bdfcf0bd0cc84eb7bbd2c1df9347e108d7d5777c2ae475ceefefaeb226855963",
+    ),
+    (
+        dict(
+            chain_id=GNOSIS_CHAIN_ID,
+            value=0,
+            data=MULTISEND_DATA,
+            operation=1,
+            safe_tx_gas=10**7,
+            nonce=42,
+        ),
+        "1.3.0",
+        "0c30bcf2be8f662dcffa05d092c26576f6e4acbeb5610c410e7757abb6a6be2d",
+    ),
+    (
+        dict(
+            chain_id=1,
+            value=10**18,
+            data=b"\x01" * 257,
+            operation=0,
+            safe_tx_gas=250_000,
+            nonce=7,
+            base_gas=21_000,
+            gas_price=3 * 10**9,
+            refund_receiver=MULTISEND_ADDRESS,
+        ),
+        "1.3.0",
+        "14179b9826fa34d1fa5d17bcce2a6f515abe3fe905e92c24d9f29126fd4d2dba",
+    ),
+    (
+        dict(
+            chain_id=GNOSIS_CHAIN_ID,
+            value=0,
+            data=MULTISEND_DATA,
+            operation=1,
+            safe_tx_gas=10**7,
+            nonce=42,
+        ),
+        "1.1.1",
+        "4371fa40b043fdf31cf28d817e3a99624b68c01c989a3d06733fa7fd87718a6c",
+    ),
+    (
+        dict(
+            chain_id=GNOSIS_CHAIN_ID,
+            value=0,
+            data=MULTISEND_DATA,
+            operation=1,
+            safe_tx_gas=10**7,
+            nonce=42,
+        ),
+        "0.1.0",
+        "8021895a10328451f820b806c0999a6e70af4a29bb4001658cfe773ef933cb41",
+    ),
+]
+
+
+def get_eip712_safe_tx_hash(
+    chain_id: int, safe_address: str, message: Dict[str, Any]
+) -> str:
+    """Hash a Safe >= 1.3.0 transaction from its EIP-712 typed data."""
+    signable = encode_typed_data(
+        full_message={
+            "types": {
+                "EIP712Domain": [
+                    {"name": "chainId", "type": "uint256"},
+                    {"name": "verifyingContract", "type": "address"},
+                ],
+                "SafeTx": [
+                    {"name": "to", "type": "address"},
+                    {"name": "value", "type": "uint256"},
+                    {"name": "data", "type": "bytes"},
+                    {"name": "operation", "type": "uint8"},
+                    {"name": "safeTxGas", "type": "uint256"},
+                    {"name": "baseGas", "type": "uint256"},
+                    {"name": "gasPrice", "type": "uint256"},
+                    {"name": "gasToken", "type": "address"},
+                    {"name": "refundReceiver", "type": "address"},
+                    {"name": "nonce", "type": "uint256"},
+                ],
+            },
+            "primaryType": "SafeTx",
+            "domain": {"chainId": chain_id, "verifyingContract": safe_address},
+            "message": message,
+        }
+    )
+    digest = Web3.keccak(b"\x19" + signable.version + signable.header + signable.body)
+    return bytes(digest).hex()
+
+
+@pytest.mark.parametrize("kwargs, safe_version, expected", RECORDED_SAFE_TX_HASHES)
+def test_get_safe_tx_hash_matches_the_safe_contract(
+    kwargs: Dict[str, Any], safe_version: str, expected: str
+) -> None:
+    """Test that the hash is the one of `GnosisSafeContract`, for the domain and the type of each Safe version."""
+    safe_tx_hash = get_safe_tx_hash(
+        safe_address=SAFE_ADDRESS,
+        to_address=MULTISEND_ADDRESS,
+        safe_version=safe_version,
+        **kwargs,
+    )
+
+    assert safe_tx_hash == expected
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [kwargs for kwargs, version, _ in RECORDED_SAFE_TX_HASHES if version == "1.3.0"],
+)
+def test_get_safe_tx_hash_matches_eip712(kwargs: Dict[str, Any]) -> None:
+    """Test that the hash of a Safe >= 1.3.0 transaction is its EIP-712 hash."""
+    message = {
+        "to": MULTISEND_ADDRESS,
+        "value": kwargs["value"],
+        "data": kwargs["data"],
+        "operation": kwargs["operation"],
+        "safeTxGas": kwargs["safe_tx_gas"],
+        "baseGas": kwargs.get("base_gas", 0),
+        "gasPrice": kwargs.get("gas_price", 0),
+        "gasToken": NULL_ADDRESS,
+        "refundReceiver": kwargs.get("refund_receiver", NULL_ADDRESS),
+        "nonce": kwargs["nonce"],
+    }
+
+    assert get_safe_tx_hash(
+        safe_address=SAFE_ADDRESS, to_address=MULTISEND_ADDRESS, **kwargs
+    ) == get_eip712_safe_tx_hash(kwargs["chain_id"], SAFE_ADDRESS, message)
+
+
+def test_get_safe_tx_hash_ignores_the_address_case() -> None:
+    """Test that the checksummed and the lower-cased Safe addresses give the same hash."""
+    kwargs: Dict[str, Any] = dict(
+        chain_id=GNOSIS_CHAIN_ID,
+        to_address=MULTISEND_ADDRESS,
+        value=0,
+        data=b"",
+        operation=1,
+        safe_tx_gas=0,
+        nonce=3,
+    )
+    assert get_safe_tx_hash(safe_address=SAFE_ADDRESS, **kwargs) == get_safe_tx_hash(
+        safe_address=SAFE_ADDRESS.lower(), **kwargs
+    )
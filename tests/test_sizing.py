@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2021-2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for the closed-form trade sizing of the swapping skill."""
+
+import pytest
+
+from packages.isotrop.skills.swapping_abci.quoting import ReserveTable
+from packages.isotrop.skills.swapping_abci.sizing import (
+    FEE_FACTOR,
+    get_impact_bounded_input,
+    get_optimal_cycle_input,
+    get_virtual_reserves,
+    size_trade,
+)
+
+
+WXDAI = "0xe91D153E0b41518A2Ce8Dd3D7944Fa863463a97d"
+WETH = "0x6A023CCd1ff6F2045C3309768eAd9E68F978f6e1"
+USDC = "0xDDAfbb505ad214D7b80b1f830fcCc89B60fb7A83"
+HNY = "0x71850b7E9Ee3f13Ab46d67167341E4bDc905Eef9"
+CYCLE = (WXDAI, WETH, USDC, WXDAI)
+
+
+@pytest.fixture
+def reserves() -> ReserveTable:
+    """Return three pools where WETH is cheap against WXDAI, so that the cycle through it is profitable."""
+    table = ReserveTable()
+    table.update("0x01", WXDAI, WETH, 2 * 10**24, 1050 * 10**18)
+    table.update("0x02", WETH, USDC, 10**21, 2 * 10**24)
+    table.update("0x03", USDC, WXDAI, 10**24, 10**24)
+    return table
+
+
+def virtual_amount_out(virtual: tuple, amount_in: int) -> float:
+    """Return the output of a swap on a virtual pool."""
+    virtual_in, virtual_out = virtual
+    return FEE_FACTOR * amount_in * virtual_out / (virtual_in + FEE_FACTOR * amount_in)
+
+
+@pytest.mark.parametrize("path", [(WXDAI, WETH), (WXDAI, WETH, USDC), CYCLE])
+def test_virtual_pool_quotes_the_path(reserves: ReserveTable, path: tuple) -> None:
+    """Test that the virtual pool of a path quotes as `getAmountsOut`, within integer rounding."""
+    virtual = get_virtual_reserves(reserves, path)
+
+    assert virtual is not None
+    for amount_in in (10**15, 10**18, 10**21, 10**23):
+        exact = reserves.get_amounts_out(amount_in, path)[-1]  # type: ignore
+        assert virtual_amount_out(virtual, amount_in) == pytest.approx(
+            exact, rel=1e-9, abs=len(path)
+        )
+
+
+def test_virtual_pool_of_an_uncached_path(reserves: ReserveTable) -> None:
+    """Test that a path through an uncached pair, or without a swap, has no virtual pool."""
+    assert get_virtual_reserves(reserves, (WXDAI, HNY)) is None
+    assert get_virtual_reserves(reserves, (WXDAI, WETH, HNY)) is None
+    assert get_virtual_reserves(reserves, (WXDAI,)) is None
+
+
+def test_optimal_cycle_input_maximizes_the_profit(reserves: ReserveTable) -> None:
+    """Test that the closed-form input yields the largest exact profit around it."""
+    virtual = get_virtual_reserves(reserves, CYCLE)
+    assert virtual is not None
+
+    optimal = get_optimal_cycle_input(*virtual)
+
+    def profit(amount_in: int) -> int:
+        return reserves.get_amounts_out(amount_in, CYCLE)[-1] - amount_in  # type: ignore
+
+    assert optimal > 0
+    assert profit(optimal) > 0
+    for factor in (0.5, 0.9, 0.99, 1.01, 1.1, 2):
+        assert profit(int(optimal * factor)) <= profit(optimal)
+
+
+def test_unprofitable_cycle_has_no_input() -> None:
+    """Test that a virtual pool whose price is below one is not traded."""
+    assert get_optimal_cycle_input(10**24, 10**24) == 0
+    assert get_optimal_cycle_input(10**24, 9 * 10**23) == 0
+
+
+@pytest.mark.parametrize("max_price_impact", [0.001, 0.01, 0.3])
+def test_impact_bounded_input(max_price_impact: float) -> None:
+    """Test that the price impact of the input is the bound, excluding the fee."""
+    virtual_in = 10**24
+
+    amount_in = get_impact_bounded_input(virtual_in, max_price_impact)
+
+    impact = FEE_FACTOR * amount_in / (virtual_in + FEE_FACTOR * amount_in)
+    assert impact == pytest.approx(max_price_impact, rel=1e-12)
+    # a slightly larger input is beyond the bound
+    amount_in += 10**12
+    assert (
+        FEE_FACTOR * amount_in / (virtual_in + FEE_FACTOR * amount_in)
+        > max_price_impact
+    )
+
+
+def test_impact_bounded_input_limits() -> None:
+    """Test the impact bound without an allowed impact, and the impossible impacts."""
+    assert get_impact_bounded_input(10**24, 0) == 0
+    assert get_impact_bounded_input(0, 0.01) == 0
+    with pytest.raises(ValueError, match="always below 1"):
+        get_impact_bounded_input(10**24, 1)
+
+
+def test_size_trade(reserves: ReserveTable) -> None:
+    """Test that a trade is sized by the impact of the whole path, capped by the maximum amount."""
+    path = (WXDAI, WETH, USDC)
+    virtual_in, _ = get_virtual_reserves(reserves, path)  # type: ignore
+    bounded = get_impact_bounded_input(virtual_in, 0.01)
+
+    assert size_trade(reserves, path, 0.01, 10**30) == bounded
+    assert size_trade(reserves, path, 0.01, 10**18) == 10**18
+    assert size_trade(reserves, (WXDAI, HNY), 0.01, 10**18) is None
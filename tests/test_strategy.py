@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+# ------------------------------------------------------------------------------
+#
+#   Copyright 2021-2024 Valory AG
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+# ------------------------------------------------------------------------------
+
+"""Tests for the strategy value type of the swapping skill."""
+
+import dataclasses
+from typing import Any, Dict
+
+import pytest
+from web3 import Web3
+
+from packages.isotrop.skills.swapping_abci.strategy import (
+    Strategy,
+    get_strategy_digest,
+    serialize_strategy,
+)
+
+
+BASE = Web3.to_checksum_address("0xe91d153e0b41518a2ce8dd3d7944fa863463a97d")
+TOKEN_A = Web3.to_checksum_address("0x6a023ccd1ff6f2045c3309768ead9e68f978f6e1")
+PAIR = Web3.to_checksum_address("0x7bea4af5d425f2d4485bdad1859c88617df31a67")
+
+
+def swap_strategy() -> Dict[str, Any]:
+    """Return the dict form of a swap strategy, with a path and a trade."""
+    return {
+        "action": "enter",
+        "deadline": 1_700_000_300,
+        "chain": "gnosis",
+        "safe_nonce": 3,
+        "safe_tx_gas": {"enter": 0, "exit": 0, "swap_back": 0},
+        "token_base": {"ticker": "WXDAI", "address": BASE, "amount_in_max_a": 10**18},
+        "token_a": {"ticker": "WETH", "address": TOKEN_A, "amount_after_swap": 500},
+        "token_LP": {"address": PAIR},
+        "path": [BASE, TOKEN_A],
+        "trades": [
+            {"path": [BASE, TOKEN_A], "amount_in": 10**18, "amount_out_min": 1}
+        ],
+        "event": "transact",
+        "read_block": 35_123_455,
+    }
+
+
+def test_dict_round_trip() -> None:
+    """Test that the dict form is kept, with the unset optional fields left out."""
+    strategy = swap_strategy()
+
+    assert Strategy.from_dict(strategy).to_dict() == strategy
+    del strategy["trades"], strategy["event"], strategy["read_block"]
+    assert Strategy.from_dict(strategy).to_dict() == strategy
+
+
+def test_strategy_is_immutable() -> None:
+    """Test that neither the fields nor the sections of a strategy can be changed, only its dict copy."""
+    strategy = Strategy.from_dict(swap_strategy())
+
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        strategy.action = "exit"  # type: ignore
+    with pytest.raises(TypeError):
+        strategy.token_a["amount_after_swap"] = 0  # type: ignore
+    assert isinstance(strategy.path, tuple)
+
+    copy = strategy.to_dict()
+    copy["token_a"]["amount_after_swap"] = 0
+    copy["path"].append(BASE)
+    assert strategy.token_a["amount_after_swap"] == 500
+    assert strategy.path == (BASE, TOKEN_A)
+
+
+def test_serialization_is_canonical() -> None:
+    """Test that the serialized form does not depend on the key order, and decodes to an equal strategy."""
+    strategy = swap_strategy()
+    reordered = dict(reversed(list(strategy.items())))
+    reordered["token_a"] = dict(reversed(list(strategy["token_a"].items())))
+
+    serialized = Strategy.from_dict(strategy).serialize()
+
+    assert serialize_strategy(reordered) == serialized
+    assert Strategy.deserialize(serialized) == Strategy.from_dict(strategy)
+
+
+def test_deserialization_is_memoized() -> None:
+    """Test that the same serialized strategy is decoded once, and shared."""
+    serialized = serialize_strategy(swap_strategy())
+
+    assert Strategy.deserialize(serialized) is Strategy.deserialize(serialized)
+
+
+def test_digest() -> None:
+    """Test that the digest is a 32-byte hex string that changes with the strategy."""
+    strategy = swap_strategy()
+    digest = get_strategy_digest(serialize_strategy(strategy))
+    strategy["safe_nonce"] += 1
+
+    assert len(bytes.fromhex(digest)) == 32
+    assert get_strategy_digest(serialize_strategy(strategy)) != digest